@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+import yaml
+
+import codepath_to_canvas
+
+
+DEFAULT_SIZES = (50, 500, 5000)
+DEFAULT_ASSIGNMENT_COUNTS = (1, 10, 40)
+BENCHMARK_NAMES = ("name_resolution", "score_conversion", "workbook_load", "end_to_end_push")
+BENCHMARK_DUE_AT = datetime(2026, 3, 10, 23, 59, tzinfo=codepath_to_canvas.LOS_ANGELES)
+
+FIRST_NAMES = (
+  "Aaliyah", "Abel", "Adrian", "Aiden", "Alejandra", "Alexis", "Amara", "Andre", "Angela", "Anika",
+  "Ariana", "Arjun", "Ava", "Benjamin", "Bianca", "Brandon", "Brianna", "Caleb", "Camila", "Carlos",
+  "Chloe", "Christopher", "Daniela", "David", "Diego", "Elena", "Elijah", "Emily", "Esteban", "Ethan",
+  "Fatima", "Gabriel", "Grace", "Hannah", "Hector", "Isabella", "Ivan", "Jasmine", "Javier", "Jessica",
+  "Joceline", "Jordan", "Jose", "Julian", "Kaitlyn", "Kevin", "Layla", "Leonardo", "Liam", "Lucia",
+  "Marcus", "Maria", "Mateo", "Maya", "Nathan", "Nicole", "Noah", "Olivia", "Omar", "Priya",
+  "Rafael", "Rebecca", "Samuel", "Sofia", "Tariq", "Valeria", "Victor", "Xavier", "Yasmin", "Zoe",
+)
+LAST_NAMES = (
+  "Acosta", "Aguilar", "Alvarez", "Anderson", "Arellano", "Bautista", "Brooks", "Castillo", "Chavez", "Chen",
+  "Cortez", "Cruz", "Delgado", "Diaz", "Dominguez", "Espinoza", "Flores", "Garcia", "Gomez", "Gonzalez",
+  "Gutierrez", "Hernandez", "Huang", "Jacobs", "Jimenez", "Johnson", "Kim", "Lee", "Lopez", "Martinez",
+  "Medina", "Mendoza", "Morales", "Moreno", "Nguyen", "Ortiz", "Patel", "Perez", "Plascencia", "Ramirez",
+  "Ramos", "Reyes", "Rivera", "Robinson", "Rodriguez", "Romero", "Ruiz", "Salazar", "Sanchez", "Santos",
+  "Silva", "Singh", "Smith", "Soto", "Tanaka", "Torres", "Tran", "Valdez", "Vargas", "Vasquez",
+  "Vega", "Wang", "Williams", "Wong", "Wu", "Yang", "Young", "Zamora", "Zhang", "Zhou",
+  "Ali", "Baker", "Campos", "Dang", "Estrada", "Fuentes", "Guerrero", "Ibarra", "Juarez", "Khan",
+)
+SCORE_STATUSES = ("Complete", "Complete", "Complete", "Incomplete", "Not Graded")
+
+
+@dataclass(frozen=True)
+class SyntheticStudent:
+  first_name: str
+  last_name: str
+  canvas_name: str
+  codepath_name: str
+  user_id: int
+  member_id: int
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+  benchmark: str
+  students: int
+  assignments: int
+  seconds: float
+  per_item_us: float
+  latency_ms: float = 0.0
+  repeat: int = 1
+  extra: dict[str, object] = field(default_factory=dict)
+
+
+def perturb_name(name: str, rng: random.Random) -> str:
+  if len(name) < 4:
+    return name
+  index = rng.randrange(1, len(name) - 1)
+  return name[:index] + name[index + 1] + name[index] + name[index + 2:]
+
+
+def generate_students(
+  count: int,
+  *,
+  seed: int = 0,
+  alias_fraction: float = 0.05,
+) -> list[SyntheticStudent]:
+  rng = random.Random(seed)
+  pairs = list(itertools.product(FIRST_NAMES, LAST_NAMES))
+  if count > len(pairs):
+    raise ValueError(f"Cannot generate more than {len(pairs)} unique synthetic students.")
+
+  students: list[SyntheticStudent] = []
+  for index, (first_name, last_name) in enumerate(rng.sample(pairs, count)):
+    canvas_name = f"{last_name}, {first_name}"
+    codepath_name = f"{first_name} {last_name}"
+    if rng.random() < alias_fraction:
+      codepath_name = f"{perturb_name(first_name, rng)} {last_name}"
+    students.append(
+      SyntheticStudent(
+        first_name=first_name,
+        last_name=last_name,
+        canvas_name=canvas_name,
+        codepath_name=codepath_name,
+        user_id=100000 + index,
+        member_id=500000 + index,
+      )
+    )
+  return students
+
+
+def build_alias_name_map(students: list[SyntheticStudent]) -> dict[str, str]:
+  return {
+    student.codepath_name: student.canvas_name
+    for student in students
+    if student.codepath_name != f"{student.first_name} {student.last_name}"
+  }
+
+
+def format_codepath_timestamp(value: datetime) -> str:
+  local = value.astimezone(codepath_to_canvas.LOS_ANGELES)
+  hour = local.strftime("%I").lstrip("0")
+  return f"{local.month}/{local.day} at {hour}:{local.strftime('%M%p').lower()} {local.tzname()}"
+
+
+def generate_codepath_rows(
+  students: list[SyntheticStudent],
+  *,
+  seed: int = 0,
+  due_at: datetime = BENCHMARK_DUE_AT,
+  max_points: int = 20,
+) -> list[dict[str, str]]:
+  rng = random.Random(seed)
+  rows: list[dict[str, str]] = []
+  for student in students:
+    submitted_at = due_at + timedelta(minutes=rng.randint(-3 * 24 * 60, 6 * 60))
+    updated_at = submitted_at + timedelta(minutes=rng.randint(0, 120))
+    first_name, _, last_name = student.codepath_name.partition(" ")
+    rows.append({
+      "Member ID": str(student.member_id),
+      "First Name": first_name,
+      "Last Name": last_name,
+      "Full Name": student.codepath_name,
+      "Feature Score": str(rng.randint(0, max_points)),
+      "Status": rng.choice(SCORE_STATUSES),
+      "Submitted": format_codepath_timestamp(submitted_at),
+      "Updated": format_codepath_timestamp(updated_at),
+    })
+  return rows
+
+
+def generate_roster_rows(students: list[SyntheticStudent]) -> list[dict[str, str]]:
+  return [{"Student": student.canvas_name, "ID": str(student.user_id)} for student in students]
+
+
+def assignment_names(count: int) -> list[str]:
+  return [f"ASN - {index}" for index in range(1, count + 1)]
+
+
+def write_codepath_csv(path: Path, rows: list[dict[str, str]]) -> None:
+  fieldnames = ["First Name", "Last Name", "Submitted", "Updated", "Feature Score", "Status"]
+  with path.open("w", newline="", encoding="utf-8") as handle:
+    writer = csv.DictWriter(handle, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def write_gradebook_workbook(
+  path: Path,
+  rows_by_assignment: dict[str, list[dict[str, str]]],
+) -> None:
+  try:
+    import openpyxl
+  except ModuleNotFoundError as exc:
+    raise ModuleNotFoundError(
+      "openpyxl is required to write the synthetic gradebook workbook. Install requirements.txt first."
+    ) from exc
+
+  workbook = openpyxl.Workbook()
+  workbook.remove(workbook.active)
+  for assignment_name, rows in rows_by_assignment.items():
+    worksheet = workbook.create_sheet(assignment_name)
+    worksheet.append((f"{assignment_name} GRADEBOOK",))
+    worksheet.append(("Coursework Type", "ASN"))
+    worksheet.append(("Unit", 1))
+    worksheet.append(("Deadline", None))
+    worksheet.append(())
+    worksheet.append(("Member ID", "Github", "Status", "Full Name", "Feature Score", "Submitted", "Updated"))
+    for row in rows:
+      worksheet.append((
+        int(row["Member ID"]),
+        row["Full Name"].replace(" ", "").lower(),
+        row["Status"],
+        row["Full Name"],
+        int(row["Feature Score"]),
+        row["Submitted"],
+        row["Updated"],
+      ))
+  workbook.save(path)
+
+
+class FakeCanvasStudent:
+  def __init__(self, name: str, user_id: int):
+    self.name = name
+    self.user_id = user_id
+
+
+class FakeCanvasSubmission:
+  def __init__(self, user_id: int, latency: float = 0.0):
+    self.user_id = user_id
+    self.latency = latency
+    self.submitted_at = None
+    self.submission_type = None
+    self.excused = False
+    self.attachments = []
+    self.body = ""
+    self.url = ""
+    self.media_comment_id = None
+    self.edits: list[dict[str, object]] = []
+
+  def edit(self, **kwargs):
+    if self.latency:
+      time.sleep(self.latency)
+    self.edits.append(kwargs)
+    return True
+
+
+class FakeCanvasAssignment:
+  def __init__(self, assignment_id: int, name: str, latency: float = 0.0):
+    self.id = assignment_id
+    self.name = name
+    self.points_possible = 100.0
+    self.due_at = BENCHMARK_DUE_AT
+    self.latency = latency
+    self.submissions: dict[int, FakeCanvasSubmission] = {}
+    self.pushes: list[dict[str, object]] = []
+
+  def get_submission(self, user_id: int):
+    if self.latency:
+      time.sleep(self.latency)
+    if user_id not in self.submissions:
+      self.submissions[user_id] = FakeCanvasSubmission(user_id, latency=self.latency)
+    return self.submissions[user_id]
+
+  def push_feedback(self, user_id, score, comments, keep_previous_best=True, clobber_feedback=False, seconds_late=None):
+    if self.latency:
+      time.sleep(self.latency)
+    self.pushes.append({"user_id": user_id, "score": score, "seconds_late": seconds_late})
+    return True
+
+
+class FakeCanvasCourse:
+  def __init__(self, course_id: int, students: list[SyntheticStudent], latency: float = 0.0):
+    self.id = course_id
+    self.students = students
+    self.latency = latency
+    self.assignments: dict[int, FakeCanvasAssignment] = {}
+
+  def get_students(self, include_names: bool = False):
+    if self.latency:
+      time.sleep(self.latency)
+    return [FakeCanvasStudent(student.canvas_name, student.user_id) for student in self.students]
+
+  def get_assignment(self, assignment_id: int):
+    if self.latency:
+      time.sleep(self.latency)
+    if assignment_id not in self.assignments:
+      self.assignments[assignment_id] = FakeCanvasAssignment(
+        assignment_id,
+        f"Assignment {assignment_id}",
+        latency=self.latency,
+      )
+    return self.assignments[assignment_id]
+
+
+def make_fake_canvas_interface(students: list[SyntheticStudent], latency: float = 0.0):
+  courses: dict[int, FakeCanvasCourse] = {}
+
+  class FakeCanvasInterface:
+    def __init__(self, *args, **kwargs):
+      self.kwargs = kwargs
+
+    def get_course(self, course_id: int):
+      if course_id not in courses:
+        courses[course_id] = FakeCanvasCourse(course_id, students, latency=latency)
+      return courses[course_id]
+
+  FakeCanvasInterface.courses = courses
+  return FakeCanvasInterface
+
+
+def time_call(function, repeat: int) -> float:
+  timings: list[float] = []
+  for _ in range(max(repeat, 1)):
+    started = time.perf_counter()
+    function()
+    timings.append(time.perf_counter() - started)
+  return statistics.median(timings)
+
+
+def bench_name_resolution(students: list[SyntheticStudent], repeat: int) -> BenchmarkResult:
+  codepath_names = [student.codepath_name for student in students]
+  canvas_names = [student.canvas_name for student in students]
+  seconds = time_call(
+    lambda: codepath_to_canvas.resolve_name_matches(
+      codepath_names=codepath_names,
+      canvas_names=canvas_names,
+      existing_map={},
+      auto_match_threshold=96,
+      auto_match_gap=4,
+      suggestion_count=5,
+    ),
+    repeat,
+  )
+  fuzzy_count = len(build_alias_name_map(students))
+  return BenchmarkResult(
+    benchmark="name_resolution",
+    students=len(students),
+    assignments=1,
+    seconds=seconds,
+    per_item_us=seconds / max(len(students), 1) * 1e6,
+    repeat=repeat,
+    extra={"fuzzy_names": fuzzy_count},
+  )
+
+
+def bench_score_conversion(
+  students: list[SyntheticStudent],
+  assignment_count: int,
+  repeat: int,
+  *,
+  seed: int,
+) -> BenchmarkResult:
+  score_args = argparse.Namespace(
+    base_points=10.0,
+    stretch_points=10.0,
+    ignore_points=0.0,
+    stretch_weight=0.5,
+    canvas_value=100.0,
+  )
+  config = codepath_to_canvas.build_score_config(score_args, [], "benchmark")
+  rows_by_assignment = [
+    generate_codepath_rows(students, seed=seed + index)
+    for index in range(assignment_count)
+  ]
+
+  def convert_all() -> None:
+    for rows in rows_by_assignment:
+      for row in rows:
+        codepath_to_canvas.compute_canvas_score(
+          row,
+          config=config,
+          missing_as_zero=False,
+          leave_not_graded_blank=False,
+        )
+        codepath_to_canvas.compute_seconds_late(row, due_at=BENCHMARK_DUE_AT)
+
+  seconds = time_call(convert_all, repeat)
+  item_count = len(students) * assignment_count
+  return BenchmarkResult(
+    benchmark="score_conversion",
+    students=len(students),
+    assignments=assignment_count,
+    seconds=seconds,
+    per_item_us=seconds / max(item_count, 1) * 1e6,
+    repeat=repeat,
+  )
+
+
+def bench_workbook_load(
+  students: list[SyntheticStudent],
+  assignment_count: int,
+  repeat: int,
+  *,
+  seed: int,
+  workdir: Path,
+) -> BenchmarkResult:
+  names = assignment_names(assignment_count)
+  workbook_path = workdir / f"Gradebook-{len(students)}-{assignment_count}.xlsx"
+  write_gradebook_workbook(
+    workbook_path,
+    {
+      assignment_name: generate_codepath_rows(students, seed=seed + index)
+      for index, assignment_name in enumerate(names)
+    },
+  )
+
+  def load_all() -> None:
+    for assignment_name in names:
+      codepath_to_canvas.load_gradebook_assignment_rows(workbook_path, assignment_name)
+
+  seconds = time_call(load_all, repeat)
+  item_count = len(students) * assignment_count
+  return BenchmarkResult(
+    benchmark="workbook_load",
+    students=len(students),
+    assignments=assignment_count,
+    seconds=seconds,
+    per_item_us=seconds / max(item_count, 1) * 1e6,
+    repeat=repeat,
+    extra={"workbook_bytes": workbook_path.stat().st_size},
+  )
+
+
+def prepare_push_inputs(
+  root: Path,
+  students: list[SyntheticStudent],
+  assignment_count: int,
+  *,
+  seed: int,
+) -> tuple[Path, Path]:
+  names = assignment_names(assignment_count)
+  assignments_yaml = root / "assignments.yaml"
+  name_map = root / "name_map.yaml"
+  payload: dict[str, object] = {"course-id": 1}
+  for index, assignment_name in enumerate(names):
+    payload[assignment_name] = {"assignment-id": 1000 + index, "base": 10, "stretch": 10, "ignore": 0}
+    write_codepath_csv(
+      root / f"codepath-{assignment_name}.csv",
+      generate_codepath_rows(students, seed=seed + index),
+    )
+  assignments_yaml.write_text(yaml.safe_dump(payload, sort_keys=False), encoding="utf-8")
+  codepath_to_canvas.save_name_map(name_map, build_alias_name_map(students))
+  return assignments_yaml, name_map
+
+
+def run_push_pipeline(
+  root: Path,
+  students: list[SyntheticStudent],
+  assignments_yaml: Path,
+  name_map: Path,
+  latency: float,
+):
+  fake_interface = make_fake_canvas_interface(students, latency=latency)
+  with (
+    mock.patch.object(codepath_to_canvas, "CanvasInterface", fake_interface),
+    mock.patch("sys.stdin.isatty", return_value=False),
+    contextlib.redirect_stdout(io.StringIO()),
+    contextlib.redirect_stderr(io.StringIO()) as stderr,
+  ):
+    exit_code = codepath_to_canvas.main([
+      "--assignments",
+      str(assignments_yaml),
+      "--data-dir",
+      str(root),
+      "--name-map",
+      str(name_map),
+    ])
+  if exit_code != 0:
+    raise RuntimeError(f"Benchmark push pipeline failed:\n{stderr.getvalue()}")
+  return fake_interface
+
+
+def bench_end_to_end_push(
+  students: list[SyntheticStudent],
+  assignment_count: int,
+  repeat: int,
+  *,
+  seed: int,
+  latency_ms: float,
+  workdir: Path,
+) -> BenchmarkResult:
+  root = workdir / f"push-{len(students)}-{assignment_count}"
+  root.mkdir()
+  assignments_yaml, name_map = prepare_push_inputs(root, students, assignment_count, seed=seed)
+  pushes: list[int] = []
+
+  def push_all() -> None:
+    fake_interface = run_push_pipeline(root, students, assignments_yaml, name_map, latency_ms / 1000.0)
+    pushes.append(sum(
+      len(assignment.pushes)
+      for course in fake_interface.courses.values()
+      for assignment in course.assignments.values()
+    ))
+
+  seconds = time_call(push_all, repeat)
+  item_count = len(students) * assignment_count
+  return BenchmarkResult(
+    benchmark="end_to_end_push",
+    students=len(students),
+    assignments=assignment_count,
+    seconds=seconds,
+    per_item_us=seconds / max(item_count, 1) * 1e6,
+    latency_ms=latency_ms,
+    repeat=repeat,
+    extra={"pushes": pushes[-1] if pushes else 0},
+  )
+
+
+def run_benchmarks(
+  *,
+  sizes: list[int],
+  assignment_counts: list[int],
+  benchmarks: list[str],
+  repeat: int = 3,
+  latency_ms: float = 0.0,
+  seed: int = 0,
+) -> list[BenchmarkResult]:
+  results: list[BenchmarkResult] = []
+  with tempfile.TemporaryDirectory() as tempdir:
+    workdir = Path(tempdir)
+    for size in sizes:
+      students = generate_students(size, seed=seed)
+      if "name_resolution" in benchmarks:
+        results.append(bench_name_resolution(students, repeat))
+      for assignment_count in assignment_counts:
+        if "score_conversion" in benchmarks:
+          results.append(bench_score_conversion(students, assignment_count, repeat, seed=seed))
+        if "workbook_load" in benchmarks:
+          results.append(
+            bench_workbook_load(students, assignment_count, repeat, seed=seed, workdir=workdir)
+          )
+        if "end_to_end_push" in benchmarks:
+          results.append(
+            bench_end_to_end_push(
+              students,
+              assignment_count,
+              repeat,
+              seed=seed,
+              latency_ms=latency_ms,
+              workdir=workdir,
+            )
+          )
+  return results
+
+
+def get_git_commit() -> str | None:
+  try:
+    completed = subprocess.run(
+      ["git", "rev-parse", "HEAD"],
+      capture_output=True,
+      text=True,
+      check=True,
+      cwd=Path(__file__).resolve().parent,
+    )
+  except (OSError, subprocess.CalledProcessError):
+    return None
+  return completed.stdout.strip() or None
+
+
+def build_report(results: list[BenchmarkResult]) -> dict[str, object]:
+  return {
+    "commit": get_git_commit(),
+    "created_at": datetime.now(codepath_to_canvas.LOS_ANGELES).isoformat(),
+    "python": platform.python_version(),
+    "platform": platform.platform(),
+    "results": [asdict(result) for result in results],
+  }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(
+    description="Benchmark the CodePath to Canvas pipeline on synthetic rosters and a fake LMS."
+  )
+  parser.add_argument(
+    "--sizes",
+    type=int,
+    nargs="+",
+    default=list(DEFAULT_SIZES),
+    help="Roster sizes to benchmark.",
+  )
+  parser.add_argument(
+    "--assignment-counts",
+    type=int,
+    nargs="+",
+    default=list(DEFAULT_ASSIGNMENT_COUNTS),
+    help="Assignment counts to benchmark for score conversion, workbook load and push.",
+  )
+  parser.add_argument(
+    "--only",
+    action="append",
+    choices=BENCHMARK_NAMES,
+    help="Run only the named benchmark. May be repeated.",
+  )
+  parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the median is reported.")
+  parser.add_argument(
+    "--latency-ms",
+    type=float,
+    default=0.0,
+    help="Simulated per-call latency of the fake LMS in milliseconds.",
+  )
+  parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic data generators.")
+  parser.add_argument(
+    "--quick",
+    action="store_true",
+    help="Run only the smallest roster with a single assignment.",
+  )
+  parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+  args = parser.parse_args(argv)
+
+  if args.quick:
+    args.sizes = [min(args.sizes)]
+    args.assignment_counts = [min(args.assignment_counts)]
+  if any(size <= 0 for size in args.sizes) or any(count <= 0 for count in args.assignment_counts):
+    parser.error("--sizes and --assignment-counts must be positive.")
+  return args
+
+
+def main(argv: list[str] | None = None) -> int:
+  args = parse_args(argv)
+  results = run_benchmarks(
+    sizes=args.sizes,
+    assignment_counts=args.assignment_counts,
+    benchmarks=args.only or list(BENCHMARK_NAMES),
+    repeat=args.repeat,
+    latency_ms=args.latency_ms,
+    seed=args.seed,
+  )
+  for result in results:
+    print(
+      f"{result.benchmark:>16} students={result.students:<5} assignments={result.assignments:<3} "
+      f"{result.seconds:9.4f}s {result.per_item_us:10.2f}us/item",
+      file=sys.stderr,
+    )
+
+  report = json.dumps(build_report(results), indent=2)
+  if args.output:
+    Path(args.output).write_text(report + "\n", encoding="utf-8")
+  else:
+    print(report)
+  return 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
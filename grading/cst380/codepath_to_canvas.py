@@ -2,23 +2,40 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
 import csv
+import functools
+import hashlib
+import importlib.util
 import inspect
+import io
+import json
+import os
+import stat
 import sys
-import unicodedata
-from dataclasses import dataclass
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
 from lms_interface.canvas_interface import CanvasInterface
+from nametools import matching
+from nametools.aliases import group_aliases_by_canonical, load_alias_map
+from nametools.matching import NameCandidateIndex, normalize_name, token_key, token_key_without_initials
 import yaml
-from thefuzz import fuzz
-from thefuzz import process
+from push_history import PushHistoryRecord, PushHistoryStore, hash_feedback
 
 
 POINTS_POSSIBLE_LABEL = "    Points Possible"
 LOS_ANGELES = ZoneInfo("America/Los_Angeles")
+ATOMIC_WRITE_BUFFER_SIZE = 1 << 20
+NAME_MAP_LOCK = threading.Lock()
+LATE_POLICY_LOCK = threading.Lock()
+SUGGESTIONS_LOCK = threading.Lock()
 
 
 @dataclass(frozen=True)
@@ -59,6 +76,196 @@ class SubmissionDecision:
   seconds_late: int | None = None
 
 
+@dataclass
+class SuggestionCache:
+  path: Path | None
+  entries: dict[str, list[tuple[str, int]]] = field(default_factory=dict)
+  touched: set[str] = field(default_factory=set)
+  dirty: bool = False
+  lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+  def get(self, key: str) -> list[MatchSuggestion] | None:
+    with self.lock:
+      cached = self.entries.get(key)
+      if cached is None:
+        return None
+      self.touched.add(key)
+    return [MatchSuggestion(canvas_name=name, score=score) for name, score in cached]
+
+  def put(self, key: str, suggestions: list[MatchSuggestion]) -> None:
+    with self.lock:
+      self.entries[key] = [(suggestion.canvas_name, suggestion.score) for suggestion in suggestions]
+      self.touched.add(key)
+      self.dirty = True
+
+
+@dataclass
+class LatePolicyResult:
+  now: datetime
+  submissions: dict[int, object] = field(default_factory=dict)
+  decisions: dict[int, SubmissionDecision] = field(default_factory=dict)
+  fetch_failed: set[int] = field(default_factory=set)
+  datetime_cache: dict[object, datetime | None] = field(default_factory=dict)
+  timestamp_cache: dict[tuple[str, datetime | None], datetime | None] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class GradeRecord:
+  course_id: int | None
+  assignment: str
+  canvas_student: str
+  codepath_student: str | None
+  user_id: int | None
+  status: str | None
+  raw_score: float | None
+  adjusted_raw_score: float | None
+  base_earned: float | None
+  stretch_earned: float | None
+  weighted_total: float | None
+  canvas_score: float | None
+  seconds_late: int | None
+  action: str | None
+  outcome: str
+
+
+@dataclass
+class GradeExport:
+  records: list[GradeRecord] = field(default_factory=list)
+  lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+  def add(
+    self,
+    *,
+    course_id: int | None,
+    assignment: str,
+    canvas_student: str,
+    outcome: str,
+    config: ScoreConfig,
+    codepath_row: dict[str, str] | None = None,
+    user_id: int | None = None,
+    decision: SubmissionDecision | None = None,
+    score: float | None = None,
+  ) -> None:
+    breakdown = None
+    feature_score_text = codepath_row.get("Feature Score", "").strip() if codepath_row else ""
+    if feature_score_text:
+      breakdown = build_score_breakdown(float(feature_score_text), config)
+    record = GradeRecord(
+      course_id=course_id,
+      assignment=assignment,
+      canvas_student=canvas_student,
+      codepath_student=get_codepath_name(codepath_row) if codepath_row else None,
+      user_id=user_id,
+      status=codepath_row.get("Status", "").strip() if codepath_row else None,
+      raw_score=breakdown.raw_score if breakdown else None,
+      adjusted_raw_score=breakdown.adjusted_raw_score if breakdown else None,
+      base_earned=breakdown.base_earned if breakdown else None,
+      stretch_earned=breakdown.stretch_earned if breakdown else None,
+      weighted_total=breakdown.weighted_total if breakdown else None,
+      canvas_score=score,
+      seconds_late=decision.seconds_late if decision else None,
+      action=decision.action if decision else None,
+      outcome=outcome,
+    )
+    with self.lock:
+      self.records.append(record)
+
+
+@dataclass(frozen=True)
+class CourseTarget:
+  label: str
+  course_id: int
+  assignment_ids: dict[str, int]
+  requests_per_second: float | None = None
+
+
+@dataclass(frozen=True)
+class PushSummary:
+  assignment: str
+  pushed: int
+  marked_missing: int
+  skipped_blank: int
+  skipped_no_action: int
+  skipped_unmatched_canvas: int
+  failed: int
+
+
+@dataclass
+class PhaseTotal:
+  seconds: float = 0.0
+  count: int = 0
+
+
+@dataclass
+class PhaseTracer:
+  events: list[dict[str, object]] = field(default_factory=list)
+  totals: dict[str, PhaseTotal] = field(default_factory=dict)
+  origin: float = field(default_factory=time.perf_counter)
+  lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+  def record(self, name: str, started: float, finished: float, **fields) -> None:
+    with self.lock:
+      total = self.totals.setdefault(name, PhaseTotal())
+      total.seconds += finished - started
+      total.count += 1
+      self.events.append({
+        "name": name,
+        "cat": "codepath_to_canvas",
+        "ph": "X",
+        "ts": round((started - self.origin) * 1e6, 3),
+        "dur": round((finished - started) * 1e6, 3),
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": {key: value for key, value in fields.items() if value is not None},
+      })
+
+  def accumulate(self, name: str, seconds: float) -> None:
+    with self.lock:
+      total = self.totals.setdefault(name, PhaseTotal())
+      total.seconds += seconds
+      total.count += 1
+
+  @contextlib.contextmanager
+  def span(self, name: str, **fields):
+    started = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.record(name, started, time.perf_counter(), **fields)
+
+  @contextlib.contextmanager
+  def timed(self, name: str):
+    started = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.accumulate(name, time.perf_counter() - started)
+
+  def write_chrome_trace(self, path: Path) -> None:
+    with self.lock:
+      events = list(self.events)
+    metadata = {
+      "name": "process_name",
+      "ph": "M",
+      "pid": os.getpid(),
+      "args": {"name": "codepath_to_canvas"},
+    }
+    path.write_text(
+      json.dumps({"traceEvents": [metadata, *events], "displayTimeUnit": "ms"}),
+      encoding="utf-8",
+    )
+
+  def print_summary(self) -> None:
+    with self.lock:
+      totals = dict(self.totals)
+    if not totals:
+      return
+    print("\nPhase timings:")
+    width = max(len(name) for name in totals)
+    for name, total in totals.items():
+      print(f"  {name.ljust(width)}  {total.seconds:9.3f}s  ({total.count}x)")
+
+
 def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
   parser = argparse.ArgumentParser(
     description="Push CodePath grades to Canvas in batch using assignments.yaml."
@@ -160,6 +367,32 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     action="store_true",
     help="Use CodePath Updated instead of Submitted for deadline comparison when both exist.",
   )
+  parser.add_argument(
+    "--trace",
+    help="Write a Chrome trace / Perfetto-compatible JSON file with per-phase spans for the run.",
+  )
+  parser.add_argument(
+    "--push-history",
+    help="Append every Canvas push, missing mark and failure to this SQLite history (query it with push_history.py).",
+  )
+  parser.add_argument(
+    "--export-parquet",
+    help=(
+      "Write one columnar table of computed grades, decisions and push outcomes for the run. "
+      "Uses Arrow IPC when the path ends in .arrow, .feather or .ipc, Parquet otherwise."
+    ),
+  )
+  parser.add_argument(
+    "--watch",
+    action="store_true",
+    help="Keep running and re-push only the assignments whose gradebook sheet or CodePath CSV changed.",
+  )
+  parser.add_argument(
+    "--watch-interval",
+    type=float,
+    default=2.0,
+    help="Seconds between file checks in --watch mode.",
+  )
   args = parser.parse_args(argv)
 
   if args.assignments and sys.stdin.isatty():
@@ -187,6 +420,13 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
       parser.error("Batch mode requires --assignments and either --data-dir or --xls.")
     if args.out:
       parser.error("--out is only supported in single-file mode.")
+  if args.watch and single_mode:
+    parser.error("--watch is only supported in batch mode.")
+  if args.watch_interval <= 0:
+    parser.error("--watch-interval must be positive.")
+  # Checked up front: the export is written when the run ends, too late to report a missing dependency.
+  if args.export_parquet and importlib.util.find_spec("pyarrow") is None:
+    parser.error("--export-parquet requires pyarrow. Install requirements.txt first.")
 
   return args
 
@@ -240,19 +480,6 @@ def build_score_config(
   )
 
 
-def normalize_name(name: str) -> str:
-  normalized = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
-  return " ".join("".join(ch.lower() if ch.isalnum() else " " for ch in normalized).split())
-
-
-def token_key(name: str) -> tuple[str, ...]:
-  return tuple(sorted(normalize_name(name).split()))
-
-
-def token_key_without_initials(name: str) -> tuple[str, ...]:
-  return tuple(sorted(token for token in normalize_name(name).split() if len(token) > 1))
-
-
 def read_codepath_rows(path: Path) -> list[dict[str, str]]:
   with path.open(newline="", encoding="utf-8-sig") as handle:
     reader = csv.DictReader(handle)
@@ -301,6 +528,13 @@ def load_gradebook_assignment_rows(
   workbook_path: Path,
   assignment_name: str,
 ) -> tuple[list[dict[str, str]], str | None]:
+  return load_gradebook_workbook_rows(workbook_path, [assignment_name])[assignment_name]
+
+
+def load_gradebook_workbook_rows(
+  workbook_path: Path,
+  assignment_names: list[str],
+) -> dict[str, tuple[list[dict[str, str]], str | None]]:
   try:
     import openpyxl
   except ModuleNotFoundError as exc:
@@ -310,80 +544,130 @@ def load_gradebook_assignment_rows(
 
   workbook = openpyxl.load_workbook(workbook_path, data_only=True, read_only=True)
   try:
-    if assignment_name not in workbook.sheetnames:
-      return [], f"Gradebook sheet {assignment_name!r} was not found in {workbook_path.name}."
-
-    worksheet = workbook[assignment_name]
-    row_iter = worksheet.iter_rows(values_only=True)
-    header_found = False
-    header_indexes: dict[str, list[int]] = {}
-    rows: list[dict[str, str]] = []
-    seen_data = False
-    empty_member_id_run = 0
+    results: dict[str, tuple[list[dict[str, str]], str | None]] = {}
+    for assignment_name in assignment_names:
+      if assignment_name not in workbook.sheetnames:
+        results[assignment_name] = (
+          [],
+          f"Gradebook sheet {assignment_name!r} was not found in {workbook_path.name}.",
+        )
+        continue
+      results[assignment_name] = parse_gradebook_worksheet(
+        workbook[assignment_name],
+        assignment_name,
+        workbook_path.name,
+      )
+    return results
+  finally:
+    workbook.close()
+
 
-    def get_value(values_row, header: str) -> str:
-      indexes = header_indexes.get(header)
-      if not indexes or not values_row:
-        return ""
-      first_value: str | None = None
-      for index in indexes:
-        if index >= len(values_row):
+def parse_gradebook_worksheet(
+  worksheet,
+  assignment_name: str,
+  workbook_name: str,
+) -> tuple[list[dict[str, str]], str | None]:
+  row_iter = worksheet.iter_rows(values_only=True)
+  header_found = False
+  header_indexes: dict[str, list[int]] = {}
+  rows: list[dict[str, str]] = []
+  seen_data = False
+  empty_member_id_run = 0
+
+  def get_value(values_row, header: str) -> str:
+    indexes = header_indexes.get(header)
+    if not indexes or not values_row:
+      return ""
+    first_value: str | None = None
+    for index in indexes:
+      if index >= len(values_row):
+        continue
+      candidate = normalize_sheet_text(values_row[index])
+      if first_value is None:
+        first_value = candidate
+      if candidate:
+        return candidate
+    return first_value or ""
+
+  for row_index, values in enumerate(row_iter, start=1):
+    if not header_found:
+      if row_index > 20:
+        break
+      normalized_headers: dict[str, list[int]] = {}
+      for index, cell in enumerate(values or ()):
+        normalized = normalize_sheet_text(cell).strip().lower()
+        if not normalized:
           continue
-        candidate = normalize_sheet_text(values_row[index])
-        if first_value is None:
-          first_value = candidate
-        if candidate:
-          return candidate
-      return first_value or ""
-
-    for row_index, values in enumerate(row_iter, start=1):
-      if not header_found:
-        if row_index > 20:
+        normalized_headers.setdefault(normalized, []).append(index)
+      required = {"member id", "status", "full name"}
+      if required.issubset(normalized_headers) and ("feature score" in normalized_headers or "score" in normalized_headers):
+        header_found = True
+        header_indexes = dict(normalized_headers)
+      continue
+
+    member_id = get_value(values, "member id")
+    if not member_id:
+      if seen_data:
+        empty_member_id_run += 1
+        if empty_member_id_run >= 25:
           break
-        normalized_headers: dict[str, list[int]] = {}
-        for index, cell in enumerate(values or ()):
-          normalized = normalize_sheet_text(cell).strip().lower()
-          if not normalized:
-            continue
-          normalized_headers.setdefault(normalized, []).append(index)
-        required = {"member id", "status", "full name"}
-        if required.issubset(normalized_headers) and ("feature score" in normalized_headers or "score" in normalized_headers):
-          header_found = True
-          header_indexes = dict(normalized_headers)
-        continue
+      continue
 
-      member_id = get_value(values, "member id")
-      if not member_id:
-        if seen_data:
-          empty_member_id_run += 1
-          if empty_member_id_run >= 25:
-            break
-        continue
+    seen_data = True
+    empty_member_id_run = 0
+    row = {
+      "Member ID": member_id,
+      "Status": get_value(values, "status"),
+      "Full Name": get_value(values, "full name"),
+      "Feature Score": get_value(values, "feature score") or get_value(values, "score"),
+      "Submitted": get_value(values, "submitted"),
+      "Updated": get_value(values, "updated"),
+    }
+    if not row["Full Name"]:
+      continue
+    rows.append(row)
 
-      seen_data = True
-      empty_member_id_run = 0
-      row = {
-        "Member ID": member_id,
-        "Status": get_value(values, "status"),
-        "Full Name": get_value(values, "full name"),
-        "Feature Score": get_value(values, "feature score") or get_value(values, "score"),
-        "Submitted": get_value(values, "submitted"),
-        "Updated": get_value(values, "updated"),
-      }
-      if not row["Full Name"]:
-        continue
-      rows.append(row)
+  if not header_found:
+    raise ValueError(
+      f"Could not find the gradebook header row in sheet {assignment_name!r} of {workbook_name}."
+    )
 
-    if not header_found:
-      raise ValueError(
-        f"Could not find the gradebook header row in sheet {assignment_name!r} of {workbook_path.name}."
-      )
+  if not rows:
+    return [], f"Gradebook sheet {assignment_name!r} contains no student rows yet."
+  return rows, None
 
-    if not rows:
-      return [], f"Gradebook sheet {assignment_name!r} contains no student rows yet."
-    return rows, None
-  finally:
-    workbook.close()
+
+def gradebook_file_key(workbook_path: Path) -> tuple[str, int, int]:
+  stat = workbook_path.stat()
+  return str(workbook_path.resolve()), stat.st_mtime_ns, stat.st_size
+
+
+def load_cached_gradebook_rows(
+  workbook_path: Path,
+  assignment_name: str,
+  gradebook_cache: dict[tuple, tuple[list[dict[str, str]], str | None]] | None = None,
+) -> tuple[list[dict[str, str]], str | None]:
+  if gradebook_cache is None:
+    return load_gradebook_assignment_rows(workbook_path, assignment_name)
+  key = (*gradebook_file_key(workbook_path), assignment_name)
+  if key not in gradebook_cache:
+    gradebook_cache[key] = load_gradebook_assignment_rows(workbook_path, assignment_name)
+  return gradebook_cache[key]
+
+
+def prime_gradebook_cache(
+  workbook_path: Path,
+  assignment_names: list[str],
+  gradebook_cache: dict[tuple, tuple[list[dict[str, str]], str | None]],
+) -> dict[str, tuple[list[dict[str, str]], str | None]]:
+  file_key = gradebook_file_key(workbook_path)
+  for stale_key in [key for key in gradebook_cache if key[0] == file_key[0] and key[:3] != file_key]:
+    del gradebook_cache[stale_key]
+  missing = [name for name in assignment_names if (*file_key, name) not in gradebook_cache]
+  if missing:
+    for assignment_name, result in load_gradebook_workbook_rows(workbook_path, missing).items():
+      gradebook_cache[(*file_key, assignment_name)] = result
+  return {name: gradebook_cache[(*file_key, name)] for name in assignment_names}
 
 
 def resolve_batch_assignment_input(
@@ -392,17 +676,18 @@ def resolve_batch_assignment_input(
   data_dir: Path,
   gradebook_path: Path | None,
   prefer_gradebook: bool = False,
+  gradebook_cache: dict[tuple, tuple[list[dict[str, str]], str | None]] | None = None,
 ) -> tuple[Path | None, list[dict[str, str]] | None, str | None, str | None]:
   if gradebook_path is not None:
     if prefer_gradebook:
-      gradebook_rows, skip_message = load_gradebook_assignment_rows(gradebook_path, assignment_name)
+      gradebook_rows, skip_message = load_cached_gradebook_rows(gradebook_path, assignment_name, gradebook_cache)
       return None, gradebook_rows, skip_message, None
   codepath_path = data_dir / f"codepath-{assignment_name}.csv"
   if codepath_path.exists():
     return codepath_path, None, None, None
 
   if gradebook_path is not None:
-    gradebook_rows, skip_message = load_gradebook_assignment_rows(gradebook_path, assignment_name)
+    gradebook_rows, skip_message = load_cached_gradebook_rows(gradebook_path, assignment_name, gradebook_cache)
     return None, gradebook_rows, skip_message, None
 
   return None, None, None, f"Missing CodePath CSV for {assignment_name}: expected {codepath_path.name}"
@@ -415,36 +700,47 @@ def read_canvas_rows(path: Path) -> tuple[list[str], list[dict[str, str]]]:
     return reader.fieldnames or [], rows
 
 
-def load_name_map(path: Path | None) -> dict[str, str]:
-  if path is None or not path.exists():
-    return {}
+def file_matches_content(path: Path, content: bytes) -> bool:
+  try:
+    if path.stat().st_size != len(content):
+      return False
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+      for chunk in iter(lambda: handle.read(ATOMIC_WRITE_BUFFER_SIZE), b""):
+        digest.update(chunk)
+  except OSError:
+    return False
+  return digest.digest() == hashlib.sha256(content).digest()
 
-  loaded = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
-  if isinstance(loaded, dict) and "CONFIRMED" in loaded:
-    loaded = loaded["CONFIRMED"] or {}
-  if isinstance(loaded, dict) and "matches" in loaded:
-    loaded = loaded["matches"] or {}
 
-  if not isinstance(loaded, dict):
-    raise ValueError(f"Name map at {path} must be a mapping or contain a top-level 'matches' key.")
+def write_file_atomically(path: Path, content: bytes, *, skip_unchanged: bool = True) -> bool:
+  if skip_unchanged and file_matches_content(path, content):
+    return False
 
-  if all(isinstance(value, list) for value in loaded.values()):
-    mapping: dict[str, str] = {}
-    for canonical_name, aliases in loaded.items():
-      if canonical_name == "UNMATCHED":
-        continue
-      for alias in aliases:
-        mapping[str(alias)] = str(canonical_name)
-    return mapping
+  try:
+    mode = stat.S_IMODE(path.stat().st_mode)
+  except FileNotFoundError:
+    umask = os.umask(0)
+    os.umask(umask)
+    mode = 0o666 & ~umask
 
-  return {str(source): str(target) for source, target in loaded.items() if target}
+  file_descriptor, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+  try:
+    with open(file_descriptor, "wb", buffering=ATOMIC_WRITE_BUFFER_SIZE) as handle:
+      handle.write(content)
+      handle.flush()
+      os.fsync(handle.fileno())
+    os.chmod(temp_name, mode)
+    os.replace(temp_name, path)
+  except BaseException:
+    with contextlib.suppress(FileNotFoundError):
+      os.unlink(temp_name)
+    raise
+  return True
 
 
-def group_aliases_by_canonical(mapping: dict[str, str]) -> dict[str, list[str]]:
-  grouped: dict[str, list[str]] = {}
-  for source_name, canonical_name in sorted(mapping.items(), key=lambda item: (item[1], item[0])):
-    grouped.setdefault(canonical_name, []).append(source_name)
-  return grouped
+def load_name_map(path: Path | None) -> dict[str, str]:
+  return load_alias_map(path)
 
 
 def save_name_map(
@@ -452,7 +748,7 @@ def save_name_map(
   confirmed_mapping: dict[str, str],
   suggested_mapping: dict[str, str] | None = None,
   unmatched: list[str] | None = None,
-) -> None:
+) -> bool:
   payload: dict[str, object] = {}
   confirmed_grouped = group_aliases_by_canonical(confirmed_mapping)
   if confirmed_grouped:
@@ -462,15 +758,14 @@ def save_name_map(
   if unmatched:
     payload["UNMATCHED"] = sorted(unmatched)
 
-  with path.open("w", encoding="utf-8") as handle:
-    yaml.safe_dump(
-      payload,
-      handle,
-      sort_keys=False,
-      allow_unicode=False,
-      indent=2,
-      default_flow_style=False,
-    )
+  content = yaml.safe_dump(
+    payload,
+    sort_keys=False,
+    allow_unicode=False,
+    indent=2,
+    default_flow_style=False,
+  )
+  return write_file_atomically(path, content.encode("utf-8"))
 
 
 def get_codepath_name(row: dict[str, str]) -> str:
@@ -493,22 +788,115 @@ def build_exact_name_indexes(
   return exact, without_initials
 
 
+# Version 2: scores come from nametools/rapidfuzz and the key records the scorer implementation.
+SUGGESTION_CACHE_VERSION = 2
+BLOCKING_MIN_ROSTER = 100
+SUGGESTION_SCORER = "token_set_ratio"
+
+
+def select_suggestion_candidates(
+  codepath_name: str,
+  canvas_names: list[str],
+  used_canvas_names: set[str],
+  suggestion_count: int,
+  candidate_index: NameCandidateIndex | None = None,
+) -> list[str]:
+  if candidate_index is not None:
+    candidates = candidate_index.candidates(codepath_name, excluded=used_canvas_names)
+    if len(candidates) >= suggestion_count:
+      return candidates
+  return [name for name in canvas_names if name not in used_canvas_names]
+
+
+def get_suggestion_cache_path(name_map_path: Path) -> Path:
+  return name_map_path.with_name(f"{name_map_path.stem}.suggestions.json")
+
+
+def load_suggestion_cache(path: Path | None) -> SuggestionCache:
+  if path is None or not path.exists():
+    return SuggestionCache(path=path)
+  try:
+    loaded = json.loads(path.read_text(encoding="utf-8"))
+  except (OSError, ValueError):
+    return SuggestionCache(path=path)
+  if not isinstance(loaded, dict) or loaded.get("version") != SUGGESTION_CACHE_VERSION:
+    return SuggestionCache(path=path)
+  entries = {
+    str(key): [(str(name), int(score)) for name, score in suggestions]
+    for key, suggestions in (loaded.get("entries") or {}).items()
+  }
+  return SuggestionCache(path=path, entries=entries)
+
+
+def save_suggestion_cache(cache: SuggestionCache) -> None:
+  with cache.lock:
+    if cache.path is None or not cache.dirty:
+      return
+    # Only keep entries used by this run so suggestions for old rosters age out.
+    entries = {key: cache.entries[key] for key in sorted(cache.touched)}
+    write_file_atomically(
+      cache.path,
+      json.dumps({"version": SUGGESTION_CACHE_VERSION, "entries": entries}, indent=1).encode("utf-8"),
+    )
+    cache.dirty = False
+
+
+def get_roster_fingerprint(canvas_names: list[str]) -> str:
+  digest = hashlib.sha256()
+  for name in sorted(canvas_names):
+    digest.update(name.encode("utf-8"))
+    digest.update(b"\0")
+  return digest.hexdigest()[:16]
+
+
+def get_name_hash(name: str) -> int:
+  return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def get_suggestion_cache_key(
+  codepath_name: str,
+  roster_fingerprint: str,
+  scorer_name: str,
+  suggestion_count: int,
+) -> str:
+  return (
+    f"{scorer_name}|{matching.SCORER_IMPLEMENTATION}|{suggestion_count}|{roster_fingerprint}|"
+    f"{normalize_name(codepath_name)}"
+  )
+
+
 def get_match_suggestions(
   codepath_name: str,
   available_canvas_names: list[str],
   suggestion_count: int,
+  suggestion_cache: SuggestionCache | None = None,
+  roster_fingerprint: str | None = None,
 ) -> list[MatchSuggestion]:
   if not available_canvas_names:
     return []
 
-  matches = process.extract(
+  cache_key = None
+  if suggestion_cache is not None:
+    cache_key = get_suggestion_cache_key(
+      codepath_name,
+      roster_fingerprint or get_roster_fingerprint(available_canvas_names),
+      SUGGESTION_SCORER,
+      suggestion_count,
+    )
+    cached = suggestion_cache.get(cache_key)
+    if cached is not None:
+      return cached
+
+  matches = matching.extract(
     codepath_name,
     available_canvas_names,
-    scorer=fuzz.token_set_ratio,
-    processor=normalize_name,
+    scorer=SUGGESTION_SCORER,
     limit=suggestion_count,
   )
-  return [MatchSuggestion(canvas_name=name, score=score) for name, score in matches]
+  suggestions = [MatchSuggestion(canvas_name=name, score=score) for name, score in matches]
+  if cache_key is not None:
+    suggestion_cache.put(cache_key, suggestions)
+  return suggestions
 
 
 def resolve_name_matches(
@@ -518,8 +906,21 @@ def resolve_name_matches(
   auto_match_threshold: int,
   auto_match_gap: int,
   suggestion_count: int,
+  suggestion_cache: SuggestionCache | None = None,
 ) -> tuple[dict[str, str], dict[str, str], dict[str, list[MatchSuggestion]], list[str]]:
   exact_index, no_initials_index = build_exact_name_indexes(canvas_names)
+  candidate_index = NameCandidateIndex(canvas_names) if len(canvas_names) >= BLOCKING_MIN_ROSTER else None
+  canvas_name_set = set(canvas_names)
+  used_canvas_names: set[str] = set()
+  # The candidates for a name depend only on the roster and the names used so far, so the cache key
+  # pairs a roster fingerprint taken once with an order-independent running hash of the used names.
+  roster_fingerprint = get_roster_fingerprint(canvas_names) if suggestion_cache is not None else None
+  used_names_hash = 0
+
+  def mark_used(canvas_name: str) -> None:
+    nonlocal used_names_hash
+    used_canvas_names.add(canvas_name)
+    used_names_hash = (used_names_hash + get_name_hash(canvas_name)) % (1 << 64)
   confirmed_matches: dict[str, str] = {}
   suggested_matches: dict[str, str] = {}
   unresolved_suggestions: dict[str, list[MatchSuggestion]] = {}
@@ -528,47 +929,53 @@ def resolve_name_matches(
   for codepath_name in codepath_names:
     mapped_canvas_name = existing_map.get(codepath_name)
     if mapped_canvas_name:
-      if mapped_canvas_name not in canvas_names:
+      if mapped_canvas_name not in canvas_name_set:
         warnings.append(
           f"Name map entry for {codepath_name!r} points to missing Canvas name {mapped_canvas_name!r}."
         )
-      elif (
-        mapped_canvas_name in confirmed_matches.values()
-        or mapped_canvas_name in suggested_matches.values()
-      ):
+      elif mapped_canvas_name in used_canvas_names:
         warnings.append(
           f"Name map entry for {codepath_name!r} duplicates Canvas name {mapped_canvas_name!r}."
         )
       else:
         confirmed_matches[codepath_name] = mapped_canvas_name
+        mark_used(mapped_canvas_name)
         continue
 
     exact_matches = [
       candidate
       for candidate in exact_index.get(token_key(codepath_name), [])
-      if candidate not in confirmed_matches.values() and candidate not in suggested_matches.values()
+      if candidate not in used_canvas_names
     ]
     if len(exact_matches) == 1:
       confirmed_matches[codepath_name] = exact_matches[0]
+      mark_used(exact_matches[0])
       continue
 
     no_initials_matches = [
       candidate
       for candidate in no_initials_index.get(token_key_without_initials(codepath_name), [])
-      if candidate not in confirmed_matches.values() and candidate not in suggested_matches.values()
+      if candidate not in used_canvas_names
     ]
     if len(no_initials_matches) == 1:
       confirmed_matches[codepath_name] = no_initials_matches[0]
+      mark_used(no_initials_matches[0])
       continue
 
     suggestions = get_match_suggestions(
       codepath_name,
-      [
-        name
-        for name in canvas_names
-        if name not in confirmed_matches.values() and name not in suggested_matches.values()
-      ],
+      select_suggestion_candidates(
+        codepath_name,
+        canvas_names,
+        used_canvas_names,
+        suggestion_count,
+        candidate_index=candidate_index,
+      ),
       suggestion_count=suggestion_count,
+      suggestion_cache=suggestion_cache,
+      roster_fingerprint=(
+        f"{roster_fingerprint}-{used_names_hash:016x}" if roster_fingerprint is not None else None
+      ),
     )
     unresolved_suggestions[codepath_name] = suggestions
 
@@ -577,6 +984,7 @@ def resolve_name_matches(
       next_score = suggestions[1].score if len(suggestions) > 1 else -1
       if top_score >= auto_match_threshold and (top_score - next_score) >= auto_match_gap:
         suggested_matches[codepath_name] = suggestions[0].canvas_name
+        mark_used(suggestions[0].canvas_name)
 
   return confirmed_matches, suggested_matches, unresolved_suggestions, warnings
 
@@ -793,17 +1201,40 @@ def parse_codepath_timestamp(
   return localized
 
 
+def parse_codepath_timestamp_cached(
+  value: str,
+  *,
+  reference_due_at: datetime | None,
+  cache: dict[tuple[str, datetime | None], datetime | None] | None,
+) -> datetime | None:
+  if cache is None or reference_due_at is None:
+    return parse_codepath_timestamp(value, reference_due_at=reference_due_at)
+  key = (value or "", reference_due_at)
+  if key not in cache:
+    cache[key] = parse_codepath_timestamp(value, reference_due_at=reference_due_at)
+  return cache[key]
+
+
 def get_effective_submission_time(
   row: dict[str, str],
   *,
   reference_due_at: datetime | None = None,
   strict_deadlines: bool = False,
+  timestamp_cache: dict[tuple[str, datetime | None], datetime | None] | None = None,
 ) -> datetime | None:
-  submitted_at = parse_codepath_timestamp(row.get("Submitted", ""), reference_due_at=reference_due_at)
+  submitted_at = parse_codepath_timestamp_cached(
+    row.get("Submitted", ""),
+    reference_due_at=reference_due_at,
+    cache=timestamp_cache,
+  )
   if submitted_at is None:
     return None
   if strict_deadlines:
-    updated_at = parse_codepath_timestamp(row.get("Updated", ""), reference_due_at=reference_due_at)
+    updated_at = parse_codepath_timestamp_cached(
+      row.get("Updated", ""),
+      reference_due_at=reference_due_at,
+      cache=timestamp_cache,
+    )
     if updated_at is not None:
       return updated_at
   return submitted_at
@@ -814,6 +1245,7 @@ def compute_seconds_late(
   *,
   due_at,
   strict_deadlines: bool = False,
+  timestamp_cache: dict[tuple[str, datetime | None], datetime | None] | None = None,
 ) -> tuple[datetime | None, int | None]:
   normalized_due_at = normalize_canvas_datetime(due_at)
   if normalized_due_at is None:
@@ -823,6 +1255,7 @@ def compute_seconds_late(
     row,
     reference_due_at=normalized_due_at,
     strict_deadlines=strict_deadlines,
+    timestamp_cache=timestamp_cache,
   )
   if submitted_at is None:
     return None, None
@@ -831,27 +1264,39 @@ def compute_seconds_late(
   return submitted_at, seconds_late
 
 
-def resolve_canvas_submission_due_at(canvas_assignment, submission) -> datetime | None:
+def normalize_canvas_datetime_cached(value, cache: dict[object, datetime | None] | None) -> datetime | None:
+  if cache is None or value is None:
+    return normalize_canvas_datetime(value)
+  if value not in cache:
+    cache[value] = normalize_canvas_datetime(value)
+  return cache[value]
+
+
+def resolve_canvas_submission_due_at(
+  canvas_assignment,
+  submission,
+  datetime_cache: dict[object, datetime | None] | None = None,
+) -> datetime | None:
   if submission is not None:
     for value in (
       getattr(submission, "cached_due_date", None),
       getattr(submission, "due_at", None),
     ):
-      normalized = normalize_canvas_datetime(value)
+      normalized = normalize_canvas_datetime_cached(value, datetime_cache)
       if normalized is not None:
         return normalized
 
     submission_assignment = getattr(submission, "assignment", None)
     if isinstance(submission_assignment, dict):
-      normalized = normalize_canvas_datetime(submission_assignment.get("due_at"))
+      normalized = normalize_canvas_datetime_cached(submission_assignment.get("due_at"), datetime_cache)
       if normalized is not None:
         return normalized
     elif submission_assignment is not None:
-      normalized = normalize_canvas_datetime(getattr(submission_assignment, "due_at", None))
+      normalized = normalize_canvas_datetime_cached(getattr(submission_assignment, "due_at", None), datetime_cache)
       if normalized is not None:
         return normalized
 
-  return normalize_canvas_datetime(getattr(canvas_assignment, "due_at", None))
+  return normalize_canvas_datetime_cached(getattr(canvas_assignment, "due_at", None), datetime_cache)
 
 
 def canvas_submission_has_content(submission) -> bool:
@@ -911,13 +1356,16 @@ def decide_submission_action(
   submission,
   strict_deadlines: bool,
   now: datetime,
+  datetime_cache: dict[object, datetime | None] | None = None,
+  timestamp_cache: dict[tuple[str, datetime | None], datetime | None] | None = None,
 ) -> SubmissionDecision:
-  due_at = resolve_canvas_submission_due_at(canvas_assignment, submission)
+  due_at = resolve_canvas_submission_due_at(canvas_assignment, submission, datetime_cache)
   if codepath_row is not None:
     submitted_at, seconds_late = compute_seconds_late(
       codepath_row,
       due_at=due_at,
       strict_deadlines=strict_deadlines,
+      timestamp_cache=timestamp_cache,
     )
     if submitted_at is not None:
       return SubmissionDecision(
@@ -935,6 +1383,84 @@ def decide_submission_action(
   return SubmissionDecision(action="skip", due_at=due_at)
 
 
+def fetch_canvas_submissions(canvas_assignment, user_ids: list[int]) -> tuple[dict[int, object], set[int]]:
+  wanted = set(user_ids)
+  submissions: dict[int, object] = {}
+  list_submissions = getattr(canvas_assignment, "get_submissions", None)
+  if callable(list_submissions):
+    try:
+      for submission in list_submissions():
+        user_id = getattr(submission, "user_id", None)
+        if user_id is not None and int(user_id) in wanted:
+          submissions[int(user_id)] = submission
+    except Exception:
+      submissions = {}
+
+  fetch_failed: set[int] = set()
+  for user_id in user_ids:
+    if user_id in submissions:
+      continue
+    try:
+      submissions[user_id] = canvas_assignment.get_submission(user_id)
+    except Exception:
+      fetch_failed.add(user_id)
+  return submissions, fetch_failed
+
+
+def evaluate_late_policy(
+  result: LatePolicyResult,
+  canvas_assignment,
+  roster_rows: list[dict[str, str]],
+  codepath_by_canvas_name: dict[str, dict[str, str]],
+  *,
+  strict_deadlines: bool,
+) -> LatePolicyResult:
+  pending: list[tuple[int, str]] = []
+  for roster_row in roster_rows:
+    user_id_text = str(roster_row.get("ID", "")).strip()
+    if not user_id_text:
+      continue
+    user_id = int(user_id_text)
+    if user_id not in result.decisions and user_id not in result.fetch_failed:
+      pending.append((user_id, roster_row["Student"]))
+  if not pending:
+    return result
+
+  submissions, fetch_failed = fetch_canvas_submissions(canvas_assignment, [user_id for user_id, _ in pending])
+  result.submissions.update(submissions)
+  result.fetch_failed.update(fetch_failed)
+  for user_id, canvas_name in pending:
+    if user_id in fetch_failed:
+      continue
+    result.decisions[user_id] = decide_submission_action(
+      codepath_row=codepath_by_canvas_name.get(canvas_name),
+      canvas_assignment=canvas_assignment,
+      submission=submissions[user_id],
+      strict_deadlines=strict_deadlines,
+      now=result.now,
+      datetime_cache=result.datetime_cache,
+      timestamp_cache=result.timestamp_cache,
+    )
+  return result
+
+
+def get_late_policy_result(args: argparse.Namespace, canvas_assignment, assignment_name: str) -> LatePolicyResult:
+  cache = getattr(args, "_late_policy_cache", None)
+  if not isinstance(cache, dict):
+    cache = {}
+    setattr(args, "_late_policy_cache", cache)
+  key = (
+    getattr(canvas_assignment, "course_id", None),
+    getattr(canvas_assignment, "id", None),
+    assignment_name,
+    bool(args.strict_deadlines),
+  )
+  with LATE_POLICY_LOCK:
+    if key not in cache:
+      cache[key] = LatePolicyResult(now=datetime.now(LOS_ANGELES))
+    return cache[key]
+
+
 def write_suggestions(path: Path, suggestions: dict[str, list[MatchSuggestion]]) -> None:
   payload = {
     "suggestions": {
@@ -945,19 +1471,22 @@ def write_suggestions(path: Path, suggestions: dict[str, list[MatchSuggestion]])
       for codepath_name, candidates in sorted(suggestions.items())
     }
   }
-  with path.open("w", encoding="utf-8") as handle:
-    yaml.safe_dump(payload, handle, sort_keys=False, allow_unicode=False)
+  content = yaml.safe_dump(payload, sort_keys=False, allow_unicode=False)
+  # Course threads in a multi-course push write the same file.
+  with SUGGESTIONS_LOCK:
+    write_file_atomically(path, content.encode("utf-8"))
 
 
 def write_canvas_output(
   path: Path,
   fieldnames: list[str],
   rows: list[dict[str, str]],
-) -> None:
-  with path.open("w", newline="", encoding="utf-8") as handle:
-    writer = csv.DictWriter(handle, fieldnames=fieldnames, extrasaction="ignore")
-    writer.writeheader()
-    writer.writerows(rows)
+) -> bool:
+  buffer = io.StringIO(newline="")
+  writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+  writer.writeheader()
+  writer.writerows(rows)
+  return write_file_atomically(path, buffer.getvalue().encode("utf-8"))
 
 
 def get_name_map_cache(args: argparse.Namespace) -> dict[str, str]:
@@ -969,6 +1498,83 @@ def get_name_map_cache(args: argparse.Namespace) -> dict[str, str]:
   return cache
 
 
+def get_suggestion_cache(args: argparse.Namespace) -> SuggestionCache | None:
+  if not getattr(args, "name_map", None):
+    return None
+  cache = getattr(args, "_suggestion_cache", None)
+  if not isinstance(cache, SuggestionCache):
+    cache = load_suggestion_cache(get_suggestion_cache_path(Path(args.name_map)))
+    setattr(args, "_suggestion_cache", cache)
+  return cache
+
+
+def get_push_history(args: argparse.Namespace) -> PushHistoryStore | None:
+  push_history = getattr(args, "_push_history", None)
+  return push_history if isinstance(push_history, PushHistoryStore) else None
+
+
+def get_grade_export(args: argparse.Namespace) -> GradeExport | None:
+  grade_export = getattr(args, "_grade_export", None)
+  return grade_export if isinstance(grade_export, GradeExport) else None
+
+
+def write_grade_export(path: Path, records: list[GradeRecord]) -> None:
+  try:
+    import pyarrow as pa
+  except ModuleNotFoundError as exc:
+    raise ModuleNotFoundError(
+      "pyarrow is required for --export-parquet. Install requirements.txt first."
+    ) from exc
+
+  schema = pa.schema([
+    ("course_id", pa.int64()),
+    ("assignment", pa.string()),
+    ("canvas_student", pa.string()),
+    ("codepath_student", pa.string()),
+    ("user_id", pa.int64()),
+    ("status", pa.string()),
+    ("raw_score", pa.float64()),
+    ("adjusted_raw_score", pa.float64()),
+    ("base_earned", pa.float64()),
+    ("stretch_earned", pa.float64()),
+    ("weighted_total", pa.float64()),
+    ("canvas_score", pa.float64()),
+    ("seconds_late", pa.int64()),
+    ("action", pa.string()),
+    ("outcome", pa.string()),
+  ])
+  table = pa.Table.from_pydict(
+    {name: [getattr(record, name) for record in records] for name in schema.names},
+    schema=schema,
+  )
+  sink = pa.BufferOutputStream()
+  if path.suffix.lower() in {".arrow", ".feather", ".ipc"}:
+    import pyarrow.feather as feather
+
+    feather.write_feather(table, sink, compression="uncompressed")
+  else:
+    import pyarrow.parquet as pq
+
+    pq.write_table(table, sink)
+  write_file_atomically(path, sink.getvalue().to_pybytes(), skip_unchanged=False)
+
+
+def get_gradebook_cache(args: argparse.Namespace) -> dict[tuple, tuple[list[dict[str, str]], str | None]]:
+  cache = getattr(args, "_gradebook_cache", None)
+  if not isinstance(cache, dict):
+    cache = {}
+    setattr(args, "_gradebook_cache", cache)
+  return cache
+
+
+def get_tracer(args: argparse.Namespace) -> PhaseTracer:
+  tracer = getattr(args, "_tracer", None)
+  if not isinstance(tracer, PhaseTracer):
+    tracer = PhaseTracer()
+    setattr(args, "_tracer", tracer)
+  return tracer
+
+
 def get_codepath_fieldnames(rows: list[dict[str, str]]) -> list[str]:
   if not rows:
     return []
@@ -1003,10 +1609,12 @@ def run_single_conversion(
 ) -> int:
   name_map_path = Path(args.name_map) if args.name_map else None
   suggestions_path = Path(args.write_suggestions) if args.write_suggestions else None
+  tracer = get_tracer(args)
 
   if assignment_name:
     print(f"\n=== {assignment_name} ===")
-  codepath_rows = read_codepath_rows(codepath_path)
+  with tracer.span("read_codepath", assignment=assignment_name):
+    codepath_rows = read_codepath_rows(codepath_path)
   codepath_valid, codepath_message = classify_codepath_export(codepath_rows)
   if not codepath_valid:
     if assignment_name and codepath_message == "CodePath export only contains a roster and no grading columns yet.":
@@ -1015,7 +1623,8 @@ def run_single_conversion(
     print(f"Cannot process {codepath_path}: {codepath_message}", file=sys.stderr)
     return 1
 
-  fieldnames, canvas_rows = read_canvas_rows(canvas_path)
+  with tracer.span("read_canvas", assignment=assignment_name):
+    fieldnames, canvas_rows = read_canvas_rows(canvas_path)
 
   if not fieldnames:
     raise ValueError(f"No headers found in {canvas_path}.")
@@ -1036,14 +1645,16 @@ def run_single_conversion(
   codepath_names = [get_codepath_name(row) for row in codepath_rows]
 
   existing_map = dict(get_name_map_cache(args))
-  confirmed_matches, suggested_matches, unresolved_suggestions, warnings = resolve_name_matches(
-    codepath_names=codepath_names,
-    canvas_names=canvas_students,
-    existing_map=existing_map,
-    auto_match_threshold=args.auto_match_threshold,
-    auto_match_gap=args.auto_match_gap,
-    suggestion_count=args.suggestion_count,
-  )
+  with tracer.span("resolve_names", assignment=assignment_name, students=len(codepath_names)):
+    confirmed_matches, suggested_matches, unresolved_suggestions, warnings = resolve_name_matches(
+      codepath_names=codepath_names,
+      canvas_names=canvas_students,
+      existing_map=existing_map,
+      auto_match_threshold=args.auto_match_threshold,
+      auto_match_gap=args.auto_match_gap,
+      suggestion_count=args.suggestion_count,
+      suggestion_cache=get_suggestion_cache(args),
+    )
   resolved_matches = dict(confirmed_matches)
 
   if args.prompt_for_matches:
@@ -1073,15 +1684,20 @@ def run_single_conversion(
     for codepath_name, suggestions in unresolved_suggestions.items():
       if suggestions:
         suggested_name_map.setdefault(codepath_name, suggestions[0].canvas_name)
-    save_name_map(
-      name_map_path,
-      merged_confirmed_map,
-      suggested_mapping=suggested_name_map,
-      unmatched=sorted(name for name, suggestions in unresolved_suggestions.items() if not suggestions),
-    )
-  shared_name_map = get_name_map_cache(args)
-  shared_name_map.clear()
-  shared_name_map.update(merged_confirmed_map)
+    with tracer.span("save_name_map", assignment=assignment_name), NAME_MAP_LOCK:
+      save_name_map(
+        name_map_path,
+        merged_confirmed_map,
+        suggested_mapping=suggested_name_map,
+        unmatched=sorted(name for name, suggestions in unresolved_suggestions.items() if not suggestions),
+      )
+  with NAME_MAP_LOCK:
+    shared_name_map = get_name_map_cache(args)
+    shared_name_map.clear()
+    shared_name_map.update(merged_confirmed_map)
+  suggestion_cache = get_suggestion_cache(args)
+  if suggestion_cache is not None:
+    save_suggestion_cache(suggestion_cache)
 
   if suggestions_path is not None:
     write_suggestions(suggestions_path, unresolved_suggestions)
@@ -1116,6 +1732,7 @@ def run_single_conversion(
   codepath_by_canvas_name = {
     canvas_name: codepath_name for codepath_name, canvas_name in resolved_matches.items()
   }
+  grade_export = get_grade_export(args)
 
   for row in canvas_rows:
     student = row.get("Student", "")
@@ -1127,16 +1744,26 @@ def run_single_conversion(
 
     codepath_name = codepath_by_canvas_name[student]
     codepath_row = codepath_by_name[codepath_name]
-    row[assignment_column] = format_score(
-      compute_canvas_score(
-        codepath_row,
+    score = compute_canvas_score(
+      codepath_row,
+      config=config,
+      missing_as_zero=args.missing_as_zero,
+      leave_not_graded_blank=args.leave_not_graded_blank,
+    )
+    row[assignment_column] = format_score(score)
+    if grade_export is not None:
+      grade_export.add(
+        course_id=None,
+        assignment=assignment_name or assignment_column,
+        canvas_student=student,
+        outcome="written" if score is not None else "blank",
         config=config,
-        missing_as_zero=args.missing_as_zero,
-        leave_not_graded_blank=args.leave_not_graded_blank,
+        codepath_row=codepath_row,
+        score=score,
       )
-    )
 
-  write_canvas_output(output_path, fieldnames, canvas_rows)
+  with tracer.span("write_output", assignment=assignment_name):
+    output_written = write_canvas_output(output_path, fieldnames, canvas_rows)
 
   matched_canvas_names = set(resolved_matches.values())
   unmatched_canvas = sorted(set(canvas_students) - matched_canvas_names)
@@ -1145,7 +1772,7 @@ def run_single_conversion(
   for warning in warnings:
     print(f"Warning: {warning}", file=sys.stderr)
 
-  print(f"Wrote {output_path}")
+  print(f"Wrote {output_path}" if output_written else f"Unchanged {output_path}")
   print(f"Matched {len(resolved_matches)} of {len(codepath_rows)} CodePath students")
   print(f"Unmatched CodePath students: {len(unmatched_codepath)}")
   print(f"Canvas students left blank: {len(unmatched_canvas)}")
@@ -1169,7 +1796,7 @@ def load_assignments_config(path: Path) -> tuple[int | None, dict[str, dict[str,
     assignments = {
       name: settings
       for name, settings in loaded.items()
-      if isinstance(settings, dict)
+      if isinstance(settings, dict) and name != "courses"
     }
 
   if not isinstance(assignments, dict):
@@ -1181,6 +1808,38 @@ def load_assignments_config(path: Path) -> tuple[int | None, dict[str, dict[str,
   return course_id, assignments
 
 
+def load_course_targets(path: Path) -> list[CourseTarget]:
+  loaded = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+  if not isinstance(loaded, dict) or "courses" not in loaded:
+    return []
+  courses = loaded["courses"]
+  if not isinstance(courses, dict) or not courses:
+    raise ValueError(f"'courses' in {path} must be a non-empty mapping of course labels to settings.")
+  if loaded.get("course-id", loaded.get("course_id")) is not None:
+    raise ValueError(f"Use either 'course-id' or 'courses' in {path}, not both.")
+
+  targets: list[CourseTarget] = []
+  for label, settings in courses.items():
+    if not isinstance(settings, dict):
+      raise ValueError(f"Course {label!r} must map to a settings dictionary.")
+    course_id = settings.get("course-id", settings.get("course_id"))
+    if course_id is None:
+      raise ValueError(f"Course {label!r} is missing course-id.")
+    assignment_ids = settings.get("assignment-ids", settings.get("assignment_ids")) or {}
+    if not isinstance(assignment_ids, dict):
+      raise ValueError(f"Course {label!r} assignment-ids must map assignment keys to Canvas assignment IDs.")
+    requests_per_second = settings.get("requests-per-second", settings.get("requests_per_second"))
+    targets.append(
+      CourseTarget(
+        label=str(label),
+        course_id=int(course_id),
+        assignment_ids={str(name): int(assignment_id) for name, assignment_id in assignment_ids.items()},
+        requests_per_second=float(requests_per_second) if requests_per_second is not None else None,
+      )
+    )
+  return targets
+
+
 def build_assignment_args(
   base_args: argparse.Namespace,
   assignment_name: str,
@@ -1259,12 +1918,16 @@ def run_single_push_conversion(
   *,
   codepath_rows: list[dict[str, str]] | None = None,
   push_enabled: bool = True,
+  name_roster_rows: list[dict[str, str]] | None = None,
+  course_id: int | None = None,
 ) -> int:
+  tracer = get_tracer(args)
   print(f"\n=== {assignment_name} ===")
   if codepath_rows is None:
     if codepath_path is None:
       raise ValueError("run_single_push_conversion requires either codepath_path or codepath_rows.")
-    codepath_rows = read_codepath_rows(codepath_path)
+    with tracer.span("read_codepath", assignment=assignment_name):
+      codepath_rows = read_codepath_rows(codepath_path)
   codepath_valid, codepath_message = classify_codepath_export(codepath_rows)
   if not codepath_valid:
     if codepath_message == "CodePath export only contains a roster and no grading columns yet.":
@@ -1281,20 +1944,22 @@ def run_single_push_conversion(
   for warning in validate_score_config(config):
     print(f"Warning: {warning}", file=sys.stderr)
 
-  canvas_students = [row["Student"] for row in roster_rows]
+  canvas_students = [row["Student"] for row in (name_roster_rows if name_roster_rows is not None else roster_rows)]
   codepath_names = [get_codepath_name(row) for row in codepath_rows]
   name_map_path = Path(args.name_map) if args.name_map else None
   suggestions_path = Path(args.write_suggestions) if args.write_suggestions else None
 
   existing_map = dict(get_name_map_cache(args))
-  confirmed_matches, suggested_matches, unresolved_suggestions, warnings = resolve_name_matches(
-    codepath_names=codepath_names,
-    canvas_names=canvas_students,
-    existing_map=existing_map,
-    auto_match_threshold=args.auto_match_threshold,
-    auto_match_gap=args.auto_match_gap,
-    suggestion_count=args.suggestion_count,
-  )
+  with tracer.span("resolve_names", assignment=assignment_name, students=len(codepath_names)):
+    confirmed_matches, suggested_matches, unresolved_suggestions, warnings = resolve_name_matches(
+      codepath_names=codepath_names,
+      canvas_names=canvas_students,
+      existing_map=existing_map,
+      auto_match_threshold=args.auto_match_threshold,
+      auto_match_gap=args.auto_match_gap,
+      suggestion_count=args.suggestion_count,
+      suggestion_cache=get_suggestion_cache(args),
+    )
   resolved_matches = dict(confirmed_matches)
 
   if args.prompt_for_matches:
@@ -1324,15 +1989,20 @@ def run_single_push_conversion(
     for codepath_name, suggestions in unresolved_suggestions.items():
       if suggestions:
         suggested_name_map.setdefault(codepath_name, suggestions[0].canvas_name)
-    save_name_map(
-      name_map_path,
-      merged_confirmed_map,
-      suggested_mapping=suggested_name_map,
-      unmatched=sorted(name for name, suggestions in unresolved_suggestions.items() if not suggestions),
-    )
-  shared_name_map = get_name_map_cache(args)
-  shared_name_map.clear()
-  shared_name_map.update(merged_confirmed_map)
+    with tracer.span("save_name_map", assignment=assignment_name), NAME_MAP_LOCK:
+      save_name_map(
+        name_map_path,
+        merged_confirmed_map,
+        suggested_mapping=suggested_name_map,
+        unmatched=sorted(name for name, suggestions in unresolved_suggestions.items() if not suggestions),
+      )
+  with NAME_MAP_LOCK:
+    shared_name_map = get_name_map_cache(args)
+    shared_name_map.clear()
+    shared_name_map.update(merged_confirmed_map)
+  suggestion_cache = get_suggestion_cache(args)
+  if suggestion_cache is not None:
+    save_suggestion_cache(suggestion_cache)
 
   if suggestions_path is not None:
     write_suggestions(suggestions_path, unresolved_suggestions)
@@ -1376,7 +2046,7 @@ def run_single_push_conversion(
     return 1
 
   matched_canvas_names = set(resolved_matches.values())
-  unmatched_canvas_names = sorted(set(canvas_students) - matched_canvas_names)
+  unmatched_canvas_names = sorted({row["Student"] for row in roster_rows} - matched_canvas_names)
   if unmatched_canvas_names:
     print(
       f"Warning: {len(unmatched_canvas_names)} Canvas roster student(s) have no CodePath match; skipping them.",
@@ -1393,22 +2063,68 @@ def run_single_push_conversion(
         print(f"  {canvas_name}", file=sys.stderr)
       print("  (use --verbose to list all unmatched Canvas students)", file=sys.stderr)
 
-  if not push_enabled:
-    print(f"Preflight OK for {assignment_name}: {len(resolved_matches)} matched student(s)")
-    return 0
-
   codepath_by_name = {get_codepath_name(row): row for row in codepath_rows}
   codepath_by_canvas_name = {
     canvas_name: codepath_by_name[codepath_name]
     for codepath_name, canvas_name in resolved_matches.items()
   }
+  late_policy = get_late_policy_result(args, canvas_assignment, assignment_name)
+  with tracer.span("late_policy", assignment=assignment_name, students=len(roster_rows)):
+    evaluate_late_policy(
+      late_policy,
+      canvas_assignment,
+      roster_rows,
+      codepath_by_canvas_name,
+      strict_deadlines=args.strict_deadlines,
+    )
+
+  if not push_enabled:
+    planned_actions: dict[str, int] = {}
+    for decision in late_policy.decisions.values():
+      planned_actions[decision.action] = planned_actions.get(decision.action, 0) + 1
+    print(
+      f"Preflight OK for {assignment_name}: {len(resolved_matches)} matched student(s)"
+      + "".join(f", {count} {action}" for action, count in sorted(planned_actions.items()))
+    )
+    return 0
   pushed_count = 0
   marked_missing_count = 0
   skipped_blank_count = 0
   skipped_no_action_count = 0
   skipped_unmatched_canvas_count = 0
   failed_push_count = 0
-  now = datetime.now(LOS_ANGELES)
+  push_loop_started = time.perf_counter()
+  grade_export = get_grade_export(args)
+  push_history = get_push_history(args)
+  history_records: list[PushHistoryRecord] = []
+  export_course_id = course_id if course_id is not None else getattr(canvas_assignment, "course_id", None)
+
+  def record_history(canvas_name: str, user_id: int, outcome: str, decision: SubmissionDecision, **fields) -> None:
+    if push_history is not None:
+      history_records.append(
+        PushHistoryRecord(
+          course_id=export_course_id,
+          assignment_id=getattr(canvas_assignment, "id", None),
+          assignment=assignment_name,
+          user_id=user_id,
+          canvas_student=canvas_name,
+          action=decision.action,
+          outcome=outcome,
+          seconds_late=decision.seconds_late,
+          **fields,
+        )
+      )
+
+  def export_grade(canvas_name: str, outcome: str, **fields) -> None:
+    if grade_export is not None:
+      grade_export.add(
+        course_id=export_course_id,
+        assignment=assignment_name,
+        canvas_student=canvas_name,
+        outcome=outcome,
+        config=config,
+        **fields,
+      )
 
   for roster_row in roster_rows:
     canvas_name = roster_row["Student"]
@@ -1416,39 +2132,42 @@ def run_single_push_conversion(
     if not user_id_text:
       print(f"Missing Canvas user ID for {canvas_name}.", file=sys.stderr)
       failed_push_count += 1
+      export_grade(canvas_name, "missing_user_id")
       continue
 
     user_id = int(user_id_text)
-    try:
-      submission = canvas_assignment.get_submission(user_id)
-    except Exception:
+    if user_id in late_policy.fetch_failed:
       print(f"Could not fetch Canvas submission for {canvas_name}.", file=sys.stderr)
       failed_push_count += 1
+      export_grade(canvas_name, "fetch_failed", user_id=user_id)
       continue
 
+    submission = late_policy.submissions[user_id]
     codepath_row = codepath_by_canvas_name.get(canvas_name)
-    decision = decide_submission_action(
-      codepath_row=codepath_row,
-      canvas_assignment=canvas_assignment,
-      submission=submission,
-      strict_deadlines=args.strict_deadlines,
-      now=now,
-    )
+    decision = late_policy.decisions[user_id]
 
+    exported = {"user_id": user_id, "codepath_row": codepath_row, "decision": decision}
     if decision.action == "mark_missing":
-      if mark_canvas_submission_missing(canvas_assignment, user_id):
+      with tracer.timed("mark_missing"):
+        marked = mark_canvas_submission_missing(canvas_assignment, user_id)
+      if marked:
         marked_missing_count += 1
       else:
         failed_push_count += 1
+      export_grade(canvas_name, "marked_missing" if marked else "mark_missing_failed", **exported)
+      record_history(canvas_name, user_id, "marked_missing" if marked else "mark_missing_failed", decision)
       continue
     if decision.action == "skip":
       if codepath_row is None:
         skipped_unmatched_canvas_count += 1
+        export_grade(canvas_name, "skipped_unmatched_canvas", **exported)
         continue
       skipped_no_action_count += 1
+      export_grade(canvas_name, "skipped_no_action", **exported)
       continue
     if codepath_row is None:
       skipped_no_action_count += 1
+      export_grade(canvas_name, "skipped_no_action", **exported)
       continue
 
     score = compute_canvas_score(
@@ -1459,6 +2178,7 @@ def run_single_push_conversion(
     )
     if score is None:
       skipped_blank_count += 1
+      export_grade(canvas_name, "skipped_blank", **exported)
       continue
 
     breakdown = build_score_breakdown(float(codepath_row["Feature Score"]), config)
@@ -1478,9 +2198,10 @@ def run_single_push_conversion(
     }
     if decision.seconds_late is not None and push_feedback_accepts_seconds_late(canvas_assignment):
       push_kwargs["seconds_late"] = decision.seconds_late
-    pushed = canvas_assignment.push_feedback(
-      **push_kwargs,
-    )
+    with tracer.timed("push_feedback"):
+      pushed = canvas_assignment.push_feedback(
+        **push_kwargs,
+      )
     if pushed:
       if (
         decision.seconds_late is not None
@@ -1495,10 +2216,44 @@ def run_single_push_conversion(
       pushed_count += 1
     else:
       failed_push_count += 1
+    export_grade(canvas_name, "pushed" if pushed else "push_failed", score=score, **exported)
+    record_history(
+      canvas_name,
+      user_id,
+      "pushed" if pushed else "push_failed",
+      decision,
+      score=score,
+      feedback_sha256=hash_feedback(feedback_text),
+    )
+
+  tracer.record(
+    "push_loop",
+    push_loop_started,
+    time.perf_counter(),
+    assignment=assignment_name,
+    pushed=pushed_count,
+    failed=failed_push_count,
+  )
+  if push_history is not None:
+    push_history.append(history_records)
 
   for warning in warnings:
     print(f"Warning: {warning}", file=sys.stderr)
 
+  push_summaries = getattr(args, "_push_summaries", None)
+  if isinstance(push_summaries, list):
+    push_summaries.append(
+      PushSummary(
+        assignment=assignment_name,
+        pushed=pushed_count,
+        marked_missing=marked_missing_count,
+        skipped_blank=skipped_blank_count,
+        skipped_no_action=skipped_no_action_count,
+        skipped_unmatched_canvas=skipped_unmatched_canvas_count,
+        failed=failed_push_count,
+      )
+    )
+
   print(f"Pushed {pushed_count} grade(s) to Canvas for {assignment_name}")
   print(f"Marked missing submissions: {marked_missing_count}")
   print(f"Skipped blank scores: {skipped_blank_count}")
@@ -1508,17 +2263,304 @@ def run_single_push_conversion(
   return 1 if failed_push_count else 0
 
 
-def run_batch_conversion(args: argparse.Namespace) -> int:
-  course_id, assignments = load_assignments_config(Path(args.assignments))
+class RateLimiter:
+  def __init__(self, requests_per_second: float | None):
+    self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+    self.next_allowed = time.monotonic()
+    self.lock = threading.Lock()
+
+  def acquire(self) -> None:
+    if not self.interval:
+      return
+    with self.lock:
+      now = time.monotonic()
+      wait = self.next_allowed - now
+      self.next_allowed = max(now, self.next_allowed) + self.interval
+    if wait > 0:
+      time.sleep(wait)
+
+
+class RateLimitedCanvasObject:
+  def __init__(self, target, limiter: RateLimiter):
+    self._target = target
+    self._limiter = limiter
+
+  def __getattr__(self, name: str):
+    value = getattr(self._target, name)
+    if not callable(value):
+      return value
+
+    @functools.wraps(value)
+    def call(*args, **kwargs):
+      self._limiter.acquire()
+      result = value(*args, **kwargs)
+      if hasattr(result, "edit"):
+        return RateLimitedCanvasObject(result, self._limiter)
+      return result
+
+    return call
+
+
+class ThreadRoutedOutput(io.TextIOBase):
+  def __init__(self, name: str, fallback, local: threading.local):
+    self.name = name
+    self.fallback = fallback
+    self.local = local
+
+  def write(self, text: str) -> int:
+    records = getattr(self.local, "records", None)
+    if records is None:
+      return self.fallback.write(text)
+    records.append((self.name, text))
+    return len(text)
+
+  def flush(self) -> None:
+    if getattr(self.local, "records", None) is None:
+      self.fallback.flush()
+
+
+def replay_routed_output(records: list[tuple[str, str]], stdout, stderr) -> None:
+  for stream_name, text in records:
+    (stderr if stream_name == "stderr" else stdout).write(text)
+  stdout.flush()
+  stderr.flush()
+
+
+def get_canvas_course_session(args: argparse.Namespace, course_id: int) -> tuple[object, list[dict[str, str]]]:
+  sessions = getattr(args, "_canvas_sessions", None)
+  if not isinstance(sessions, dict):
+    sessions = {}
+    setattr(args, "_canvas_sessions", sessions)
+  if course_id not in sessions:
+    sessions[course_id] = connect_canvas_course(args, course_id)
+  return sessions[course_id]
+
+
+def merge_course_rosters(rosters: list[list[dict[str, str]]]) -> list[dict[str, str]]:
+  merged: list[dict[str, str]] = []
+  seen_names: set[str] = set()
+  for roster_rows in rosters:
+    for row in roster_rows:
+      if row["Student"] in seen_names:
+        continue
+      seen_names.add(row["Student"])
+      merged.append(row)
+  return merged
+
+
+def print_course_summary(target: CourseTarget, exit_code: int, summaries: list[PushSummary]) -> None:
+  status = "OK" if exit_code == 0 else "FAILED"
+  print(f"\n=== Course {target.label} ({target.course_id}): {status} ===")
+  for summary in summaries:
+    print(
+      f"  {summary.assignment}: pushed {summary.pushed}, missing {summary.marked_missing}, "
+      f"blank {summary.skipped_blank}, no action {summary.skipped_no_action}, "
+      f"unmatched {summary.skipped_unmatched_canvas}, failed {summary.failed}"
+    )
+  if summaries:
+    print(
+      f"  Total: pushed {sum(summary.pushed for summary in summaries)}, "
+      f"failed {sum(summary.failed for summary in summaries)}"
+    )
+
+
+def run_multi_course_batch(
+  args: argparse.Namespace,
+  assignments: dict[str, dict[str, object]],
+  targets: list[CourseTarget],
+  *,
+  data_dir: Path,
+  gradebook_path: Path | None,
+  explicit_xls: Path | None,
+) -> int:
+  tracer = get_tracer(args)
+  selected_assignments = [
+    assignment_name
+    for assignment_name in assignments
+    if assignment_name in set(args.only_assignment or assignments.keys())
+  ]
+  gradebook_cache = get_gradebook_cache(args)
+  exit_code = 0
+
+  with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+    sessions = list(executor.map(lambda target: get_canvas_course_session(args, target.course_id), targets))
+  courses = {target.course_id: course for target, (course, _) in zip(targets, sessions)}
+  rosters = {target.course_id: roster_rows for target, (_, roster_rows) in zip(targets, sessions)}
+  combined_roster = merge_course_rosters([rosters[target.course_id] for target in targets])
+  print(f"Canvas target: {'PROD' if args.prod else 'DEV'}")
+  print(f"Courses: {', '.join(f'{target.label} ({target.course_id})' for target in targets)}")
+  print(f"Combined roster: {len(combined_roster)} student(s)")
+
+  assignment_inputs: dict[str, tuple[Path | None, list[dict[str, str]] | None]] = {}
+  canvas_assignments: dict[tuple[int, str], object] = {}
+  preflight_failed = False
+  preflight_started = time.perf_counter()
+  for assignment_name in selected_assignments:
+    print(f"Preflighting {assignment_name}...", flush=True)
+    with tracer.span("load_inputs", assignment=assignment_name):
+      codepath_path, codepath_rows, skip_message, missing_error = resolve_batch_assignment_input(
+        assignment_name=assignment_name,
+        data_dir=data_dir,
+        gradebook_path=gradebook_path,
+        prefer_gradebook=explicit_xls is not None,
+        gradebook_cache=gradebook_cache,
+      )
+    if skip_message is not None:
+      print(f"Skipping {assignment_name}: {skip_message}")
+      continue
+    if missing_error is not None:
+      print(missing_error, file=sys.stderr)
+      exit_code = 1
+      preflight_failed = True
+      continue
+
+    assignment_failed = False
+    for target in targets:
+      assignment_id = target.assignment_ids.get(assignment_name)
+      if assignment_id is None:
+        print(
+          f"Missing assignment-ids entry for {assignment_name} in course {target.label}.",
+          file=sys.stderr,
+        )
+        assignment_failed = True
+        continue
+      with tracer.span("canvas_assignment", assignment=assignment_name, course=target.course_id):
+        canvas_assignment = courses[target.course_id].get_assignment(assignment_id)
+      if canvas_assignment is None:
+        print(
+          f"Could not find Canvas assignment {assignment_id} for {assignment_name} in course {target.label}.",
+          file=sys.stderr,
+        )
+        assignment_failed = True
+        continue
+      canvas_assignments[(target.course_id, assignment_name)] = canvas_assignment
+    if assignment_failed:
+      exit_code = 1
+      preflight_failed = True
+      continue
+
+    assignment_args = build_assignment_args(args, assignment_name, assignments[assignment_name])
+    result = 0
+    for target in targets:
+      with tracer.span("preflight_assignment", assignment=assignment_name, course=target.course_id):
+        if run_single_push_conversion(
+          assignment_args,
+          codepath_path=codepath_path,
+          roster_rows=rosters[target.course_id],
+          canvas_assignment=canvas_assignments[(target.course_id, assignment_name)],
+          assignment_name=assignment_name,
+          codepath_rows=codepath_rows,
+          push_enabled=False,
+          name_roster_rows=combined_roster,
+        ) != 0:
+          result = 1
+    if result != 0:
+      exit_code = 1
+      preflight_failed = True
+      continue
+    assignment_inputs[assignment_name] = (codepath_path, codepath_rows)
+  tracer.record("preflight", preflight_started, time.perf_counter())
+
+  if preflight_failed:
+    print("No Canvas grades were pushed because preflight failed.", file=sys.stderr)
+    return exit_code
+
+  output_local = threading.local()
+  routed_stdout = ThreadRoutedOutput("stdout", sys.stdout, output_local)
+  routed_stderr = ThreadRoutedOutput("stderr", sys.stderr, output_local)
+
+  def push_course(target: CourseTarget) -> tuple[int, list[PushSummary], list[tuple[str, str]]]:
+    output_local.records = []
+    course_args = argparse.Namespace(**vars(args))
+    course_args._push_summaries = []
+    limiter = RateLimiter(target.requests_per_second)
+    course_exit_code = 0
+    try:
+      for assignment_name, (codepath_path, codepath_rows) in assignment_inputs.items():
+        print(f"Pushing {assignment_name} to {target.label}...")
+        assignment_args = build_assignment_args(course_args, assignment_name, assignments[assignment_name])
+        with tracer.span("push_assignment", assignment=assignment_name, course=target.course_id):
+          result = run_single_push_conversion(
+            assignment_args,
+            codepath_path=codepath_path,
+            roster_rows=rosters[target.course_id],
+            canvas_assignment=RateLimitedCanvasObject(
+              canvas_assignments[(target.course_id, assignment_name)],
+              limiter,
+            ),
+            assignment_name=assignment_name,
+            codepath_rows=codepath_rows,
+            push_enabled=True,
+            name_roster_rows=combined_roster,
+            course_id=target.course_id,
+          )
+        if result != 0:
+          course_exit_code = 1
+    except Exception as exc:
+      print(f"Push to course {target.label} stopped: {exc}", file=sys.stderr)
+      course_exit_code = 1
+    finally:
+      records = output_local.records
+      output_local.records = None
+    return course_exit_code, course_args._push_summaries, records
+
+  push_started = time.perf_counter()
+  with contextlib.redirect_stdout(routed_stdout), contextlib.redirect_stderr(routed_stderr):
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+      course_results = list(executor.map(push_course, targets))
+  tracer.record("push", push_started, time.perf_counter(), courses=len(targets))
+
+  for target, (course_exit_code, summaries, records) in zip(targets, course_results):
+    print(f"\n##### Course {target.label} ({target.course_id}) #####")
+    replay_routed_output(records, sys.stdout, sys.stderr)
+  for target, (course_exit_code, summaries, _) in zip(targets, course_results):
+    print_course_summary(target, course_exit_code, summaries)
+    if course_exit_code != 0:
+      exit_code = 1
+  return exit_code
+
+
+def connect_canvas_course(args: argparse.Namespace, course_id) -> tuple[object, list[dict[str, str]]]:
+  tracer = get_tracer(args)
+  with tracer.span("canvas_connect", course=course_id):
+    canvas_interface = CanvasInterface(prod=args.prod, privacy_mode="none")
+    course = canvas_interface.get_course(int(course_id))
+  with tracer.span("canvas_roster", course=course_id):
+    roster_rows = get_canvas_roster_rows_from_course(course)
+  return course, roster_rows
+
+
+def run_batch_conversion(
+  args: argparse.Namespace,
+  *,
+  course=None,
+  roster_rows: list[dict[str, str]] | None = None,
+) -> int:
+  tracer = get_tracer(args)
+  with tracer.span("load_config"):
+    course_id, assignments = load_assignments_config(Path(args.assignments))
   selected_assignments = set(args.only_assignment or assignments.keys())
   data_dir = Path(args.data_dir) if args.data_dir else Path.cwd()
   explicit_xls = Path(args.xls) if args.xls else None
   gradebook_path = explicit_xls or find_gradebook_workbook(data_dir)
+  gradebook_cache = get_gradebook_cache(args)
   exit_code = 0
   push_mode = course_id is not None
-  course = None
-  roster_rows: list[dict[str, str]] | None = None
   args._name_map_cache = load_name_map(Path(args.name_map)) if args.name_map else {}
+  args._late_policy_cache = {}
+
+  course_targets = load_course_targets(Path(args.assignments))
+  if course_targets:
+    if explicit_xls is not None and not explicit_xls.exists():
+      raise ValueError(f"Workbook not found: {explicit_xls}")
+    return run_multi_course_batch(
+      args,
+      assignments,
+      course_targets,
+      data_dir=data_dir,
+      gradebook_path=gradebook_path,
+      explicit_xls=explicit_xls,
+    )
 
   if explicit_xls is not None:
     if not explicit_xls.exists():
@@ -1529,25 +2571,27 @@ def run_batch_conversion(args: argparse.Namespace) -> int:
     raise ValueError("--xls is only supported for Canvas push mode right now.")
 
   if push_mode:
-    canvas_interface = CanvasInterface(prod=args.prod, privacy_mode="none")
-    course = canvas_interface.get_course(int(course_id))
-    roster_rows = get_canvas_roster_rows_from_course(course)
+    if course is None:
+      course, roster_rows = connect_canvas_course(args, course_id)
     print(f"Canvas target: {'PROD' if args.prod else 'DEV'}")
     if explicit_xls is not None:
       print(f"Workbook source: {explicit_xls}")
 
     preflight_failed = False
+    preflight_started = time.perf_counter()
     for assignment_name, settings in assignments.items():
       if assignment_name not in selected_assignments:
         continue
       print(f"Preflighting {assignment_name}...", flush=True)
 
-      codepath_path, codepath_rows, skip_message, missing_error = resolve_batch_assignment_input(
-        assignment_name=assignment_name,
-        data_dir=data_dir,
-        gradebook_path=gradebook_path,
-        prefer_gradebook=explicit_xls is not None,
-      )
+      with tracer.span("load_inputs", assignment=assignment_name):
+        codepath_path, codepath_rows, skip_message, missing_error = resolve_batch_assignment_input(
+          assignment_name=assignment_name,
+          data_dir=data_dir,
+          gradebook_path=gradebook_path,
+          prefer_gradebook=explicit_xls is not None,
+          gradebook_cache=gradebook_cache,
+        )
       if skip_message is not None:
         print(f"Skipping {assignment_name}: {skip_message}")
         continue
@@ -1564,41 +2608,47 @@ def run_batch_conversion(args: argparse.Namespace) -> int:
         exit_code = 1
         preflight_failed = True
         continue
-      canvas_assignment = course.get_assignment(int(assignment_id))
+      with tracer.span("canvas_assignment", assignment=assignment_name):
+        canvas_assignment = course.get_assignment(int(assignment_id))
       if canvas_assignment is None:
         print(f"Could not find Canvas assignment {assignment_id} for {assignment_name}.", file=sys.stderr)
         exit_code = 1
         preflight_failed = True
         continue
-      result = run_single_push_conversion(
-        assignment_args,
-        codepath_path=codepath_path,
-        roster_rows=roster_rows or [],
-        canvas_assignment=canvas_assignment,
-        assignment_name=assignment_name,
-        codepath_rows=codepath_rows,
-        push_enabled=False,
-      )
+      with tracer.span("preflight_assignment", assignment=assignment_name):
+        result = run_single_push_conversion(
+          assignment_args,
+          codepath_path=codepath_path,
+          roster_rows=roster_rows or [],
+          canvas_assignment=canvas_assignment,
+          assignment_name=assignment_name,
+          codepath_rows=codepath_rows,
+          push_enabled=False,
+        )
       if result != 0:
         exit_code = 1
         preflight_failed = True
+    tracer.record("preflight", preflight_started, time.perf_counter())
 
     if preflight_failed:
       print("No Canvas grades were pushed because preflight found unresolved matches.", file=sys.stderr)
       return exit_code
 
+  push_started = time.perf_counter()
   for assignment_name, settings in assignments.items():
     if assignment_name not in selected_assignments:
       continue
     if push_mode:
       print(f"Pushing {assignment_name}...", flush=True)
 
-    codepath_path, codepath_rows, skip_message, missing_error = resolve_batch_assignment_input(
-      assignment_name=assignment_name,
-      data_dir=data_dir,
-      gradebook_path=gradebook_path if push_mode else None,
-      prefer_gradebook=explicit_xls is not None,
-    )
+    with tracer.span("load_inputs", assignment=assignment_name):
+      codepath_path, codepath_rows, skip_message, missing_error = resolve_batch_assignment_input(
+        assignment_name=assignment_name,
+        data_dir=data_dir,
+        gradebook_path=gradebook_path if push_mode else None,
+        prefer_gradebook=explicit_xls is not None,
+        gradebook_cache=gradebook_cache,
+      )
     if skip_message is not None:
       print(f"Skipping {assignment_name}: {skip_message}")
       continue
@@ -1612,16 +2662,19 @@ def run_batch_conversion(args: argparse.Namespace) -> int:
     assignment_args = build_assignment_args(args, assignment_name, settings)
     if push_mode:
       assignment_id = settings.get("assignment-id", settings.get("assignment_id"))
-      canvas_assignment = course.get_assignment(int(assignment_id))
-      result = run_single_push_conversion(
-        assignment_args,
-        codepath_path=codepath_path,
-        roster_rows=roster_rows or [],
-        canvas_assignment=canvas_assignment,
-        assignment_name=assignment_name,
-        codepath_rows=codepath_rows,
-        push_enabled=True,
-      )
+      with tracer.span("canvas_assignment", assignment=assignment_name):
+        canvas_assignment = course.get_assignment(int(assignment_id))
+      with tracer.span("push_assignment", assignment=assignment_name):
+        result = run_single_push_conversion(
+          assignment_args,
+          codepath_path=codepath_path,
+          roster_rows=roster_rows or [],
+          canvas_assignment=canvas_assignment,
+          assignment_name=assignment_name,
+          codepath_rows=codepath_rows,
+          push_enabled=True,
+          course_id=int(course_id),
+        )
     else:
       if codepath_path is None:
         print(
@@ -1637,34 +2690,210 @@ def run_batch_conversion(args: argparse.Namespace) -> int:
         )
         exit_code = 1
         continue
-      result = run_single_conversion(
-        assignment_args,
-        codepath_path=codepath_path,
-        canvas_path=canvas_path,
-        output_path=canvas_path,
-        assignment_name=assignment_name,
-      )
+      with tracer.span("convert_assignment", assignment=assignment_name):
+        result = run_single_conversion(
+          assignment_args,
+          codepath_path=codepath_path,
+          canvas_path=canvas_path,
+          output_path=canvas_path,
+          assignment_name=assignment_name,
+        )
     if result != 0:
       exit_code = 1
+  tracer.record("push" if push_mode else "convert", push_started, time.perf_counter())
+
+  return exit_code
+
+
+def hash_file_contents(path: Path) -> str:
+  digest = hashlib.sha256()
+  with path.open("rb") as handle:
+    for chunk in iter(lambda: handle.read(1 << 20), b""):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def hash_gradebook_sheet(rows: list[dict[str, str]], skip_message: str | None) -> str:
+  payload = json.dumps({"rows": rows, "skip": skip_message}, sort_keys=True)
+  return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_watch_paths(args: argparse.Namespace, data_dir: Path, gradebook_path: Path | None) -> list[Path]:
+  paths = [Path(args.assignments)]
+  if args.name_map:
+    paths.append(Path(args.name_map))
+  if gradebook_path is not None:
+    paths.append(gradebook_path)
+  if data_dir.is_dir():
+    paths.extend(sorted(data_dir.glob("codepath-*.csv")))
+  return paths
+
+
+def snapshot_watch_paths(paths: list[Path]) -> dict[str, tuple[int, int] | None]:
+  snapshot: dict[str, tuple[int, int] | None] = {}
+  for path in paths:
+    try:
+      stat = path.stat()
+    except FileNotFoundError:
+      snapshot[str(path)] = None
+      continue
+    snapshot[str(path)] = (stat.st_mtime_ns, stat.st_size)
+  return snapshot
+
+
+def compute_assignment_fingerprints(
+  args: argparse.Namespace,
+  assignments: dict[str, dict[str, object]],
+  *,
+  data_dir: Path,
+  gradebook_path: Path | None,
+  prefer_gradebook: bool,
+  targets: list[CourseTarget] | None = None,
+) -> dict[str, str]:
+  selected_assignments = set(args.only_assignment or assignments.keys())
+  sources: dict[str, str] = {}
+  sheet_names: list[str] = []
+  for assignment_name in assignments:
+    if assignment_name not in selected_assignments:
+      continue
+    codepath_path = data_dir / f"codepath-{assignment_name}.csv"
+    if gradebook_path is not None and (prefer_gradebook or not codepath_path.exists()):
+      sheet_names.append(assignment_name)
+    elif codepath_path.exists():
+      sources[assignment_name] = hash_file_contents(codepath_path)
+    else:
+      sources[assignment_name] = "missing"
+
+  if sheet_names:
+    sheets = prime_gradebook_cache(gradebook_path, sheet_names, get_gradebook_cache(args))
+    for assignment_name, (rows, skip_message) in sheets.items():
+      sources[assignment_name] = hash_gradebook_sheet(rows, skip_message)
+
+  fingerprints: dict[str, str] = {}
+  for assignment_name, source_hash in sources.items():
+    # Each course's Canvas assignment is part of the fingerprint so retargeting one course re-pushes it.
+    settings = json.dumps(
+      {
+        "settings": assignments[assignment_name],
+        "targets": [[target.course_id, target.assignment_ids.get(assignment_name)] for target in targets or []],
+      },
+      sort_keys=True,
+      default=str,
+    )
+    fingerprints[assignment_name] = hashlib.sha256(f"{source_hash}\0{settings}".encode("utf-8")).hexdigest()
+  return fingerprints
+
 
+def run_watch_mode(args: argparse.Namespace) -> int:
+  tracer = get_tracer(args)
+  data_dir = Path(args.data_dir) if args.data_dir else Path.cwd()
+  explicit_xls = Path(args.xls) if args.xls else None
+  course_id, _ = load_assignments_config(Path(args.assignments))
+  push_mode = course_id is not None or bool(load_course_targets(Path(args.assignments)))
+  course = None
+  roster_rows: list[dict[str, str]] | None = None
+  if course_id is not None:
+    course, roster_rows = connect_canvas_course(args, course_id)
+  # Cycles run on copies of args; sharing one session dict keeps multi-course logins across cycles.
+  if not isinstance(getattr(args, "_canvas_sessions", None), dict):
+    args._canvas_sessions = {}
+
+  processed_fingerprints: dict[str, str] = {}
+  processed_snapshot: dict[str, tuple[int, int] | None] | None = None
+  pending_snapshot: dict[str, tuple[int, int] | None] | None = None
+  exit_code = 0
+  print(f"Watching for gradebook changes every {args.watch_interval:g}s. Press Ctrl-C to stop.", flush=True)
+  try:
+    while True:
+      gradebook_path = explicit_xls or find_gradebook_workbook(data_dir)
+      watch_paths = get_watch_paths(args, data_dir, gradebook_path)
+      snapshot = snapshot_watch_paths(watch_paths)
+      if processed_snapshot is not None and snapshot == processed_snapshot:
+        pending_snapshot = None
+        time.sleep(args.watch_interval)
+        continue
+      if processed_snapshot is not None and snapshot != pending_snapshot:
+        # Wait one interval for the file to settle; spreadsheet saves land in several writes.
+        pending_snapshot = snapshot
+        time.sleep(args.watch_interval)
+        continue
+
+      try:
+        with tracer.span("watch_fingerprint"):
+          _, assignments = load_assignments_config(Path(args.assignments))
+          fingerprints = compute_assignment_fingerprints(
+            args,
+            assignments,
+            data_dir=data_dir,
+            gradebook_path=gradebook_path if push_mode else None,
+            prefer_gradebook=explicit_xls is not None,
+            targets=load_course_targets(Path(args.assignments)),
+          )
+      except Exception as exc:
+        print(f"Could not read watched inputs yet: {exc}", file=sys.stderr)
+        pending_snapshot = None
+        time.sleep(args.watch_interval)
+        continue
+
+      changed = [
+        assignment_name
+        for assignment_name, fingerprint in fingerprints.items()
+        if processed_fingerprints.get(assignment_name) != fingerprint
+      ]
+      if changed:
+        print(f"\nChanged assignments: {', '.join(changed)}", flush=True)
+        cycle_args = argparse.Namespace(**vars(args))
+        cycle_args.only_assignment = changed
+        exit_code = run_batch_conversion(cycle_args, course=course, roster_rows=roster_rows)
+        if exit_code == 0:
+          processed_fingerprints.update({name: fingerprints[name] for name in changed})
+        else:
+          print("Batch run failed; the changed assignments will be retried on the next edit.", file=sys.stderr)
+        print("Watching for changes...", flush=True)
+      # The snapshot from before the run, so edits saved while it was pushing are picked up next cycle.
+      processed_snapshot = snapshot
+      pending_snapshot = None
+  except KeyboardInterrupt:
+    print("\nStopped watching.")
   return exit_code
 
 
 def main(argv: list[str] | None = None) -> int:
   args = parse_args(argv)
   args._name_map_cache = load_name_map(Path(args.name_map)) if args.name_map else {}
-  if args.assignments:
-    return run_batch_conversion(args)
-
-  codepath_path = Path(args.codepath_csv)
-  canvas_path = Path(args.canvas)
-  output_path = Path(args.out) if args.out else canvas_path
-  return run_single_conversion(
-    args,
-    codepath_path=codepath_path,
-    canvas_path=canvas_path,
-    output_path=output_path,
-  )
+  args._suggestion_cache = get_suggestion_cache(args)
+  if args.export_parquet:
+    args._grade_export = GradeExport()
+  if args.push_history:
+    args._push_history = PushHistoryStore(Path(args.push_history))
+  tracer = get_tracer(args)
+  try:
+    if args.assignments:
+      if args.watch:
+        return run_watch_mode(args)
+      return run_batch_conversion(args)
+
+    codepath_path = Path(args.codepath_csv)
+    canvas_path = Path(args.canvas)
+    output_path = Path(args.out) if args.out else canvas_path
+    return run_single_conversion(
+      args,
+      codepath_path=codepath_path,
+      canvas_path=canvas_path,
+      output_path=output_path,
+    )
+  finally:
+    tracer.print_summary()
+    if args.trace:
+      tracer.write_chrome_trace(Path(args.trace))
+      print(f"Wrote trace to {args.trace}")
+    push_history = get_push_history(args)
+    if push_history is not None:
+      push_history.close()
+    grade_export = get_grade_export(args)
+    if grade_export is not None:
+      write_grade_export(Path(args.export_parquet), grade_export.records)
+      print(f"Wrote {len(grade_export.records)} grade record(s) to {args.export_parquet}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,750 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import yaml
+
+import benchmark_codepath_to_canvas
+
+
+DEFAULT_PER_PAGE = 10
+MAX_PER_PAGE = 100
+RATE_LIMIT_EXCEEDED_BODY = "403 Forbidden (Rate Limit Exceeded)"
+
+
+@dataclass
+class FakeSubmissionState:
+  user_id: int
+  assignment_id: int
+  course_id: int
+  due_at: datetime | None
+  score: float | None = None
+  grade: str | None = None
+  submitted_at: datetime | None = None
+  late_policy_status: str | None = None
+  seconds_late: int = 0
+  excused: bool = False
+  comments: list[str] = field(default_factory=list)
+  grade_updates: int = 0
+
+  def to_json(self) -> dict[str, object]:
+    return {
+      "id": self.assignment_id * 1_000_000 + self.user_id,
+      "user_id": self.user_id,
+      "assignment_id": self.assignment_id,
+      "course_id": self.course_id,
+      "score": self.score,
+      "grade": self.grade,
+      "entered_score": self.score,
+      "entered_grade": self.grade,
+      "submitted_at": self.submitted_at.isoformat() if self.submitted_at else None,
+      "cached_due_date": self.due_at.isoformat() if self.due_at else None,
+      "workflow_state": "graded" if self.score is not None else "unsubmitted",
+      "submission_type": "online_upload" if self.submitted_at else None,
+      "late_policy_status": self.late_policy_status,
+      "seconds_late": self.seconds_late,
+      "late": bool(self.seconds_late),
+      "missing": self.late_policy_status == "missing",
+      "excused": self.excused,
+      "attachments": [],
+      "body": None,
+      "url": None,
+      "media_comment_id": None,
+      "submission_comments": [{"comment": comment} for comment in self.comments],
+    }
+
+
+@dataclass
+class FakeAssignmentState:
+  id: int
+  course_id: int
+  name: str
+  points_possible: float
+  due_at: datetime | None
+
+  def to_json(self) -> dict[str, object]:
+    return {
+      "id": self.id,
+      "course_id": self.course_id,
+      "name": self.name,
+      "points_possible": self.points_possible,
+      "due_at": self.due_at.isoformat() if self.due_at else None,
+      "submission_types": ["online_upload"],
+      "grading_type": "points",
+      "published": True,
+    }
+
+
+@dataclass
+class FakeCourseState:
+  id: int
+  name: str
+  students: list[benchmark_codepath_to_canvas.SyntheticStudent]
+  assignments: dict[int, FakeAssignmentState] = field(default_factory=dict)
+  submissions: dict[tuple[int, int], FakeSubmissionState] = field(default_factory=dict)
+
+  def get_submission(self, assignment_id: int, user_id: int) -> FakeSubmissionState:
+    key = (assignment_id, user_id)
+    if key not in self.submissions:
+      assignment = self.assignments[assignment_id]
+      self.submissions[key] = FakeSubmissionState(
+        user_id=user_id,
+        assignment_id=assignment_id,
+        course_id=self.id,
+        due_at=assignment.due_at,
+      )
+    return self.submissions[key]
+
+
+@dataclass
+class LeakyBucket:
+  capacity: float
+  drain_per_second: float
+  request_cost: float
+  level: float = 0.0
+  updated: float = field(default_factory=time.monotonic)
+
+  def charge(self) -> tuple[bool, float]:
+    now = time.monotonic()
+    self.level = max(0.0, self.level - (now - self.updated) * self.drain_per_second)
+    self.updated = now
+    if self.level + self.request_cost > self.capacity:
+      return False, max(self.capacity - self.level, 0.0)
+    self.level += self.request_cost
+    return True, self.capacity - self.level
+
+
+@dataclass
+class FakeCanvasSettings:
+  latency_ms: float = 0.0
+  jitter_ms: float = 0.0
+  default_per_page: int = DEFAULT_PER_PAGE
+  rate_limit_capacity: float | None = None
+  rate_limit_drain_per_second: float = 10.0
+  rate_limit_request_cost: float = 1.0
+  api_token: str | None = None
+
+
+@dataclass
+class FakeCanvasStats:
+  requests: dict[str, int] = field(default_factory=dict)
+  throttled: int = 0
+  grade_updates: int = 0
+  in_flight: int = 0
+  max_in_flight: int = 0
+
+
+class FakeCanvasState:
+  def __init__(self, settings: FakeCanvasSettings | None = None):
+    self.settings = settings or FakeCanvasSettings()
+    self.courses: dict[int, FakeCourseState] = {}
+    self.stats = FakeCanvasStats()
+    self.lock = threading.Lock()
+    self.bucket = None
+    if self.settings.rate_limit_capacity is not None:
+      self.bucket = LeakyBucket(
+        capacity=self.settings.rate_limit_capacity,
+        drain_per_second=self.settings.rate_limit_drain_per_second,
+        request_cost=self.settings.rate_limit_request_cost,
+      )
+    self.progress: dict[int, dict[str, object]] = {}
+
+  def add_course(
+    self,
+    course_id: int,
+    students: list[benchmark_codepath_to_canvas.SyntheticStudent],
+    assignment_ids: list[int],
+    *,
+    name: str | None = None,
+    points_possible: float = 100.0,
+    due_at: datetime | None = benchmark_codepath_to_canvas.BENCHMARK_DUE_AT,
+  ) -> FakeCourseState:
+    course = FakeCourseState(id=course_id, name=name or f"Course {course_id}", students=list(students))
+    for assignment_id in assignment_ids:
+      course.assignments[assignment_id] = FakeAssignmentState(
+        id=assignment_id,
+        course_id=course_id,
+        name=f"Assignment {assignment_id}",
+        points_possible=points_possible,
+        due_at=due_at,
+      )
+    with self.lock:
+      self.courses[course_id] = course
+    return course
+
+  def begin_request(self, route: str) -> tuple[bool, float | None]:
+    with self.lock:
+      self.stats.requests[route] = self.stats.requests.get(route, 0) + 1
+      self.stats.in_flight += 1
+      self.stats.max_in_flight = max(self.stats.max_in_flight, self.stats.in_flight)
+      if self.bucket is None:
+        return True, None
+      allowed, remaining = self.bucket.charge()
+      if not allowed:
+        self.stats.throttled += 1
+      return allowed, remaining
+
+  def end_request(self) -> None:
+    with self.lock:
+      self.stats.in_flight -= 1
+
+  def simulated_delay(self) -> float:
+    latency = self.settings.latency_ms
+    if self.settings.jitter_ms:
+      latency += random.uniform(0.0, self.settings.jitter_ms)
+    return latency / 1000.0
+
+  def snapshot_stats(self) -> dict[str, object]:
+    with self.lock:
+      return {
+        "requests": dict(self.stats.requests),
+        "total_requests": sum(self.stats.requests.values()),
+        "throttled": self.stats.throttled,
+        "grade_updates": self.stats.grade_updates,
+        "max_in_flight": self.stats.max_in_flight,
+      }
+
+
+def user_json(student: benchmark_codepath_to_canvas.SyntheticStudent) -> dict[str, object]:
+  return {
+    "id": student.user_id,
+    "name": student.canvas_name,
+    "sortable_name": student.canvas_name,
+    "short_name": f"{student.first_name} {student.last_name}",
+    "login_id": f"u{student.user_id}",
+  }
+
+
+def enrollment_json(course_id: int, student: benchmark_codepath_to_canvas.SyntheticStudent) -> dict[str, object]:
+  return {
+    "id": 9_000_000 + student.user_id,
+    "user_id": student.user_id,
+    "course_id": course_id,
+    "type": "StudentEnrollment",
+    "role": "StudentEnrollment",
+    "enrollment_state": "active",
+    "user": user_json(student),
+  }
+
+
+def parse_request_fields(query: str, body: bytes, content_type: str) -> dict[str, list[str]]:
+  fields = parse_qs(query, keep_blank_values=True)
+  if not body:
+    return fields
+  if "json" in content_type:
+    def flatten(prefix: str, value) -> None:
+      if isinstance(value, dict):
+        for key, nested in value.items():
+          flatten(f"{prefix}[{key}]" if prefix else str(key), nested)
+      else:
+        fields.setdefault(prefix, []).append("" if value is None else str(value))
+    flatten("", json.loads(body.decode("utf-8")))
+    return fields
+  for key, values in parse_qs(body.decode("utf-8"), keep_blank_values=True).items():
+    fields.setdefault(key, []).extend(values)
+  return fields
+
+
+def first_field(fields: dict[str, list[str]], *names: str) -> str | None:
+  for name in names:
+    values = fields.get(name)
+    if values:
+      return values[-1]
+  return None
+
+
+def apply_submission_update(state: FakeCanvasState, submission: FakeSubmissionState, fields: dict[str, list[str]]) -> None:
+  posted_grade = first_field(fields, "submission[posted_grade]", "posted_grade")
+  comment = first_field(fields, "comment[text_comment]", "text_comment")
+  late_policy_status = first_field(fields, "submission[late_policy_status]", "late_policy_status")
+  seconds_late_override = first_field(fields, "submission[seconds_late_override]", "seconds_late_override")
+  excuse = first_field(fields, "submission[excuse]", "excuse")
+
+  with state.lock:
+    if posted_grade is not None:
+      submission.grade = posted_grade
+      submission.score = float(posted_grade) if posted_grade.strip() else None
+      submission.grade_updates += 1
+      state.stats.grade_updates += 1
+    if comment:
+      submission.comments.append(comment)
+    if late_policy_status is not None:
+      submission.late_policy_status = None if late_policy_status == "none" else late_policy_status
+    if seconds_late_override is not None:
+      submission.seconds_late = int(float(seconds_late_override or 0))
+    if excuse is not None:
+      submission.excused = excuse.lower() in {"1", "true"}
+
+
+ROUTES: list[tuple[str, re.Pattern[str]]] = [
+  ("course", re.compile(r"^/api/v1/courses/(?P<course_id>\d+)$")),
+  ("users", re.compile(r"^/api/v1/courses/(?P<course_id>\d+)/(?:users|students|search_users)$")),
+  ("enrollments", re.compile(r"^/api/v1/courses/(?P<course_id>\d+)/enrollments$")),
+  ("assignments", re.compile(r"^/api/v1/courses/(?P<course_id>\d+)/assignments$")),
+  ("assignment", re.compile(r"^/api/v1/courses/(?P<course_id>\d+)/assignments/(?P<assignment_id>\d+)$")),
+  (
+    "submissions",
+    re.compile(r"^/api/v1/courses/(?P<course_id>\d+)/assignments/(?P<assignment_id>\d+)/submissions$"),
+  ),
+  (
+    "update_grades",
+    re.compile(
+      r"^/api/v1/courses/(?P<course_id>\d+)/assignments/(?P<assignment_id>\d+)/submissions/update_grades$"
+    ),
+  ),
+  (
+    "submission",
+    re.compile(
+      r"^/api/v1/courses/(?P<course_id>\d+)/assignments/(?P<assignment_id>\d+)/submissions/(?P<user_id>\d+)$"
+    ),
+  ),
+  ("progress", re.compile(r"^/api/v1/progress/(?P<progress_id>\d+)$")),
+]
+
+
+def match_route(path: str) -> tuple[str | None, dict[str, int]]:
+  for route_name, pattern in ROUTES:
+    matched = pattern.match(path)
+    if matched:
+      return route_name, {key: int(value) for key, value in matched.groupdict().items()}
+  return None, {}
+
+
+class FakeCanvasRequestHandler(BaseHTTPRequestHandler):
+  server_version = "FakeCanvas/1.0"
+  protocol_version = "HTTP/1.1"
+
+  @property
+  def state(self) -> FakeCanvasState:
+    return self.server.state
+
+  def log_message(self, format: str, *args) -> None:
+    return None
+
+  def do_GET(self) -> None:
+    self.handle_api("GET")
+
+  def do_PUT(self) -> None:
+    self.handle_api("PUT")
+
+  def do_POST(self) -> None:
+    self.handle_api("POST")
+
+  def handle_api(self, method: str) -> None:
+    split = urlsplit(self.path)
+    length = int(self.headers.get("Content-Length") or 0)
+    body = self.rfile.read(length) if length else b""
+    route_name, params = match_route(split.path.rstrip("/"))
+    allowed, remaining = self.state.begin_request(f"{method} {route_name or 'unknown'}")
+    try:
+      delay = self.state.simulated_delay()
+      if delay:
+        time.sleep(delay)
+      if not self.is_authorized():
+        self.send_json(HTTPStatus.UNAUTHORIZED, {"errors": [{"message": "Invalid access token."}]})
+        return
+      if not allowed:
+        self.send_text(HTTPStatus.FORBIDDEN, RATE_LIMIT_EXCEEDED_BODY, remaining=remaining)
+        return
+      if route_name is None:
+        self.send_json(HTTPStatus.NOT_FOUND, {"errors": [{"message": "The specified resource does not exist."}]})
+        return
+      fields = parse_request_fields(split.query, body, self.headers.get("Content-Type", ""))
+      self.dispatch(method, route_name, params, fields, remaining)
+    finally:
+      self.state.end_request()
+
+  def is_authorized(self) -> bool:
+    expected = self.state.settings.api_token
+    if expected is None:
+      return True
+    return self.headers.get("Authorization", "") == f"Bearer {expected}"
+
+  def dispatch(
+    self,
+    method: str,
+    route_name: str,
+    params: dict[str, int],
+    fields: dict[str, list[str]],
+    remaining: float | None,
+  ) -> None:
+    if route_name == "progress":
+      progress = self.state.progress.get(params["progress_id"])
+      if progress is None:
+        self.send_not_found()
+        return
+      self.send_json(HTTPStatus.OK, progress, remaining=remaining)
+      return
+
+    course = self.state.courses.get(params["course_id"])
+    if course is None:
+      self.send_not_found()
+      return
+
+    if route_name == "course" and method == "GET":
+      self.send_json(
+        HTTPStatus.OK,
+        {"id": course.id, "name": course.name, "course_code": course.name},
+        remaining=remaining,
+      )
+      return
+    if route_name == "users" and method == "GET":
+      self.send_page([user_json(student) for student in course.students], fields, remaining)
+      return
+    if route_name == "enrollments" and method == "GET":
+      self.send_page([enrollment_json(course.id, student) for student in course.students], fields, remaining)
+      return
+    if route_name == "assignments" and method == "GET":
+      self.send_page([assignment.to_json() for assignment in course.assignments.values()], fields, remaining)
+      return
+
+    assignment = course.assignments.get(params.get("assignment_id", -1))
+    if assignment is None:
+      self.send_not_found()
+      return
+
+    if route_name == "assignment" and method == "GET":
+      self.send_json(HTTPStatus.OK, assignment.to_json(), remaining=remaining)
+      return
+    if route_name == "submissions" and method == "GET":
+      with self.state.lock:
+        items = [
+          course.get_submission(assignment.id, student.user_id).to_json()
+          for student in course.students
+        ]
+      self.send_page(items, fields, remaining)
+      return
+    if route_name == "update_grades" and method == "POST":
+      self.update_grades(course, assignment, fields, remaining)
+      return
+
+    user_ids = {student.user_id for student in course.students}
+    if params.get("user_id") not in user_ids:
+      self.send_not_found()
+      return
+    with self.state.lock:
+      submission = course.get_submission(assignment.id, params["user_id"])
+    if route_name == "submission" and method == "GET":
+      self.send_json(HTTPStatus.OK, submission.to_json(), remaining=remaining)
+      return
+    if route_name == "submission" and method == "PUT":
+      apply_submission_update(self.state, submission, fields)
+      self.send_json(HTTPStatus.OK, submission.to_json(), remaining=remaining)
+      return
+
+    self.send_json(HTTPStatus.METHOD_NOT_ALLOWED, {"errors": [{"message": f"{method} not supported."}]})
+
+  def update_grades(
+    self,
+    course: FakeCourseState,
+    assignment: FakeAssignmentState,
+    fields: dict[str, list[str]],
+    remaining: float | None,
+  ) -> None:
+    grade_fields: dict[int, dict[str, list[str]]] = {}
+    pattern = re.compile(r"^grade_data\[(?P<user_id>\d+)\]\[(?P<name>[a-z_]+)\]$")
+    for key, values in fields.items():
+      matched = pattern.match(key)
+      if matched is None:
+        continue
+      user_fields = grade_fields.setdefault(int(matched.group("user_id")), {})
+      name = matched.group("name")
+      if name == "text_comment":
+        user_fields["comment[text_comment]"] = values
+      else:
+        user_fields[f"submission[{name}]"] = values
+    for user_id, user_fields in grade_fields.items():
+      with self.state.lock:
+        submission = course.get_submission(assignment.id, user_id)
+      apply_submission_update(self.state, submission, user_fields)
+
+    with self.state.lock:
+      progress_id = len(self.state.progress) + 1
+      progress = {
+        "id": progress_id,
+        "context_id": assignment.id,
+        "context_type": "Assignment",
+        "tag": "submissions_update",
+        "completion": 100,
+        "workflow_state": "completed",
+        "url": f"{self.base_url()}/api/v1/progress/{progress_id}",
+      }
+      self.state.progress[progress_id] = progress
+    self.send_json(HTTPStatus.OK, progress, remaining=remaining)
+
+  def base_url(self) -> str:
+    host, port = self.server.server_address[:2]
+    return f"http://{host}:{port}"
+
+  def send_page(self, items: list[dict[str, object]], fields: dict[str, list[str]], remaining: float | None) -> None:
+    per_page_text = first_field(fields, "per_page")
+    per_page = self.state.settings.default_per_page
+    if per_page_text and per_page_text.isdigit():
+      per_page = min(max(int(per_page_text), 1), MAX_PER_PAGE)
+    page_text = first_field(fields, "page")
+    page = int(page_text) if page_text and page_text.isdigit() and int(page_text) > 0 else 1
+    last_page = max((len(items) + per_page - 1) // per_page, 1)
+    start = (page - 1) * per_page
+
+    split = urlsplit(self.path)
+    query = {key: values for key, values in parse_qs(split.query, keep_blank_values=True).items()}
+
+    def page_url(number: int) -> str:
+      page_query = dict(query)
+      page_query["page"] = [str(number)]
+      page_query["per_page"] = [str(per_page)]
+      return f"{self.base_url()}{split.path}?{urlencode(page_query, doseq=True)}"
+
+    links = [f'<{page_url(page)}>; rel="current"']
+    if page < last_page:
+      links.append(f'<{page_url(page + 1)}>; rel="next"')
+    if page > 1:
+      links.append(f'<{page_url(page - 1)}>; rel="prev"')
+    links.append(f'<{page_url(1)}>; rel="first"')
+    links.append(f'<{page_url(last_page)}>; rel="last"')
+    self.send_json(
+      HTTPStatus.OK,
+      items[start:start + per_page],
+      remaining=remaining,
+      headers={"Link": ",".join(links)},
+    )
+
+  def send_not_found(self) -> None:
+    self.send_json(HTTPStatus.NOT_FOUND, {"errors": [{"message": "The specified resource does not exist."}]})
+
+  def send_json(
+    self,
+    status: HTTPStatus,
+    payload,
+    *,
+    remaining: float | None = None,
+    headers: dict[str, str] | None = None,
+  ) -> None:
+    self.send_body(status, json.dumps(payload).encode("utf-8"), "application/json; charset=utf-8", remaining, headers)
+
+  def send_text(self, status: HTTPStatus, text: str, *, remaining: float | None = None) -> None:
+    self.send_body(status, text.encode("utf-8"), "text/plain; charset=utf-8", remaining, None)
+
+  def send_body(
+    self,
+    status: HTTPStatus,
+    body: bytes,
+    content_type: str,
+    remaining: float | None,
+    headers: dict[str, str] | None,
+  ) -> None:
+    self.send_response(status)
+    self.send_header("Content-Type", content_type)
+    self.send_header("Content-Length", str(len(body)))
+    if remaining is not None:
+      self.send_header("X-Rate-Limit-Remaining", f"{remaining:.3f}")
+      self.send_header("X-Request-Cost", f"{self.state.settings.rate_limit_request_cost:.3f}")
+    for name, value in (headers or {}).items():
+      self.send_header(name, value)
+    self.end_headers()
+    self.wfile.write(body)
+
+
+class FakeCanvasServer(ThreadingHTTPServer):
+  daemon_threads = True
+
+  def __init__(self, state: FakeCanvasState, host: str = "127.0.0.1", port: int = 0):
+    super().__init__((host, port), FakeCanvasRequestHandler)
+    self.state = state
+
+  @property
+  def base_url(self) -> str:
+    host, port = self.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+@contextlib.contextmanager
+def running_fake_canvas(state: FakeCanvasState, host: str = "127.0.0.1", port: int = 0):
+  server = FakeCanvasServer(state, host=host, port=port)
+  thread = threading.Thread(target=server.serve_forever, name="fake-canvas", daemon=True)
+  thread.start()
+  try:
+    yield server
+  finally:
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def build_settings(args: argparse.Namespace) -> FakeCanvasSettings:
+  return FakeCanvasSettings(
+    latency_ms=args.latency_ms,
+    jitter_ms=args.jitter_ms,
+    default_per_page=args.per_page,
+    rate_limit_capacity=args.rate_limit_capacity,
+    rate_limit_drain_per_second=args.rate_limit_drain,
+    rate_limit_request_cost=args.rate_limit_cost,
+    api_token=args.api_token,
+  )
+
+
+def build_seeded_state(args: argparse.Namespace) -> tuple[FakeCanvasState, list[benchmark_codepath_to_canvas.SyntheticStudent]]:
+  students = benchmark_codepath_to_canvas.generate_students(args.students, seed=args.seed)
+  state = FakeCanvasState(build_settings(args))
+  state.add_course(
+    args.course_id,
+    students,
+    [1000 + index for index in range(args.assignments)],
+  )
+  return state, students
+
+
+def run_load_test(args: argparse.Namespace) -> int:
+  import codepath_to_canvas
+
+  state, students = build_seeded_state(args)
+  with tempfile.TemporaryDirectory() as tempdir, running_fake_canvas(state, host=args.host) as server:
+    root = Path(tempdir)
+    assignments_yaml, name_map = benchmark_codepath_to_canvas.prepare_push_inputs(
+      root,
+      students,
+      args.assignments,
+      seed=args.seed,
+    )
+    config = yaml.safe_load(assignments_yaml.read_text(encoding="utf-8"))
+    config["course-id"] = args.course_id
+    assignments_yaml.write_text(yaml.safe_dump(config, sort_keys=False), encoding="utf-8")
+
+    environment = {
+      args.url_env: server.base_url,
+      args.key_env: args.api_token or "fake-canvas-token",
+    }
+    argv = [
+      "--assignments",
+      str(assignments_yaml),
+      "--data-dir",
+      str(root),
+      "--name-map",
+      str(name_map),
+      *args.extra_args,
+    ]
+    started = time.perf_counter()
+    output = io.StringIO()
+    with contextlib.ExitStack() as stack:
+      stack.enter_context(temporary_environment(environment))
+      if not args.show_output:
+        stack.enter_context(contextlib.redirect_stdout(output))
+      exit_code = codepath_to_canvas.main(argv)
+    elapsed = time.perf_counter() - started
+
+  stats = state.snapshot_stats()
+  report = {
+    "students": args.students,
+    "assignments": args.assignments,
+    "latency_ms": args.latency_ms,
+    "exit_code": exit_code,
+    "seconds": elapsed,
+    "requests_per_second": stats["total_requests"] / elapsed if elapsed else None,
+    **stats,
+  }
+  print(json.dumps(report, indent=2))
+  return exit_code
+
+
+@contextlib.contextmanager
+def temporary_environment(values: dict[str, str]):
+  previous = {key: os.environ.get(key) for key in values}
+  os.environ.update(values)
+  try:
+    yield
+  finally:
+    for key, value in previous.items():
+      if value is None:
+        os.environ.pop(key, None)
+      else:
+        os.environ[key] = value
+
+
+def run_server(args: argparse.Namespace) -> int:
+  state, _ = build_seeded_state(args)
+  server = FakeCanvasServer(state, host=args.host, port=args.port)
+  print(f"Fake Canvas listening on {server.base_url}")
+  print(f"  export {args.url_env}={server.base_url}")
+  print(f"  export {args.key_env}={args.api_token or 'fake-canvas-token'}")
+  print(f"  course-id: {args.course_id}, assignment-ids: 1000..{1000 + args.assignments - 1}")
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    print(json.dumps(state.snapshot_stats(), indent=2), file=sys.stderr)
+  return 0
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(
+    description="Local stand-in for the Canvas REST endpoints used by codepath_to_canvas.py."
+  )
+  parser.add_argument("command", choices=("serve", "load-test"), help="Run the server, or load-test a batch push against it.")
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=8765, help="Port for 'serve'. Load tests pick a free port.")
+  parser.add_argument("--course-id", type=int, default=1)
+  parser.add_argument("--students", type=int, default=500)
+  parser.add_argument("--assignments", type=int, default=1)
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--latency-ms", type=float, default=0.0, help="Fixed latency added to every request.")
+  parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random latency added on top of --latency-ms.")
+  parser.add_argument("--per-page", type=int, default=DEFAULT_PER_PAGE, help="Default page size for list endpoints.")
+  parser.add_argument(
+    "--rate-limit-capacity",
+    type=float,
+    default=None,
+    help="Enable Canvas-style leaky-bucket throttling with this bucket size.",
+  )
+  parser.add_argument("--rate-limit-drain", type=float, default=10.0, help="Bucket drain per second.")
+  parser.add_argument("--rate-limit-cost", type=float, default=1.0, help="Bucket cost per request.")
+  parser.add_argument("--api-token", default=None, help="Require this bearer token. Any token is accepted by default.")
+  parser.add_argument(
+    "--url-env",
+    default="CANVAS_API_URL",
+    help="Environment variable the LMS client reads its Canvas base URL from.",
+  )
+  parser.add_argument(
+    "--key-env",
+    default="CANVAS_API_KEY",
+    help="Environment variable the LMS client reads its Canvas API key from.",
+  )
+  parser.add_argument("--show-output", action="store_true", help="Show codepath_to_canvas output during load tests.")
+  parser.epilog = "Arguments after '--' are passed through to codepath_to_canvas.py during load tests."
+  argv = list(sys.argv[1:] if argv is None else argv)
+  extra_args: list[str] = []
+  if "--" in argv:
+    split_index = argv.index("--")
+    argv, extra_args = argv[:split_index], argv[split_index + 1:]
+  args = parser.parse_args(argv)
+  args.extra_args = extra_args
+  return args
+
+
+def main(argv: list[str] | None = None) -> int:
+  args = parse_args(argv)
+  if args.command == "serve":
+    return run_server(args)
+  return run_load_test(args)
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
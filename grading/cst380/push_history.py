@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import hashlib
+import sqlite3
+import sys
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pushes (
+  id INTEGER PRIMARY KEY,
+  run_id TEXT NOT NULL,
+  recorded_at TEXT NOT NULL,
+  course_id INTEGER,
+  assignment_id INTEGER,
+  assignment TEXT NOT NULL,
+  user_id INTEGER NOT NULL,
+  canvas_student TEXT NOT NULL,
+  action TEXT,
+  outcome TEXT NOT NULL,
+  score REAL,
+  seconds_late INTEGER,
+  feedback_sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS pushes_by_key ON pushes (course_id, assignment, user_id, recorded_at);
+CREATE INDEX IF NOT EXISTS pushes_by_user ON pushes (user_id, recorded_at);
+CREATE INDEX IF NOT EXISTS pushes_by_student ON pushes (canvas_student COLLATE NOCASE, recorded_at);
+CREATE TRIGGER IF NOT EXISTS pushes_no_update BEFORE UPDATE ON pushes
+BEGIN
+  SELECT RAISE(ABORT, 'push history is append-only');
+END;
+CREATE TRIGGER IF NOT EXISTS pushes_no_delete BEFORE DELETE ON pushes
+BEGIN
+  SELECT RAISE(ABORT, 'push history is append-only');
+END;
+"""
+COLUMNS = (
+  "recorded_at",
+  "course_id",
+  "assignment_id",
+  "assignment",
+  "user_id",
+  "canvas_student",
+  "action",
+  "outcome",
+  "score",
+  "seconds_late",
+  "feedback_sha256",
+)
+
+
+@dataclass(frozen=True)
+class PushHistoryRecord:
+  course_id: int | None
+  assignment_id: int | None
+  assignment: str
+  user_id: int
+  canvas_student: str
+  action: str | None
+  outcome: str
+  score: float | None = None
+  seconds_late: int | None = None
+  feedback_sha256: str | None = None
+  recorded_at: str | None = None
+
+
+def hash_feedback(text: str | None) -> str | None:
+  if text is None:
+    return None
+  return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def utc_timestamp() -> str:
+  return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+class PushHistoryStore:
+  def __init__(self, path: Path, run_id: str | None = None):
+    self.path = path
+    self.run_id = run_id or uuid.uuid4().hex[:12]
+    self.lock = threading.Lock()
+    self.connection = sqlite3.connect(path, check_same_thread=False)
+    self.connection.row_factory = sqlite3.Row
+    with self.connection:
+      self.connection.execute("PRAGMA journal_mode=WAL")
+      self.connection.executescript(SCHEMA)
+      self.connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+  def close(self) -> None:
+    with self.lock:
+      self.connection.close()
+
+  def append(self, records: list[PushHistoryRecord]) -> int:
+    if not records:
+      return 0
+    recorded_at = utc_timestamp()
+    rows = [
+      (
+        self.run_id,
+        record.recorded_at or recorded_at,
+        record.course_id,
+        record.assignment_id,
+        record.assignment,
+        record.user_id,
+        record.canvas_student,
+        record.action,
+        record.outcome,
+        record.score,
+        record.seconds_late,
+        record.feedback_sha256,
+      )
+      for record in records
+    ]
+    with self.lock, self.connection:
+      self.connection.executemany(
+        f"INSERT INTO pushes (run_id, {', '.join(COLUMNS)}) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+        rows,
+      )
+    return len(rows)
+
+  def query(
+    self,
+    *,
+    course_id: int | None = None,
+    assignment: str | None = None,
+    user_id: int | None = None,
+    student: str | None = None,
+    outcome: str | None = None,
+    latest_only: bool = False,
+    limit: int | None = None,
+  ) -> list[sqlite3.Row]:
+    clauses: list[str] = []
+    parameters: list[object] = []
+    if course_id is not None:
+      clauses.append("course_id = ?")
+      parameters.append(course_id)
+    if assignment is not None:
+      clauses.append("assignment = ?")
+      parameters.append(assignment)
+    if user_id is not None:
+      clauses.append("user_id = ?")
+      parameters.append(user_id)
+    if student is not None:
+      clauses.append("canvas_student LIKE ? COLLATE NOCASE")
+      parameters.append(f"%{student}%")
+    if outcome is not None:
+      clauses.append("outcome = ?")
+      parameters.append(outcome)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    if latest_only:
+      sql = (
+        f"SELECT run_id, {', '.join(COLUMNS)} FROM ("
+        f"SELECT *, ROW_NUMBER() OVER ("
+        f"PARTITION BY course_id, assignment, user_id ORDER BY recorded_at DESC, id DESC"
+        f") AS position FROM pushes {where}"
+        f") WHERE position = 1 ORDER BY canvas_student, assignment"
+      )
+    else:
+      sql = f"SELECT run_id, {', '.join(COLUMNS)} FROM pushes {where} ORDER BY recorded_at, id"
+    if limit is not None:
+      sql += " LIMIT ?"
+      parameters.append(limit)
+    with self.lock:
+      return self.connection.execute(sql, parameters).fetchall()
+
+
+def format_rows(rows: list[sqlite3.Row]) -> list[str]:
+  header = ("recorded_at", "course_id", "assignment", "user_id", "canvas_student", "outcome", "score", "seconds_late", "feedback")
+  table = [header]
+  for row in rows:
+    table.append((
+      row["recorded_at"],
+      "" if row["course_id"] is None else str(row["course_id"]),
+      row["assignment"],
+      str(row["user_id"]),
+      row["canvas_student"],
+      row["outcome"],
+      "" if row["score"] is None else f"{row['score']:g}",
+      "" if row["seconds_late"] is None else str(row["seconds_late"]),
+      (row["feedback_sha256"] or "")[:12],
+    ))
+  widths = [max(len(line[index]) for line in table) for index in range(len(header))]
+  return ["  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip() for line in table]
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description="Query the local history of CodePath grades pushed to Canvas.")
+  parser.add_argument("--db", default="push_history.sqlite3", help="Push history database written by --push-history.")
+  parser.add_argument("--course-id", type=int, help="Only show pushes for this Canvas course.")
+  parser.add_argument("--assignment", help="Only show pushes for this assignment key.")
+  parser.add_argument("--user-id", type=int, help="Only show pushes for this Canvas user ID.")
+  parser.add_argument("--student", help="Case-insensitive substring of the Canvas student name.")
+  parser.add_argument("--outcome", help="Only show one outcome, e.g. pushed, push_failed or marked_missing.")
+  parser.add_argument("--latest", action="store_true", help="Show only the most recent entry per course, assignment and student.")
+  parser.add_argument("--limit", type=int, help="Maximum number of rows to print.")
+  return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+  args = parse_args(argv)
+  db_path = Path(args.db)
+  if not db_path.exists():
+    print(f"Push history not found: {db_path}", file=sys.stderr)
+    return 1
+
+  store = PushHistoryStore(db_path)
+  try:
+    rows = store.query(
+      course_id=args.course_id,
+      assignment=args.assignment,
+      user_id=args.user_id,
+      student=args.student,
+      outcome=args.outcome,
+      latest_only=args.latest,
+      limit=args.limit,
+    )
+  finally:
+    store.close()
+
+  if not rows:
+    print("No matching pushes.")
+    return 0
+  for line in format_rows(rows):
+    print(line)
+  return 0
+
+
+if __name__ == "__main__":
+  raise SystemExit(main())
@@ -0,0 +1,65 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import benchmark_codepath_to_canvas
+import codepath_to_canvas
+
+
+class BenchmarkCodePathToCanvasTests(unittest.TestCase):
+  def test_generate_students_is_deterministic_and_unique(self) -> None:
+    first = benchmark_codepath_to_canvas.generate_students(500, seed=7)
+    second = benchmark_codepath_to_canvas.generate_students(500, seed=7)
+
+    self.assertEqual(first, second)
+    self.assertEqual(len({student.canvas_name for student in first}), 500)
+    self.assertEqual(len({student.user_id for student in first}), 500)
+
+  def test_generated_codepath_timestamps_round_trip(self) -> None:
+    students = benchmark_codepath_to_canvas.generate_students(20, seed=3)
+    rows = benchmark_codepath_to_canvas.generate_codepath_rows(students, seed=3)
+
+    for row in rows:
+      submitted_at = codepath_to_canvas.parse_codepath_timestamp(
+        row["Submitted"],
+        reference_due_at=benchmark_codepath_to_canvas.BENCHMARK_DUE_AT,
+      )
+      self.assertIsNotNone(submitted_at)
+      self.assertEqual(
+        benchmark_codepath_to_canvas.format_codepath_timestamp(submitted_at),
+        row["Submitted"],
+      )
+
+  def test_end_to_end_push_reaches_every_student(self) -> None:
+    students = benchmark_codepath_to_canvas.generate_students(25, seed=1, alias_fraction=0.2)
+    with tempfile.TemporaryDirectory() as tempdir:
+      result = benchmark_codepath_to_canvas.bench_end_to_end_push(
+        students,
+        assignment_count=2,
+        repeat=1,
+        seed=1,
+        latency_ms=0.0,
+        workdir=Path(tempdir),
+      )
+
+    self.assertEqual(result.extra["pushes"], 50)
+    self.assertEqual(result.students, 25)
+
+  def test_report_is_json_serializable(self) -> None:
+    results = benchmark_codepath_to_canvas.run_benchmarks(
+      sizes=[10],
+      assignment_counts=[1],
+      benchmarks=["name_resolution", "score_conversion"],
+      repeat=1,
+    )
+
+    report = json.loads(json.dumps(benchmark_codepath_to_canvas.build_report(results)))
+    self.assertEqual(
+      [entry["benchmark"] for entry in report["results"]],
+      ["name_resolution", "score_conversion"],
+    )
+
+
+if __name__ == "__main__":
+  unittest.main()
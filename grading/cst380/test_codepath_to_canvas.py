@@ -1,8 +1,10 @@
 import csv
+import importlib.util
 import sys
 import tempfile
 import unittest
 import io
+import json
 import contextlib
 from datetime import datetime
 from pathlib import Path
@@ -81,6 +83,105 @@ class CodePathToCanvasTests(unittest.TestCase):
     self.assertIn("Missing Student", unresolved)
     self.assertEqual(warnings, [])
 
+  def test_suggestion_cache_reuses_results_until_roster_changes(self) -> None:
+    with tempfile.TemporaryDirectory() as tempdir:
+      cache_path = codepath_to_canvas.get_suggestion_cache_path(Path(tempdir) / "name_map.yaml")
+      cache = codepath_to_canvas.load_suggestion_cache(cache_path)
+      first = codepath_to_canvas.get_match_suggestions(
+        "Samuel Jakobs",
+        ["Jacobs, Samuel", "Rivera, Ana"],
+        suggestion_count=2,
+        suggestion_cache=cache,
+      )
+      codepath_to_canvas.save_suggestion_cache(cache)
+      self.assertEqual(cache_path.name, "name_map.suggestions.json")
+
+      reloaded = codepath_to_canvas.load_suggestion_cache(cache_path)
+      with mock.patch.object(codepath_to_canvas.matching, "extract") as extract:
+        cached = codepath_to_canvas.get_match_suggestions(
+          "samuel  JAKOBS",
+          ["Rivera, Ana", "Jacobs, Samuel"],
+          suggestion_count=2,
+          suggestion_cache=reloaded,
+        )
+      extract.assert_not_called()
+      self.assertEqual(cached, first)
+
+      with mock.patch.object(codepath_to_canvas.matching, "extract", return_value=[]) as extract:
+        codepath_to_canvas.get_match_suggestions(
+          "Samuel Jakobs",
+          ["Jacobs, Samuel", "Rivera, Ana", "Nguyen, Bao"],
+          suggestion_count=2,
+          suggestion_cache=reloaded,
+        )
+      extract.assert_called_once()
+
+  def test_resolve_name_matches_fingerprints_roster_once(self) -> None:
+    roster = [f"Filler{index:03d}, Person" for index in range(20)] + ["Jacobs, Samuel", "Rivera, Ana"]
+    codepath_names = ["Sam Jakobs", "Anna Riviera", "Bao Nguyen"]
+
+    def resolve(cache):
+      return codepath_to_canvas.resolve_name_matches(
+        codepath_names=codepath_names,
+        canvas_names=roster,
+        existing_map={},
+        auto_match_threshold=90,
+        auto_match_gap=10,
+        suggestion_count=3,
+        suggestion_cache=cache,
+      )
+
+    cache = codepath_to_canvas.SuggestionCache(path=None)
+    with mock.patch.object(
+      codepath_to_canvas,
+      "get_roster_fingerprint",
+      wraps=codepath_to_canvas.get_roster_fingerprint,
+    ) as fingerprint:
+      first = resolve(cache)
+    self.assertEqual(fingerprint.call_count, 1)
+
+    with mock.patch.object(codepath_to_canvas.matching, "extract") as extract:
+      second = resolve(cache)
+    extract.assert_not_called()
+    self.assertEqual(second, first)
+
+  def test_suggestion_cache_ignores_entries_from_older_scorers(self) -> None:
+    with tempfile.TemporaryDirectory() as tempdir:
+      cache_path = Path(tempdir) / "name_map.suggestions.json"
+      cache_path.write_text(
+        json.dumps({"version": 1, "entries": {"token_set_ratio|2|x|samuel jakobs": [["Rivera, Ana", 99]]}}),
+        encoding="utf-8",
+      )
+
+      cache = codepath_to_canvas.load_suggestion_cache(cache_path)
+      key = codepath_to_canvas.get_suggestion_cache_key("Samuel Jakobs", "x", "token_set_ratio", 2)
+
+    self.assertIsNone(cache.get("token_set_ratio|2|x|samuel jakobs"))
+    self.assertIn(codepath_to_canvas.matching.SCORER_IMPLEMENTATION, key)
+
+  def test_candidate_index_blocks_on_tokens_phonetics_and_trigrams(self) -> None:
+    roster = [f"Filler{index:03d}, Person" for index in range(120)] + ["Jacobs, Samuel", "Rivera, Ana"]
+    index = codepath_to_canvas.NameCandidateIndex(roster)
+
+    self.assertEqual(codepath_to_canvas.matching.soundex("Jakobs"), codepath_to_canvas.matching.soundex("Jacobs"))
+    self.assertEqual(index.candidates("Sam Jakobs"), ["Jacobs, Samuel"])
+    self.assertEqual(index.candidates("Sam Jakobs", excluded={"Jacobs, Samuel"}), [])
+    self.assertEqual(
+      codepath_to_canvas.select_suggestion_candidates("Zed Quux", roster, {"Rivera, Ana"}, 3, index),
+      roster[:-1],
+    )
+
+    _, suggested, unresolved, _ = codepath_to_canvas.resolve_name_matches(
+      codepath_names=["Samuel Jakobs"],
+      canvas_names=roster,
+      existing_map={},
+      auto_match_threshold=80,
+      auto_match_gap=4,
+      suggestion_count=1,
+    )
+    self.assertEqual(suggested, {"Samuel Jakobs": "Jacobs, Samuel"})
+    self.assertEqual(unresolved["Samuel Jakobs"][0].canvas_name, "Jacobs, Samuel")
+
   def test_compute_seconds_late_defaults_to_submitted_timestamp(self) -> None:
     submitted_at, seconds_late = codepath_to_canvas.compute_seconds_late(
       {
@@ -127,6 +228,68 @@ class CodePathToCanvasTests(unittest.TestCase):
     self.assertIsNone(submitted_at)
     self.assertIsNone(seconds_late)
 
+  def test_evaluate_late_policy_bulk_fetches_and_reuses_decisions(self) -> None:
+    class FakeSubmission:
+      def __init__(self, user_id: int, cached_due_date: str | None = None):
+        self.user_id = user_id
+        self.cached_due_date = cached_due_date
+        self.submitted_at = None
+        self.excused = False
+
+    class FakeAssignment:
+      id = 42
+      due_at = "2026-03-10T19:00:00Z"
+
+      def __init__(self):
+        self.single_fetches: list[int] = []
+
+      def get_submissions(self):
+        return [FakeSubmission(1), FakeSubmission(2, cached_due_date="2026-03-12T19:00:00Z")]
+
+      def get_submission(self, user_id: int):
+        self.single_fetches.append(user_id)
+        if user_id == 4:
+          raise RuntimeError("not found")
+        return FakeSubmission(user_id)
+
+    args = mock.Mock()
+    args.strict_deadlines = False
+    args._late_policy_cache = {}
+    assignment = FakeAssignment()
+    roster_rows = [
+      {"Student": "Alpha, Alice", "ID": "1"},
+      {"Student": "Beta, Bob", "ID": "2"},
+      {"Student": "Gamma, Gail", "ID": "3"},
+      {"Student": "Delta, Dan", "ID": "4"},
+    ]
+    codepath_by_canvas_name = {
+      "Alpha, Alice": {"Submitted": "3/10 at 12:30pm PDT", "Updated": ""},
+      "Beta, Bob": {"Submitted": "3/10 at 12:30pm PDT", "Updated": ""},
+    }
+
+    result = codepath_to_canvas.get_late_policy_result(args, assignment, "unit1")
+    codepath_to_canvas.evaluate_late_policy(
+      result,
+      assignment,
+      roster_rows,
+      codepath_by_canvas_name,
+      strict_deadlines=False,
+    )
+    codepath_to_canvas.evaluate_late_policy(
+      codepath_to_canvas.get_late_policy_result(args, assignment, "unit1"),
+      assignment,
+      roster_rows,
+      codepath_by_canvas_name,
+      strict_deadlines=False,
+    )
+
+    self.assertIs(codepath_to_canvas.get_late_policy_result(args, assignment, "unit1"), result)
+    self.assertEqual(assignment.single_fetches, [3, 4])
+    self.assertEqual(result.fetch_failed, {4})
+    self.assertEqual(result.decisions[1].seconds_late, 1800)
+    self.assertEqual(result.decisions[2].seconds_late, 0)
+    self.assertEqual(result.decisions[3].action, "mark_missing")
+
   def test_save_name_map_marks_suggestions_separately(self) -> None:
     with tempfile.TemporaryDirectory() as tempdir:
       name_map = Path(tempdir) / "name_map.yaml"
@@ -142,6 +305,27 @@ class CodePathToCanvasTests(unittest.TestCase):
       self.assertEqual(written_map["SUGGESTED"]["Smith, John"], ["Jon Smyth"])
       self.assertEqual(written_map["UNMATCHED"], ["Mystery Student"])
 
+  def test_write_canvas_output_is_atomic_and_skips_unchanged_content(self) -> None:
+    with tempfile.TemporaryDirectory() as tempdir:
+      output_path = Path(tempdir) / "canvas-unit1.csv"
+      rows = [{"Student": "Jacobs, Samuel", "Project": "80"}]
+
+      self.assertTrue(codepath_to_canvas.write_canvas_output(output_path, ["Student", "Project"], rows))
+      os.utime(output_path, ns=(1, 1))
+      self.assertFalse(codepath_to_canvas.write_canvas_output(output_path, ["Student", "Project"], rows))
+      self.assertEqual(output_path.stat().st_mtime_ns, 1)
+
+      rows[0]["Project"] = "90"
+      self.assertTrue(codepath_to_canvas.write_canvas_output(output_path, ["Student", "Project"], rows))
+      self.assertEqual(output_path.read_bytes(), b'Student,Project\r\n"Jacobs, Samuel",90\r\n')
+      self.assertEqual(sorted(path.name for path in Path(tempdir).iterdir()), ["canvas-unit1.csv"])
+
+      with mock.patch.object(codepath_to_canvas.os, "replace", side_effect=OSError("disk full")):
+        with self.assertRaises(OSError):
+          codepath_to_canvas.write_canvas_output(output_path, ["Student", "Project"], [])
+      self.assertIn(b"90", output_path.read_bytes())
+      self.assertEqual(sorted(path.name for path in Path(tempdir).iterdir()), ["canvas-unit1.csv"])
+
   def test_load_gradebook_assignment_rows_does_not_require_max_row(self) -> None:
     class FakeWorksheet:
       def iter_rows(self, values_only: bool = False):
@@ -532,6 +716,106 @@ class CodePathToCanvasTests(unittest.TestCase):
       )
       self.assertNotIn("SUGGESTED", written_map)
 
+  @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+  def test_main_exports_columnar_grade_table(self) -> None:
+    import pyarrow.feather as feather
+
+    with tempfile.TemporaryDirectory() as tempdir:
+      root = Path(tempdir)
+      codepath_csv = root / "codepath.csv"
+      canvas_csv = root / "canvas.csv"
+      export_path = root / "grades.arrow"
+
+      self.write_codepath_csv(
+        codepath_csv,
+        [
+          {
+            "First Name": "Sam",
+            "Last Name": "Jacobs",
+            "Github Username": "sj",
+            "Hours Spent": "1",
+            "Submitted": "",
+            "Updated": "",
+            "Feature Score": "14",
+            "Status": "Complete",
+            "Assigned Grader": "",
+            "Graded At": "",
+            "Submission URL": "",
+            "Notes": "",
+          },
+          {
+            "First Name": "Jackie",
+            "Last Name": "Luc",
+            "Github Username": "jl",
+            "Hours Spent": "1",
+            "Submitted": "",
+            "Updated": "",
+            "Feature Score": "",
+            "Status": "Complete",
+            "Assigned Grader": "",
+            "Graded At": "",
+            "Submission URL": "",
+            "Notes": "",
+          },
+        ],
+      )
+      self.write_canvas_csv(
+        canvas_csv,
+        [
+          ["    Points Possible", "", "", "", "", "100"],
+          ["Jacobs, Sam", "3", "u3", "u3", "sec", ""],
+          ["Luc, Jackie", "2", "u2", "u2", "sec", ""],
+        ],
+      )
+
+      with contextlib.redirect_stdout(io.StringIO()):
+        exit_code = codepath_to_canvas.main(
+          [
+            "--in",
+            str(codepath_csv),
+            "--canvas",
+            str(canvas_csv),
+            "--name-map",
+            str(root / "name_map.yaml"),
+            "--base-points",
+            "10",
+            "--stretch-points",
+            "10",
+            "--stretch-weight",
+            "0.5",
+            "--canvas-value",
+            "100",
+            "--export-parquet",
+            str(export_path),
+          ]
+        )
+
+      self.assertEqual(exit_code, 0)
+      table = feather.read_table(export_path).to_pylist()
+
+    self.assertEqual([row["canvas_student"] for row in table], ["Jacobs, Sam", "Luc, Jackie"])
+    self.assertEqual(table[0]["raw_score"], 14.0)
+    self.assertEqual(table[0]["canvas_score"], 80.0)
+    self.assertEqual(table[0]["outcome"], "written")
+    self.assertIsNone(table[1]["raw_score"])
+    self.assertEqual(table[1]["outcome"], "blank")
+
+  def test_export_parquet_without_pyarrow_fails_before_running(self) -> None:
+    with (
+      mock.patch.object(codepath_to_canvas.importlib.util, "find_spec", return_value=None),
+      contextlib.redirect_stderr(io.StringIO()) as stderr,
+      self.assertRaises(SystemExit),
+    ):
+      codepath_to_canvas.parse_args([
+        "--in", "codepath.csv",
+        "--canvas", "canvas.csv",
+        "--base-points", "10",
+        "--stretch-points", "10",
+        "--export-parquet", "grades.parquet",
+      ])
+
+    self.assertIn("--export-parquet requires pyarrow", stderr.getvalue())
+
   def test_main_fails_when_only_fuzzy_suggestion_exists(self) -> None:
     with tempfile.TemporaryDirectory() as tempdir:
       root = Path(tempdir)
@@ -848,6 +1132,248 @@ class CodePathToCanvasTests(unittest.TestCase):
       self.assertIn("Base points:", fake_interface.course.assignment.pushes[0]["comments"])
       self.assertIn("Stretch points:", fake_interface.course.assignment.pushes[0]["comments"])
 
+  def test_batch_push_fans_out_to_multiple_courses(self) -> None:
+    class FakeStudent:
+      def __init__(self, name: str, user_id: int):
+        self.name = name
+        self.user_id = user_id
+
+    class FakeSubmission:
+      def __init__(self):
+        self.submitted_at = "2026-03-10T12:00:00-07:00"
+        self.submission_type = "online_upload"
+        self.excused = False
+        self.attachments = []
+        self.body = ""
+        self.url = ""
+        self.media_comment_id = None
+
+      def edit(self, **kwargs):
+        return True
+
+    class FakeAssignment:
+      def __init__(self, assignment_id: int):
+        self.id = assignment_id
+        self.name = "Project 1"
+        self.points_possible = 100
+        self.due_at = datetime(2026, 3, 10, 12, 0, tzinfo=ZoneInfo("America/Los_Angeles"))
+        self.pushes: list[dict[str, object]] = []
+
+      def push_feedback(self, **kwargs):
+        self.pushes.append(kwargs)
+        return True
+
+      def get_submission(self, user_id: int):
+        return FakeSubmission()
+
+    class FakeCourse:
+      def __init__(self, students: list[FakeStudent]):
+        self.students = students
+        self.assignments: dict[int, FakeAssignment] = {}
+
+      def get_students(self, include_names: bool = False):
+        return self.students
+
+      def get_assignment(self, assignment_id: int):
+        return self.assignments.setdefault(assignment_id, FakeAssignment(assignment_id))
+
+    courses = {
+      101: FakeCourse([FakeStudent("Jacobs, Samuel", 3)]),
+      202: FakeCourse([FakeStudent("Rivera, Ana", 4)]),
+    }
+
+    class FakeCanvasInterface:
+      def __init__(self, *args, **kwargs):
+        self.kwargs = kwargs
+
+      def get_course(self, course_id: int):
+        return courses[course_id]
+
+    with tempfile.TemporaryDirectory() as tempdir:
+      root = Path(tempdir)
+      assignments_yaml = root / "assignments.yaml"
+      name_map = root / "name_map.yaml"
+
+      assignments_yaml.write_text(
+        yaml.safe_dump(
+          {
+            "courses": {
+              "section-a": {"course-id": 101, "assignment-ids": {"unit1": 5001}},
+              "section-b": {"course-id": 202, "assignment-ids": {"unit1": 6001}, "requests-per-second": 50},
+            },
+            "unit1": {"base": 10, "stretch": 10, "ignore": 0},
+          }
+        ),
+        encoding="utf-8",
+      )
+      name_map.write_text(
+        yaml.safe_dump({"CONFIRMED": {"Jacobs, Samuel": ["Sam Jacobs"], "Rivera, Ana": ["Ana Rivera"]}}),
+        encoding="utf-8",
+      )
+      self.write_codepath_csv(
+        root / "codepath-unit1.csv",
+        [
+          {
+            "First Name": first,
+            "Last Name": last,
+            "Github Username": "",
+            "Hours Spent": "1",
+            "Submitted": "3/10 at 11:30am PDT",
+            "Updated": "",
+            "Feature Score": "20",
+            "Status": "Complete",
+            "Assigned Grader": "",
+            "Graded At": "",
+            "Submission URL": "",
+            "Notes": "",
+          }
+          for first, last in (("Sam", "Jacobs"), ("Ana", "Rivera"))
+        ],
+      )
+
+      stdout = io.StringIO()
+      with (
+        mock.patch.object(codepath_to_canvas, "CanvasInterface", FakeCanvasInterface),
+        contextlib.redirect_stdout(stdout),
+      ):
+        exit_code = codepath_to_canvas.main(
+          [
+            "--assignments",
+            str(assignments_yaml),
+            "--data-dir",
+            str(root),
+            "--name-map",
+            str(name_map),
+          ]
+        )
+
+    self.assertEqual(exit_code, 0)
+    self.assertEqual([push["user_id"] for push in courses[101].assignments[5001].pushes], [3])
+    self.assertEqual([push["user_id"] for push in courses[202].assignments[6001].pushes], [4])
+    self.assertIn("=== Course section-a (101): OK ===", stdout.getvalue())
+    self.assertIn("unit1: pushed 1, missing 0", stdout.getvalue())
+
+  def test_batch_push_preflights_every_course(self) -> None:
+    class FakeStudent:
+      def __init__(self, name: str, user_id: int):
+        self.name = name
+        self.user_id = user_id
+
+    class FakeSubmission:
+      def __init__(self):
+        self.submitted_at = "2026-03-10T12:00:00-07:00"
+        self.submission_type = "online_upload"
+        self.excused = False
+        self.attachments = []
+        self.body = ""
+        self.url = ""
+        self.media_comment_id = None
+
+      def edit(self, **kwargs):
+        return True
+
+    class FakeAssignment:
+      def __init__(self, assignment_id: int):
+        self.id = assignment_id
+        self.name = "Project 1"
+        self.points_possible = 100
+        self.due_at = datetime(2026, 3, 10, 12, 0, tzinfo=ZoneInfo("America/Los_Angeles"))
+        self.pushes: list[dict[str, object]] = []
+
+      def push_feedback(self, **kwargs):
+        self.pushes.append(kwargs)
+        return True
+
+      def get_submission(self, user_id: int):
+        return FakeSubmission()
+
+    class FakeCourse:
+      def __init__(self, students: list[FakeStudent]):
+        self.students = students
+        self.assignments: dict[int, FakeAssignment] = {}
+
+      def get_students(self, include_names: bool = False):
+        return self.students
+
+      def get_assignment(self, assignment_id: int):
+        assignment = self.assignments.setdefault(assignment_id, FakeAssignment(assignment_id))
+        if assignment_id == 6001:
+          assignment.points_possible = -1
+        return assignment
+
+    courses = {
+      101: FakeCourse([FakeStudent("Jacobs, Samuel", 3)]),
+      202: FakeCourse([FakeStudent("Rivera, Ana", 4)]),
+    }
+
+    class FakeCanvasInterface:
+      def __init__(self, *args, **kwargs):
+        self.kwargs = kwargs
+
+      def get_course(self, course_id: int):
+        return courses[course_id]
+
+    with tempfile.TemporaryDirectory() as tempdir:
+      root = Path(tempdir)
+      assignments_yaml = root / "assignments.yaml"
+      name_map = root / "name_map.yaml"
+
+      assignments_yaml.write_text(
+        yaml.safe_dump(
+          {
+            "courses": {
+              "section-a": {"course-id": 101, "assignment-ids": {"unit1": 5001}},
+              "section-b": {"course-id": 202, "assignment-ids": {"unit1": 6001}, "requests-per-second": 50},
+            },
+            "unit1": {"base": 10, "stretch": 10, "ignore": 0},
+          }
+        ),
+        encoding="utf-8",
+      )
+      name_map.write_text(
+        yaml.safe_dump({"CONFIRMED": {"Jacobs, Samuel": ["Sam Jacobs"], "Rivera, Ana": ["Ana Rivera"]}}),
+        encoding="utf-8",
+      )
+      self.write_codepath_csv(
+        root / "codepath-unit1.csv",
+        [
+          {
+            "First Name": first,
+            "Last Name": last,
+            "Github Username": "",
+            "Hours Spent": "1",
+            "Submitted": "3/10 at 11:30am PDT",
+            "Updated": "",
+            "Feature Score": "20",
+            "Status": "Complete",
+            "Assigned Grader": "",
+            "Graded At": "",
+            "Submission URL": "",
+            "Notes": "",
+          }
+          for first, last in (("Sam", "Jacobs"), ("Ana", "Rivera"))
+        ],
+      )
+
+      with (
+        mock.patch.object(codepath_to_canvas, "CanvasInterface", FakeCanvasInterface),
+        contextlib.redirect_stdout(io.StringIO()),
+        self.assertRaisesRegex(ValueError, "non-negative"),
+      ):
+        codepath_to_canvas.main(
+          [
+            "--assignments",
+            str(assignments_yaml),
+            "--data-dir",
+            str(root),
+            "--name-map",
+            str(name_map),
+          ]
+        )
+
+    self.assertEqual(courses[101].assignments[5001].pushes, [])
+    self.assertEqual(courses[202].assignments[6001].pushes, [])
+
   def test_batch_push_uses_updated_timestamp_when_strict_deadlines_enabled(self) -> None:
     class FakeStudent:
       def __init__(self, name: str, user_id: int):
@@ -1662,6 +2188,257 @@ class CodePathToCanvasTests(unittest.TestCase):
       finally:
         os.chdir(old_cwd)
 
+  def test_main_writes_chrome_trace_and_phase_summary(self) -> None:
+    with tempfile.TemporaryDirectory() as tempdir:
+      root = Path(tempdir)
+      codepath_csv = root / "codepath.csv"
+      canvas_csv = root / "canvas.csv"
+      trace_path = root / "trace.json"
+
+      self.write_codepath_csv(
+        codepath_csv,
+        [
+          {
+            "First Name": "Sam",
+            "Last Name": "Jacobs",
+            "Github Username": "sj",
+            "Hours Spent": "1",
+            "Submitted": "",
+            "Updated": "",
+            "Feature Score": "14",
+            "Status": "Complete",
+            "Assigned Grader": "",
+            "Graded At": "",
+            "Submission URL": "",
+            "Notes": "",
+          },
+        ],
+      )
+      self.write_canvas_csv(
+        canvas_csv,
+        [
+          ["    Points Possible", "", "", "", "", "100"],
+          ["Jacobs, Sam", "3", "u3", "u3", "sec", ""],
+        ],
+      )
+
+      stdout = io.StringIO()
+      with contextlib.redirect_stdout(stdout):
+        exit_code = codepath_to_canvas.main(
+          [
+            "--in",
+            str(codepath_csv),
+            "--canvas",
+            str(canvas_csv),
+            "--name-map",
+            str(root / "name_map.yaml"),
+            "--base-points",
+            "10",
+            "--stretch-points",
+            "10",
+            "--trace",
+            str(trace_path),
+          ]
+        )
+
+      self.assertEqual(exit_code, 0)
+      trace = json.loads(trace_path.read_text(encoding="utf-8"))
+      span_names = {event["name"] for event in trace["traceEvents"] if event["ph"] == "X"}
+      self.assertTrue({"read_codepath", "read_canvas", "resolve_names", "write_output"} <= span_names)
+      for event in trace["traceEvents"]:
+        if event["ph"] == "X":
+          self.assertGreaterEqual(event["dur"], 0)
+      self.assertIn("Phase timings:", stdout.getvalue())
+      self.assertIn("resolve_names", stdout.getvalue())
+
+  def test_watch_mode_reruns_only_changed_assignments(self) -> None:
+    row = {
+      "First Name": "Sam",
+      "Last Name": "Jacobs",
+      "Github Username": "sj",
+      "Hours Spent": "1",
+      "Submitted": "",
+      "Updated": "",
+      "Feature Score": "14",
+      "Status": "Complete",
+      "Assigned Grader": "",
+      "Graded At": "",
+      "Submission URL": "",
+      "Notes": "",
+    }
+    with tempfile.TemporaryDirectory() as tempdir:
+      root = Path(tempdir)
+      assignments_yaml = root / "assignments.yaml"
+      assignments_yaml.write_text(
+        yaml.safe_dump({
+          "unit1": {"base": 10, "stretch": 10},
+          "unit2": {"base": 10, "stretch": 10},
+        }),
+        encoding="utf-8",
+      )
+      self.write_codepath_csv(root / "codepath-unit1.csv", [row])
+      self.write_codepath_csv(root / "codepath-unit2.csv", [row])
+
+      batches: list[list[str]] = []
+      sleeps = []
+
+      def fake_batch(args, **kwargs):
+        batches.append(sorted(args.only_assignment))
+        return 0
+
+      def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 1:
+          self.write_codepath_csv(root / "codepath-unit2.csv", [dict(row, **{"Feature Score": "20"})])
+        elif len(sleeps) >= 3:
+          raise KeyboardInterrupt
+
+      with (
+        mock.patch.object(codepath_to_canvas, "run_batch_conversion", side_effect=fake_batch),
+        mock.patch.object(codepath_to_canvas.time, "sleep", side_effect=fake_sleep),
+        contextlib.redirect_stdout(io.StringIO()),
+      ):
+        exit_code = codepath_to_canvas.main(
+          [
+            "--assignments",
+            str(assignments_yaml),
+            "--data-dir",
+            str(root),
+            "--name-map",
+            str(root / "name_map.yaml"),
+            "--watch",
+          ]
+        )
+
+      self.assertEqual(exit_code, 0)
+      self.assertEqual(batches, [["unit1", "unit2"], ["unit2"]])
+
+  def test_watch_mode_pushes_edits_saved_during_a_run(self) -> None:
+    row = {
+      "First Name": "Sam",
+      "Last Name": "Jacobs",
+      "Github Username": "sj",
+      "Hours Spent": "1",
+      "Submitted": "",
+      "Updated": "",
+      "Feature Score": "14",
+      "Status": "Complete",
+      "Assigned Grader": "",
+      "Graded At": "",
+      "Submission URL": "",
+      "Notes": "",
+    }
+    with tempfile.TemporaryDirectory() as tempdir:
+      root = Path(tempdir)
+      assignments_yaml = root / "assignments.yaml"
+      assignments_yaml.write_text(
+        yaml.safe_dump({
+          "unit1": {"base": 10, "stretch": 10},
+          "unit2": {"base": 10, "stretch": 10},
+        }),
+        encoding="utf-8",
+      )
+      self.write_codepath_csv(root / "codepath-unit1.csv", [row])
+      self.write_codepath_csv(root / "codepath-unit2.csv", [row])
+
+      batches: list[list[str]] = []
+      sleeps = []
+
+      def fake_batch(args, **kwargs):
+        batches.append(sorted(args.only_assignment))
+        if len(batches) == 1:
+          self.write_codepath_csv(root / "codepath-unit2.csv", [dict(row, **{"Feature Score": "20"})])
+        return 0
+
+      def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) >= 3:
+          raise KeyboardInterrupt
+
+      with (
+        mock.patch.object(codepath_to_canvas, "run_batch_conversion", side_effect=fake_batch),
+        mock.patch.object(codepath_to_canvas.time, "sleep", side_effect=fake_sleep),
+        contextlib.redirect_stdout(io.StringIO()),
+      ):
+        exit_code = codepath_to_canvas.main(
+          [
+            "--assignments",
+            str(assignments_yaml),
+            "--data-dir",
+            str(root),
+            "--watch",
+          ]
+        )
+
+      self.assertEqual(exit_code, 0)
+      self.assertEqual(batches, [["unit1", "unit2"], ["unit2"]])
+
+  def test_watch_mode_multi_course_reads_gradebook_and_reuses_sessions(self) -> None:
+    with tempfile.TemporaryDirectory() as tempdir:
+      root = Path(tempdir)
+      assignments_yaml = root / "assignments.yaml"
+      workbook = root / "Gradebook.xlsx"
+      assignments_yaml.write_text(
+        yaml.safe_dump({
+          "courses": {
+            "section-a": {"course-id": 101, "assignment-ids": {"unit1": 5001}},
+            "section-b": {"course-id": 202, "assignment-ids": {"unit1": 6001}},
+          },
+          "unit1": {"base": 10, "stretch": 10},
+        }),
+        encoding="utf-8",
+      )
+      workbook.write_bytes(b"v1")
+      sheet_rows = {"unit1": [{"Student": "Sam Jacobs", "Score": "14"}]}
+
+      batches: list[list[str]] = []
+      sleeps = []
+      connected: list[int] = []
+
+      def fake_connect(args, course_id):
+        connected.append(course_id)
+        return object(), []
+
+      def fake_batch(args, **kwargs):
+        batches.append(sorted(args.only_assignment))
+        for course_id in (101, 202):
+          codepath_to_canvas.get_canvas_course_session(args, course_id)
+        return 0
+
+      def fake_prime(path, sheet_names, cache):
+        return {name: (sheet_rows[name], None) for name in sheet_names}
+
+      def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 1:
+          sheet_rows["unit1"] = [{"Student": "Sam Jacobs", "Score": "20"}]
+          workbook.write_bytes(b"v2, saved")
+        elif len(sleeps) >= 3:
+          raise KeyboardInterrupt
+
+      with (
+        mock.patch.object(codepath_to_canvas, "run_batch_conversion", side_effect=fake_batch),
+        mock.patch.object(codepath_to_canvas, "connect_canvas_course", side_effect=fake_connect),
+        mock.patch.object(codepath_to_canvas, "prime_gradebook_cache", side_effect=fake_prime),
+        mock.patch.object(codepath_to_canvas.time, "sleep", side_effect=fake_sleep),
+        contextlib.redirect_stdout(io.StringIO()),
+      ):
+        exit_code = codepath_to_canvas.main(
+          [
+            "--assignments",
+            str(assignments_yaml),
+            "--data-dir",
+            str(root),
+            "--xls",
+            str(workbook),
+            "--watch",
+          ]
+        )
+
+      self.assertEqual(exit_code, 0)
+      self.assertEqual(batches, [["unit1"], ["unit1"]])
+      self.assertEqual(connected, [101, 202])
+
   def write_codepath_csv(self, path: Path, rows: list[dict[str, str]]) -> None:
     with path.open("w", newline="", encoding="utf-8") as handle:
       writer = csv.DictWriter(handle, fieldnames=CODEPATH_HEADER)
@@ -0,0 +1,100 @@
+import json
+import time
+import unittest
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+import benchmark_codepath_to_canvas
+import fake_canvas_server
+
+
+class FakeCanvasServerTests(unittest.TestCase):
+  def make_state(self, **settings) -> fake_canvas_server.FakeCanvasState:
+    state = fake_canvas_server.FakeCanvasState(fake_canvas_server.FakeCanvasSettings(**settings))
+    state.add_course(7, benchmark_codepath_to_canvas.generate_students(25, seed=2), [1000, 1001])
+    return state
+
+  def request(self, url: str, *, method: str = "GET", data: dict[str, str] | None = None):
+    body = urlencode(data).encode("utf-8") if data is not None else None
+    request = urllib.request.Request(url, data=body, method=method)
+    if body is not None:
+      request.add_header("Content-Type", "application/x-www-form-urlencoded")
+    with urllib.request.urlopen(request) as response:
+      return json.loads(response.read().decode("utf-8")), response.headers
+
+  def test_list_endpoints_paginate_with_link_headers(self) -> None:
+    state = self.make_state()
+    with fake_canvas_server.running_fake_canvas(state) as server:
+      url = f"{server.base_url}/api/v1/courses/7/users?enrollment_type[]=student&per_page=10"
+      names: list[str] = []
+      pages = 0
+      while url:
+        payload, headers = self.request(url)
+        names.extend(user["name"] for user in payload)
+        pages += 1
+        url = None
+        for link in headers["Link"].split(","):
+          target, rel = link.split(";")
+          if rel.strip() == 'rel="next"':
+            url = target.strip()[1:-1]
+
+    self.assertEqual(pages, 3)
+    self.assertEqual(len(names), 25)
+    self.assertEqual(len(set(names)), 25)
+
+  def test_grade_update_is_visible_on_the_submission(self) -> None:
+    state = self.make_state()
+    user_id = state.courses[7].students[0].user_id
+    with fake_canvas_server.running_fake_canvas(state) as server:
+      submission_url = f"{server.base_url}/api/v1/courses/7/assignments/1000/submissions/{user_id}"
+      self.request(
+        submission_url,
+        method="PUT",
+        data={
+          "submission[posted_grade]": "85",
+          "comment[text_comment]": "Nice work",
+          "submission[seconds_late_override]": "120",
+        },
+      )
+      payload, _ = self.request(submission_url)
+
+    self.assertEqual(payload["score"], 85.0)
+    self.assertEqual(payload["seconds_late"], 120)
+    self.assertEqual(payload["submission_comments"], [{"comment": "Nice work"}])
+    self.assertEqual(state.snapshot_stats()["grade_updates"], 1)
+
+  def test_rate_limit_returns_403_when_bucket_is_empty(self) -> None:
+    state = self.make_state(rate_limit_capacity=2, rate_limit_drain_per_second=0.0)
+    with fake_canvas_server.running_fake_canvas(state) as server:
+      course_url = f"{server.base_url}/api/v1/courses/7"
+      _, headers = self.request(course_url)
+      self.assertEqual(float(headers["X-Rate-Limit-Remaining"]), 1.0)
+      self.request(course_url)
+      with self.assertRaises(urllib.error.HTTPError) as raised:
+        self.request(course_url)
+
+    self.assertEqual(raised.exception.code, 403)
+    self.assertIn("Rate Limit Exceeded", raised.exception.read().decode("utf-8"))
+    self.assertEqual(state.snapshot_stats()["throttled"], 1)
+
+  def test_latency_is_injected_per_request(self) -> None:
+    state = self.make_state(latency_ms=50)
+    with fake_canvas_server.running_fake_canvas(state) as server:
+      started = time.perf_counter()
+      self.request(f"{server.base_url}/api/v1/courses/7/assignments/1000")
+      elapsed = time.perf_counter() - started
+
+    self.assertGreaterEqual(elapsed, 0.05)
+
+  def test_unknown_student_returns_404(self) -> None:
+    state = self.make_state()
+    with fake_canvas_server.running_fake_canvas(state) as server:
+      with self.assertRaises(urllib.error.HTTPError) as raised:
+        self.request(f"{server.base_url}/api/v1/courses/7/assignments/1000/submissions/1")
+
+    self.assertEqual(raised.exception.code, 404)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,99 @@
+import contextlib
+import io
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import benchmark_codepath_to_canvas
+import codepath_to_canvas
+import push_history
+
+
+class PushHistoryTests(unittest.TestCase):
+  def make_record(self, user_id: int, score: float, recorded_at: str) -> push_history.PushHistoryRecord:
+    return push_history.PushHistoryRecord(
+      course_id=7,
+      assignment_id=1000,
+      assignment="unit1",
+      user_id=user_id,
+      canvas_student=f"Student {user_id}",
+      action="push_grade",
+      outcome="pushed",
+      score=score,
+      seconds_late=0,
+      feedback_sha256=push_history.hash_feedback(f"score {score}"),
+      recorded_at=recorded_at,
+    )
+
+  def test_latest_query_returns_most_recent_push_per_student(self) -> None:
+    with tempfile.TemporaryDirectory() as tempdir:
+      store = push_history.PushHistoryStore(Path(tempdir) / "history.sqlite3")
+      store.append([
+        self.make_record(1, 70.0, "2026-01-10T00:00:00+00:00"),
+        self.make_record(2, 90.0, "2026-01-10T00:00:00+00:00"),
+      ])
+      store.append([self.make_record(1, 85.0, "2026-02-10T00:00:00+00:00")])
+
+      history = store.query(user_id=1)
+      latest = store.query(latest_only=True)
+      store.close()
+
+    self.assertEqual([row["score"] for row in history], [70.0, 85.0])
+    self.assertEqual([(row["user_id"], row["score"]) for row in latest], [(1, 85.0), (2, 90.0)])
+
+  def test_history_is_append_only(self) -> None:
+    with tempfile.TemporaryDirectory() as tempdir:
+      store = push_history.PushHistoryStore(Path(tempdir) / "history.sqlite3")
+      store.append([self.make_record(1, 70.0, "2026-01-10T00:00:00+00:00")])
+      with self.assertRaises(sqlite3.DatabaseError):
+        with store.connection:
+          store.connection.execute("UPDATE pushes SET score = 100")
+      with self.assertRaises(sqlite3.DatabaseError):
+        with store.connection:
+          store.connection.execute("DELETE FROM pushes")
+      self.assertEqual(len(store.query()), 1)
+      store.close()
+
+  def test_batch_push_records_history_and_cli_reads_it(self) -> None:
+    students = benchmark_codepath_to_canvas.generate_students(5, seed=4)
+    with tempfile.TemporaryDirectory() as tempdir:
+      root = Path(tempdir)
+      history_path = root / "history.sqlite3"
+      assignments_yaml, name_map = benchmark_codepath_to_canvas.prepare_push_inputs(root, students, 2, seed=4)
+      fake_interface = benchmark_codepath_to_canvas.make_fake_canvas_interface(students)
+      with (
+        mock.patch.object(codepath_to_canvas, "CanvasInterface", fake_interface),
+        contextlib.redirect_stdout(io.StringIO()),
+        contextlib.redirect_stderr(io.StringIO()),
+      ):
+        exit_code = codepath_to_canvas.main([
+          "--assignments",
+          str(assignments_yaml),
+          "--data-dir",
+          str(root),
+          "--name-map",
+          str(name_map),
+          "--push-history",
+          str(history_path),
+        ])
+
+      self.assertEqual(exit_code, 0)
+      store = push_history.PushHistoryStore(history_path)
+      rows = store.query(user_id=students[0].user_id)
+      store.close()
+
+      stdout = io.StringIO()
+      with contextlib.redirect_stdout(stdout):
+        cli_exit_code = push_history.main(["--db", str(history_path), "--student", students[0].canvas_name])
+
+    self.assertEqual([row["assignment"] for row in rows], ["ASN - 1", "ASN - 2"])
+    self.assertTrue(all(row["course_id"] == 1 and row["outcome"] == "pushed" for row in rows))
+    self.assertTrue(all(len(row["feedback_sha256"]) == 64 for row in rows))
+    self.assertEqual(cli_exit_code, 0)
+    self.assertEqual(len(stdout.getvalue().splitlines()), 3)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -1,45 +1,80 @@
 #!env python
 import argparse
 import collections
-import difflib
+import concurrent.futures
+import contextlib
+import csv
+import hashlib
 import io
 import json
 import logging
+import math
 import os
 import pathlib
-import random
+import queue
 import shutil
 import subprocess
 import tarfile
 import tempfile
-from typing import Dict, List
+import threading
+import time
+from typing import Dict
 
 import docker
 import pandas
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+import similarity
+
 logging.basicConfig()
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
 client = docker.from_env()
 
+BASE_IMAGE = "samogden/csumb:cst334"
+
 def parse_flags():
   parser = argparse.ArgumentParser()
   parser.add_argument("--csv_in", default="/Users/ssogden/scratch/csT334/2023-09-29T2137_Grades-CST334-M_01-02_FA23.csv")
   parser.add_argument("--path_to_files", default="/Users/ssogden/scratch/csT334/submissions")
   parser.add_argument("--assignment_name", default="PA1 - Intro to C and Processes (code)")
-  parser.add_argument("--num_repeats", default=3)
+  parser.add_argument("--num_repeats", default=3, type=int)
   parser.add_argument("--use_max", action="store_true")
+  parser.add_argument("--adaptive_repeats", action="store_true", help="Stop repeating once scores settle and only keep repeating for students whose scores vary")
+  parser.add_argument("--max_repeats", default=6, type=int, help="Most runs per tag for a student whose scores keep changing under --adaptive_repeats")
   parser.add_argument("--tag", default=["main"], action="append", dest="tags")
   parser.add_argument("--assignment", default="PA1")
   parser.add_argument("--github_repo", default="https://github.com/samogden/CST334-assignments.git")
+  parser.add_argument("--rebuild", action="store_true", help="Pull and rebuild the grading image even if a cached one matches")
+  
+  parser.add_argument("--num_workers", default=0, type=int, help="Containers to run at once (0 picks based on CPUs and memory)")
+  parser.add_argument("--memory_per_worker_gb", default=1.0, type=float, help="Memory limit for each container, also used when picking --num_workers")
+  parser.add_argument("--cpus_per_run", default=1.0, type=float, help="CPU limit for each container; runs are pinned to separate cores")
+  parser.add_argument("--pids_limit", default=256, type=int, help="Most processes a container may have, to contain fork bombs")
+  parser.add_argument("--run_timeout", default=600, type=int, help="Longest a single grader run may take, in seconds")
+  parser.add_argument("--adaptive_timeout", action="store_true", help="Cut runs off at a multiple of typical run times once enough have finished, instead of always allowing --run_timeout")
+  parser.add_argument("--metrics_csv", default="run_metrics.csv", help="Where to record wall time, CPU time, peak memory and exit status for every run")
+  parser.add_argument("--staging_dir", default="staging", help="Parent directory for each student's isolated staging directory")
+  parser.add_argument("--fresh_containers", action="store_true", help="Start a new container for every run instead of reusing a warm pool")
+  parser.add_argument("--cache_dir", default="result_cache", help="Directory holding cached results for each submission and tag")
+  parser.add_argument("--force", action="store_true", help="Regrade every submission, ignoring --results_log and any cached result")
+  parser.add_argument("--no_resume", action="store_true", help="Regrade every student instead of resuming from --results_log, still using cached results")
+  parser.add_argument("--log_dir", default="grader_logs", help="Directory for each student's streamed grader output")
+  parser.add_argument("--results_log", default="results.jsonl", help="Append-only log of finished students; on restart, students whose submission, images and settings are unchanged are skipped unless --force or --no_resume")
+  parser.add_argument("--csv_every", default=10, type=int, help="Rewrite scores.csv after this many students finish")
   
   parser.add_argument("--confusion_only", action="store_true")
   parser.add_argument("--threshold", type=float, default=0.8)
+  parser.add_argument("--starter_code", action="append", help="Starter file handed out with the assignment, so code from it isn't counted as copying (repeatable)")
+  parser.add_argument("--similarity_workers", type=int, default=0, help="Processes for comparing submissions (0 uses every CPU)")
+  parser.add_argument("--heatmap", default="similarity.png", help="Where to save the similarity heatmap (.png or .pdf)")
+  parser.add_argument("--suspicious_pairs", default="suspicious_pairs.csv", help="Where to write pairs at or above --threshold, most similar first")
   
   parser.add_argument("--debug", action="store_true")
   
@@ -68,75 +103,469 @@ def get_student_files(submissions_dir) -> Dict[str,Dict[str,str]]:
   return submission_files
 
 
-def build_docker_image(github_repo="https://github.com/samogden/CST334-assignments.git"):
+def get_base_image_reference():
+  # Ask the registry for the current digest without pulling the image itself
+  try:
+    digest = client.images.get_registry_data(BASE_IMAGE).id
+    return f"{BASE_IMAGE.split(':')[0]}@{digest}", digest
+  except docker.errors.APIError as e:
+    log.warning(f"Could not reach registry for {BASE_IMAGE}, using the local copy: {e}")
+    return BASE_IMAGE, client.images.get(BASE_IMAGE).id
+
+
+def get_repo_head(github_repo):
+  p = subprocess.run(["git", "ls-remote", github_repo, "HEAD"], capture_output=True, text=True, check=True)
+  return p.stdout.split()[0]
+
+
+def build_docker_image(github_repo="https://github.com/samogden/CST334-assignments.git", rebuild=False):
+  base_image, base_digest = get_base_image_reference()
+  repo_head = get_repo_head(github_repo)
   
+  # The image is named after everything that goes into it, so a match means nothing has changed
+  cache_key = hashlib.sha256(f"{base_digest}\n{github_repo}\n{repo_head}".encode()).hexdigest()[:16]
+  image_name = f"grading:{cache_key}"
+  if not rebuild:
+    try:
+      image = client.images.get(image_name)
+      log.info(f"Reusing {image_name}")
+      return image
+    except docker.errors.ImageNotFound:
+      pass
+  
+  log.info(f"Building {image_name} from {base_image} at {repo_head[:12]}")
   docker_file = io.BytesIO(f"""
-  FROM samogden/csumb:cst334
-  RUN git clone {github_repo} /tmp/grading/
+  FROM {base_image}
+  RUN git clone {github_repo} /tmp/grading/ && git -C /tmp/grading checkout --detach {repo_head}
   WORKDIR /tmp/grading
   CMD ["/bin/bash"]
   """.encode())
   
   image, logs = client.images.build(
     fileobj=docker_file,
-    tag="grading",
-    pull=True,
-    nocache=True
+    tag=image_name,
+    pull=rebuild,
+    nocache=rebuild,
+    labels={"grading.base_image" : base_digest, "grading.repo" : github_repo, "grading.repo_head" : repo_head}
+  )
+  log.debug(logs)
+  return image
+
+
+def resolve_tag_commits(github_repo, tags):
+  p = subprocess.run(["git", "ls-remote", github_repo], capture_output=True, text=True, check=True)
+  refs = {}
+  for line in p.stdout.splitlines():
+    commit, ref = line.split("\t")
+    refs[ref] = commit
+  tag_commits = {}
+  for tag in tags:
+    # Annotated tags point at a tag object, so prefer the peeled commit
+    for ref in [f"refs/tags/{tag}^{{}}", f"refs/tags/{tag}", f"refs/heads/{tag}"]:
+      if ref in refs:
+        tag_commits[tag] = refs[ref]
+        break
+    else:
+      # Anything that isn't a ref on the remote is taken to be a commit hash
+      tag_commits[tag] = tag
+  return tag_commits
+
+
+def build_tag_image(base_image, commit):
+  # One image per commit, checked out at build time so runs start on the right tree
+  image_name = f"grading-tag:{commit}"
+  try:
+    image = client.images.get(image_name)
+    if image.labels.get("grading.base_image") == base_image.id:
+      log.debug(f"Reusing {image_name}")
+      return image
+  except docker.errors.ImageNotFound:
+    pass
+  
+  docker_file = io.BytesIO(f"""
+  FROM {base_image.id}
+  RUN git fetch --tags origin && git checkout --detach {commit}
+  """.encode())
+  
+  image, logs = client.images.build(
+    fileobj=docker_file,
+    tag=image_name,
+    labels={"grading.base_image" : base_image.id, "grading.commit" : commit}
   )
   log.debug(logs)
   return image
 
-def run_docker_with_archive(image, student_files_dir, tag_to_test, programming_assignment):
 
-  tarstream = io.BytesIO()
-  with tarfile.open(fileobj=tarstream, mode="w") as tarhandle:
-    for f in [os.path.join(student_files_dir, f) for f in os.listdir(student_files_dir)]:
-      tarhandle.add(f, arcname=os.path.basename(f))
-  tarstream.seek(0)
+def build_tag_images(base_image, github_repo, tags):
+  tag_commits = resolve_tag_commits(github_repo, tags)
+  tag_images = {}
+  for tag, commit in tag_commits.items():
+    log.info(f"Using {commit[:12]} for tag {tag}")
+    tag_images[tag] = build_tag_image(base_image, commit)
+  return tag_images
+
+STUDENT_MOUNT = "/tmp/student"
+OUTPUT_MOUNT = "/tmp/output"
+
+# Everything else a student's code could write to outside the workspace
+SCRATCH_DIRS = "/var/tmp /dev/shm"
+# Lists /tmp entries that aren't the workspace, its snapshots or the mounts
+FIND_EXTRA_TMP = (
+  f"find /tmp -mindepth 1 -maxdepth 1 ! -name grading ! -name grading.pristine ! -name home.pristine "
+  f"! -name {os.path.basename(STUDENT_MOUNT)} ! -name {os.path.basename(OUTPUT_MOUNT)}"
+)
+
+# Taken when a container starts so resets have something to restore. A submission can reach these
+# copies too, so the restored workspace is also checked against a digest kept on the host.
+SNAPSHOT_CONTAINER_SCRIPT = """
+  cp -a /tmp/grading /tmp/grading.pristine && cp -a "$HOME" /tmp/home.pristine && echo "$HOME"
+"""
+
+# Restores the pristine checkout and home directory, clears scratch space and kills anything the last run left behind.
+# Globbing /proc keeps the loop from spawning processes of its own.
+RESET_CONTAINER_SCRIPT = f"""
+  for p in /proc/[0-9]*; do
+    p=${{p#/proc/}}
+    if [ "$p" != 1 ] && [ "$p" != $$ ]; then kill -9 "$p" 2>/dev/null; fi
+  done
+  rm -rf /tmp/grading {OUTPUT_MOUNT}/*
+  {FIND_EXTRA_TMP} -exec rm -rf {{}} +
+  for d in {SCRATCH_DIRS}; do
+    [ -d "$d" ] && find "$d" -mindepth 1 -maxdepth 1 -exec rm -rf {{}} +
+  done
+  if [ -n "$HOME" ] && [ "$HOME" != / ]; then
+    find "$HOME" -mindepth 1 -maxdepth 1 -exec rm -rf {{}} +
+    cp -a /tmp/home.pristine/. "$HOME"/
+  fi
+  cp -a /tmp/grading.pristine /tmp/grading
+"""
+
+# Exits non-zero if any state from the previous student survived the reset
+VERIFY_CONTAINER_SCRIPT = f"""
+  for p in /proc/[0-9]*; do
+    p=${{p#/proc/}}
+    if [ "$p" != 1 ] && [ "$p" != $$ ]; then echo "stray process $p"; exit 1; fi
+  done
+  [ -z "$({FIND_EXTRA_TMP})" ] || {{ echo "unexpected files in /tmp"; exit 1; }}
+  for d in {SCRATCH_DIRS}; do
+    [ ! -d "$d" ] || [ -z "$(ls -A "$d")" ] || {{ echo "leftover files in $d"; exit 1; }}
+  done
+  [ -z "$(ls -A {OUTPUT_MOUNT})" ] || {{ echo "leftover output"; exit 1; }}
+"""
+DIGEST_CHUNK_SIZE = 1 << 20
+
+# A running container plus the host directories mounted into it, and the digest of its pristine workspace
+GradingSlot = collections.namedtuple(
+  "GradingSlot", ["container", "student_dir", "output_dir", "io_dir", "workspace_paths", "workspace_digest"],
+  defaults=(None, None)
+)
+
+
+def get_workspace_digest(container, paths):
+  # Read through the Docker daemon, since a submission could replace the tools inside the container.
+  # Modification times are left out because restoring a copy is allowed to change them.
+  entries = []
+  for path in paths:
+    stream, _ = container.get_archive(path)
+    with tempfile.TemporaryFile() as fid:
+      for chunk in stream:
+        fid.write(chunk)
+      fid.seek(0)
+      with tarfile.open(fileobj=fid) as tar:
+        for member in tar:
+          content = member.linkname
+          if member.isfile():
+            h = hashlib.sha256()
+            member_fid = tar.extractfile(member)
+            for chunk in iter(lambda: member_fid.read(DIGEST_CHUNK_SIZE), b""):
+              h.update(chunk)
+            content = h.hexdigest()
+          entries.append(f"{member.name}\0{member.type.decode()}\0{member.mode:o}\0{member.uid}:{member.gid}\0{content}")
+  return hashlib.sha256("\n".join(sorted(entries)).encode()).hexdigest()
+
+
+# Runs the grader and records how much CPU time and memory it and everything it started used
+# The OOM kill count comes from the container's memory cgroup (v2, then v1), since a kill by the
+# memory limit exits with the same status as a kill by timeout
+METRICS_WRAPPER = """
+import json, resource, subprocess, sys
+def get_oom_kills():
+  for path in ["/sys/fs/cgroup/memory.events", "/sys/fs/cgroup/memory/memory.oom_control"]:
+    try:
+      with open(path) as fid:
+        for line in fid:
+          if line.startswith("oom_kill "):
+            return int(line.split()[1])
+    except OSError:
+      pass
+  return None
+oom_kills_before = get_oom_kills()
+status = subprocess.run(sys.argv[2:]).returncode
+oom_kills_after = get_oom_kills()
+usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+with open(sys.argv[1], "w") as fid:
+  json.dump({
+    "cpu_seconds" : usage.ru_utime + usage.ru_stime, "peak_rss_kb" : usage.ru_maxrss, "exit_status" : status,
+    "oom_kills" : None if None in (oom_kills_before, oom_kills_after) else oom_kills_after - oom_kills_before
+  }, fid)
+"""
+TIMEOUT_EXIT_STATUSES = [124, 137]
+# Under --adaptive_timeout, once this many runs have finished the timeout tightens to OUTLIER_FACTOR times the slowest typical run
+MIN_RUNS_FOR_TIMEOUT = 10
+OUTLIER_FACTOR = 5
+MIN_TIMEOUT = 60
+
+
+class RunScheduler:
+  """Container resource limits, core assignment, timeouts and per-run metrics."""
+  
+  def __init__(self, num_workers, flags):
+    self.limits = {
+      "nano_cpus" : int(flags.cpus_per_run * 1e9),
+      "mem_limit" : f"{int(flags.memory_per_worker_gb * 1024)}m",
+      "memswap_limit" : f"{int(flags.memory_per_worker_gb * 1024)}m",
+      "pids_limit" : flags.pids_limit,
+    }
+    self.run_timeout = flags.run_timeout
+    self.adaptive_timeout = flags.adaptive_timeout
+    
+    # Give each concurrent run its own cores so runs don't compete for them
+    num_cpus = client.info().get("NCPU") or os.cpu_count() or 1
+    cores_per_run = max(1, math.ceil(flags.cpus_per_run))
+    self.cpusets = queue.Queue()
+    for k in range(num_workers):
+      self.cpusets.put(",".join(str((k * cores_per_run + i) % num_cpus) for i in range(cores_per_run)))
+    
+    self.lock = threading.Lock()
+    self.wall_times = []
+    # Appended to, so a resumed run keeps the metrics of the students it skips
+    self.metrics_fid = open(flags.metrics_csv, 'a', newline='')
+    self.metrics_writer = csv.writer(self.metrics_fid)
+    if self.metrics_fid.tell() == 0:
+      self.metrics_writer.writerow(["student", "ID", "tag", "run", "wall_seconds", "cpu_seconds", "peak_rss_mb", "exit_status", "flag"])
+  
+  def close(self):
+    self.metrics_fid.close()
+  
+  @contextlib.contextmanager
+  def cores(self):
+    cpuset = self.cpusets.get()
+    try:
+      yield cpuset
+    finally:
+      self.cpusets.put(cpuset)
+  
+  def get_timeout(self):
+    # Infinite loops get cut off early instead of holding a worker for the full timeout, at the cost
+    # of making a slow student's result depend on who was graded before them
+    if not self.adaptive_timeout:
+      return self.run_timeout
+    with self.lock:
+      if len(self.wall_times) < MIN_RUNS_FOR_TIMEOUT:
+        return self.run_timeout
+      typical = np.percentile(self.wall_times, 95)
+    return int(min(self.run_timeout, max(MIN_TIMEOUT, math.ceil(OUTLIER_FACTOR * typical))))
+  
+  def record(self, student, student_id, tag, run, metrics):
+    exit_status = metrics.get("exit_status")
+    with self.lock:
+      if metrics.get("oom_kills"):
+        flag = "oom"
+      elif exit_status in TIMEOUT_EXIT_STATUSES:
+        flag = "timeout"
+      elif exit_status is not None and exit_status < 0:
+        flag = "killed"
+      elif len(self.wall_times) >= MIN_RUNS_FOR_TIMEOUT and metrics["wall_seconds"] > OUTLIER_FACTOR * np.median(self.wall_times):
+        flag = "slow"
+      else:
+        flag = ""
+      if flag not in ["oom", "timeout", "killed"]:
+        self.wall_times.append(metrics["wall_seconds"])
+      self.metrics_writer.writerow([
+        student, student_id, tag, run,
+        f"{metrics['wall_seconds']:0.2f}",
+        "" if metrics.get("cpu_seconds") is None else f"{metrics['cpu_seconds']:0.2f}",
+        "" if metrics.get("peak_rss_kb") is None else f"{metrics['peak_rss_kb'] / 1024:0.1f}",
+        "" if exit_status is None else exit_status,
+        flag
+      ])
+      self.metrics_fid.flush()
+    if flag:
+      log.warning(f"{student} run {run} on {tag} flagged {flag}: {metrics}")
+    return flag
+
 
+def start_grading_container(image, student_dir, output_dir, io_dir=None, limits=None, cpuset=None):
+  # Student files go in read-only; results come back through the output mount instead of an archive
   container = client.containers.run(
     image=image,
     detach=True,
-    tty=True
+    tty=True,
+    volumes={
+      os.path.abspath(student_dir) : {"bind" : STUDENT_MOUNT, "mode" : "ro"},
+      os.path.abspath(output_dir) : {"bind" : OUTPUT_MOUNT, "mode" : "rw"},
+    },
+    cpuset_cpus=cpuset,
+    **(limits or {})
   )
+  return GradingSlot(container, student_dir, output_dir, io_dir)
+
+
+def stop_grading_container(slot):
   try:
-    container.put_archive(f"/tmp/grading/programming-assignments/{programming_assignment}/src", tarstream)
-    
-    exit_code, output = container.exec_run(f"ls -l /tmp/grading/programming-assignments/{programming_assignment}/")
-    log.debug(output.decode())
-    exit_code, output = container.exec_run(f"tree /tmp/grading/programming-assignments/{programming_assignment}/")
-    log.debug(output.decode())
-    
-    
-    container.exec_run(f"bash -c 'git checkout {tag_to_test}'")
-    
-    run_str = f"""
-      bash -c '
-        cd /tmp/grading/programming-assignments/{programming_assignment} ;
-        timeout 600 python ../../helpers/grader.py --output /tmp/results.json ;
-      '
-      """
-    log.debug(f"run_str: {run_str}")
-    exit_code, output = container.exec_run(run_str)
+    slot.container.stop(timeout=1)
+    slot.container.remove()
+  except docker.errors.APIError:
+    log.debug(f"Container {slot.container.short_id} was already gone")
+  if slot.io_dir is not None:
+    shutil.rmtree(slot.io_dir, ignore_errors=True)
+
+
+class ContainerPool:
+  """Long-lived grading containers that are reset to a pristine workspace between runs."""
+  
+  def __init__(self, image, size, limits=None):
+    self.image = image
+    self.size = size
+    self.limits = limits
+    self.idle = queue.Queue()
+    self.lock = threading.Lock()
+    self.slots = []
+  
+  def start_slot(self):
+    # Mounts are fixed when a container starts, so each one gets its own host directories to refill
+    io_dir = tempfile.mkdtemp(prefix="grading-")
+    student_dir = os.path.join(io_dir, "student")
+    output_dir = os.path.join(io_dir, "output")
+    os.mkdir(student_dir)
+    os.mkdir(output_dir)
+    slot = start_grading_container(self.image, student_dir, output_dir, io_dir, limits=self.limits)
+    exit_code, output = slot.container.exec_run(["bash", "-c", SNAPSHOT_CONTAINER_SCRIPT])
+    if exit_code != 0:
+      self.discard(slot)
+      raise RuntimeError(f"Could not snapshot grading workspace: {output.decode()}")
+    home = output.decode().strip()
+    workspace_paths = ["/tmp/grading"] + ([home] if home not in ["", "/"] else [])
+    return slot._replace(workspace_paths=workspace_paths, workspace_digest=get_workspace_digest(slot.container, workspace_paths))
+  
+  def acquire(self):
     try:
-      bits, stats = container.get_archive("/tmp/results.json")
-    except docker.errors.NotFound:
-      return { "score" : 0.0, "build_logs" : None}
-    f = io.BytesIO()
-    for chunk in bits:
-      f.write(chunk)
-    f.seek(0)
-    
-    with tarfile.open(fileobj=f, mode="r") as tarhandle:
-      results_f = tarhandle.getmember("results.json")
-      f = tarhandle.extractfile(results_f)
-      f.seek(0)
-      results = json.loads(f.read().decode())
-  finally:
-    container.stop(timeout=1)
-    container.remove()
+      return self.idle.get_nowait()
+    except queue.Empty:
+      pass
+    with self.lock:
+      should_start = len(self.slots) < self.size
+      if should_start:
+        self.slots.append(None)
+    if not should_start:
+      return self.idle.get()
+    try:
+      slot = self.start_slot()
+    except Exception:
+      with self.lock:
+        self.slots.remove(None)
+      raise
+    with self.lock:
+      self.slots[self.slots.index(None)] = slot
+    return slot
+  
+  def release(self, slot):
+    for f in os.listdir(slot.student_dir):
+      os.remove(os.path.join(slot.student_dir, f))
+    try:
+      slot.container.exec_run(["bash", "-c", RESET_CONTAINER_SCRIPT])
+      exit_code, output = slot.container.exec_run(["bash", "-c", VERIFY_CONTAINER_SCRIPT])
+      if exit_code == 0 and get_workspace_digest(slot.container, slot.workspace_paths) != slot.workspace_digest:
+        exit_code, output = 1, b"workspace differs from the one the container started with"
+    except docker.errors.APIError as e:
+      exit_code, output = 1, str(e).encode()
+    if exit_code == 0:
+      self.idle.put(slot)
+      return
+    log.warning(f"Discarding container {slot.container.short_id} after failed reset: {output.decode().strip()}")
+    self.discard(slot)
+  
+  def discard(self, slot):
+    with self.lock:
+      if slot in self.slots:
+        self.slots.remove(slot)
+    stop_grading_container(slot)
+  
+  def close(self):
+    with self.lock:
+      slots = [slot for slot in self.slots if slot is not None]
+    for slot in slots:
+      self.discard(slot)
+
+
+def run_docker_with_mounts(image, student_files_dir, programming_assignment, container_pool=None, log_path=None, scheduler=None):
+  with (scheduler.cores() if scheduler is not None else contextlib.nullcontext()) as cpuset:
+    if container_pool is None:
+      output_dir = tempfile.mkdtemp(prefix="grading-output-")
+      slot = start_grading_container(
+        image, student_files_dir, output_dir, io_dir=output_dir,
+        limits=(scheduler.limits if scheduler is not None else None), cpuset=cpuset
+      )
+    else:
+      slot = container_pool.acquire()
+      if cpuset is not None:
+        slot.container.update(cpuset_cpus=cpuset)
+      # Hard links keep the pool's mounted directory from costing another copy of the files
+      for f in os.listdir(student_files_dir):
+        try:
+          os.link(os.path.join(student_files_dir, f), os.path.join(slot.student_dir, f))
+        except OSError:
+          shutil.copy(os.path.join(student_files_dir, f), os.path.join(slot.student_dir, f))
+    container = slot.container
+    try:
+      src_dir = f"/tmp/grading/programming-assignments/{programming_assignment}/src"
+      container.exec_run(["bash", "-c", f"ln -sf {STUDENT_MOUNT}/* {src_dir}/"])
+      
+      exit_code, output = container.exec_run(f"ls -l /tmp/grading/programming-assignments/{programming_assignment}/")
+      log.debug(output.decode())
+      exit_code, output = container.exec_run(f"tree /tmp/grading/programming-assignments/{programming_assignment}/")
+      log.debug(output.decode())
+      
+      run_timeout = scheduler.get_timeout() if scheduler is not None else 600
+      run_cmd = [
+        "python", "-c", METRICS_WRAPPER, f"{OUTPUT_MOUNT}/metrics.json",
+        "timeout", "-k", "5", str(run_timeout),
+        "python", "../../helpers/grader.py", "--output", f"{OUTPUT_MOUNT}/results.json"
+      ]
+      log.debug(f"run_cmd: {run_cmd}")
+      start_time = time.monotonic()
+      # Stream the grader's output as it runs so a long or stuck build can be watched from the host
+      _, output_stream = container.exec_run(run_cmd, workdir=f"/tmp/grading/programming-assignments/{programming_assignment}", stream=True)
+      with (open(log_path, 'ab') if log_path is not None else contextlib.nullcontext()) as log_fid:
+        for chunk in output_stream:
+          if log_fid is not None:
+            log_fid.write(chunk)
+            log_fid.flush()
+      
+      try:
+        with open(os.path.join(slot.output_dir, "metrics.json")) as fid:
+          metrics = json.load(fid)
+      except (FileNotFoundError, json.JSONDecodeError):
+        metrics = {}
+        # The wrapper itself can be the process the OOM killer picks
+        container.reload()
+        if container.attrs["State"].get("OOMKilled"):
+          metrics["oom_kills"] = 1
+      metrics["wall_seconds"] = time.monotonic() - start_time
+      
+      try:
+        with open(os.path.join(slot.output_dir, "results.json")) as fid:
+          results = json.load(fid)
+      except FileNotFoundError:
+        results = { "score" : 0.0, "build_logs" : None}
+    finally:
+      if container_pool is None:
+        stop_grading_container(slot)
+      else:
+        container_pool.release(slot)
     
   log.debug(f"results: {results}")
+  results["run_metrics"] = metrics
   
   return results
   
@@ -169,6 +598,307 @@ def write_feedback(student, results):
       fid.write(results['build_logs'][0].decode())
     fid.write("\n")
 
+def get_num_workers(requested_workers, memory_per_worker_gb, cpus_per_run=1.0):
+  if requested_workers > 0:
+    return requested_workers
+  num_cpus = max(1, int((os.cpu_count() or 1) // cpus_per_run))
+  try:
+    total_memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+  except (AttributeError, ValueError, OSError):
+    return num_cpus
+  memory_bound = int(total_memory // (memory_per_worker_gb * 1024**3))
+  return max(1, min(num_cpus, memory_bound))
+
+
+def stage_student_files(staging_root, student, student_id, student_files):
+  # Each student gets its own directory so concurrent workers never share staged code
+  staging_dir = os.path.join(staging_root, f"{student}_{student_id}")
+  if os.path.exists(staging_dir): shutil.rmtree(staging_dir)
+  os.makedirs(staging_dir)
+  for file_extension, file_name in student_files.items():
+    shutil.copy(
+      os.path.join("./submissions", file_name),
+      os.path.join(staging_dir, f"student_code{file_extension}")
+    )
+  log.debug(f"contents: {os.listdir(staging_dir)}")
+  return staging_dir
+
+
+def hash_files(paths):
+  # Keyed by the name each file gets when staged, so staged and unstaged copies hash the same
+  h = hashlib.sha256()
+  for f in sorted(paths):
+    h.update(f.encode())
+    with open(paths[f], 'rb') as fid:
+      h.update(hashlib.sha256(fid.read()).digest())
+  return h.hexdigest()
+
+
+def hash_staged_files(staging_dir):
+  return hash_files({f : os.path.join(staging_dir, f) for f in os.listdir(staging_dir)})
+
+
+def hash_student_files(student_files):
+  return hash_files({
+    f"student_code{file_extension}" : os.path.join("./submissions", file_name)
+    for file_extension, file_name in student_files.items()
+  })
+
+
+def get_result_cache_key(flags, submission_hash, image):
+  # The tag image ID covers the tag commit, the grader inside it and the toolchain it runs on
+  # Resource limits are included too, since a submission can pass under one limit and fail under another
+  key_parts = [
+    submission_hash, image.id, flags.assignment,
+    str(flags.num_repeats), str(flags.use_max), str(flags.adaptive_repeats), str(flags.max_repeats),
+    str(flags.run_timeout), str(flags.adaptive_timeout),
+    str(flags.memory_per_worker_gb), str(flags.cpus_per_run), str(flags.pids_limit)
+  ]
+  return hashlib.sha256("\n".join(key_parts).encode()).hexdigest()
+
+
+def get_result_cache_path(flags, submission_hash, image):
+  return os.path.join(flags.cache_dir, f"{get_result_cache_key(flags, submission_hash, image)}.json")
+
+
+def get_result_keys(flags, tag_images, student_files):
+  # What a student's result depends on: the same keys their cached tag results are stored under
+  try:
+    submission_hash = hash_student_files(student_files)
+  except OSError:
+    # Never matches a log entry; grading the student reports the error
+    return None
+  return {tag : get_result_cache_key(flags, submission_hash, tag_images[tag]) for tag in flags.tags}
+
+
+def load_cached_result(cache_path):
+  try:
+    with open(cache_path) as fid:
+      return json.load(fid)
+  except (FileNotFoundError, json.JSONDecodeError):
+    return None
+
+
+def save_cached_result(cache_path, results):
+  fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+  try:
+    with os.fdopen(fd, 'w') as fid:
+      json.dump(results, fid)
+    os.replace(tmp_path, cache_path)
+  except BaseException:
+    os.unlink(tmp_path)
+    raise
+
+
+def get_failed_tests(results):
+  return {f"{suite}::{t}" for suite in results.get("suites", {}) for t in results["suites"][suite]["FAILED"]}
+
+
+def should_stop_repeating(flags, runs):
+  if not flags.adaptive_repeats:
+    return len(runs) >= flags.num_repeats
+  if not runs:
+    return False
+  # A run that hit the timeout or memory limit would likely only do so again
+  if runs[-1].get('flag') in ["timeout", "oom"]:
+    return True
+  if len(runs) >= flags.max_repeats:
+    return True
+  # Nothing can beat a perfect score when keeping the best, or a zero when keeping the worst
+  if flags.use_max and "suites" in runs[-1] and not get_failed_tests(runs[-1]):
+    return True
+  if not flags.use_max and runs[-1]['score'] <= 0:
+    return True
+  # Two identical scores in a row means the result has settled
+  return len(runs) >= 2 and runs[-1]['score'] == runs[-2]['score']
+
+
+def grade_student(tag_images, flags, student, student_id, student_files, container_pools=None, scheduler=None):
+  log.debug(f"Testing {student}")
+  staging_dir = stage_student_files(os.path.abspath(flags.staging_dir), student, student_id, student_files)
+  
+  # Define a comparison function to allow us to pick either the best or worst outcome
+  def is_better(score1, score2):
+    log.debug(f"is_better({score1}, {score2})")
+    if flags.use_max:
+      return score2 < score1
+    return score1 < score2
+  
+  def worst_results():
+    if flags.use_max:
+      return {"score" : float('-inf'), "build_logs" : None}
+    return {"score" : float('+inf'), "build_logs" : None}
+  
+  try:
+    submission_hash = hash_staged_files(staging_dir)
+    curr_results = worst_results()
+    repeat_scores = {}
+    flaky_tests = set()
+    log_path = os.path.join(flags.log_dir, f"{student}_{student_id}.log")
+    log_started = False
+    for tag_to_test in flags.tags:
+      image = tag_images[tag_to_test]
+      cache_path = get_result_cache_path(flags, submission_hash, image)
+      tag_results = None if flags.force else load_cached_result(cache_path)
+      if tag_results is not None:
+        log.debug(f"Using cached results for {student} on {tag_to_test}")
+      else:
+        # Run docker by passing in files
+        container_pool = None if container_pools is None else container_pools[tag_to_test]
+        runs = []
+        while not should_stop_repeating(flags, runs):
+          # Only replace the previous log once something is actually rerun
+          with open(log_path, 'ab' if log_started else 'wb') as fid:
+            fid.write(f"=== {tag_to_test} run {len(runs) + 1} ===\n".encode())
+          log_started = True
+          new_results = run_docker_with_mounts(
+            image, staging_dir, flags.assignment,
+            container_pool=container_pool, log_path=log_path, scheduler=scheduler
+          )
+          metrics = new_results.pop("run_metrics")
+          if scheduler is not None:
+            new_results["flag"] = scheduler.record(student, student_id, tag_to_test, len(runs) + 1, metrics)
+          runs.append(new_results)
+        tag_results = worst_results()
+        for new_results in runs:
+          if is_better(new_results['score'], tag_results['score']):
+            log.debug(f"Updating to use new results: {new_results}")
+            tag_results = new_results
+        # A test that failed in some runs but not others is flaky
+        failed_per_run = [get_failed_tests(r) for r in runs if "suites" in r]
+        tag_results = dict(
+          tag_results,
+          repeat_scores=[r['score'] for r in runs],
+          flaky_tests=sorted(set().union(*failed_per_run) - set.intersection(*failed_per_run)) if failed_per_run else []
+        )
+        # Timeouts and OOM kills depend on machine load as much as on the submission, so they get rerun next time
+        if not any(r.get('flag') in ["timeout", "oom"] for r in runs):
+          save_cached_result(cache_path, tag_results)
+      repeat_scores[tag_to_test] = tag_results.get('repeat_scores', [])
+      flaky_tests.update(tag_results.get('flaky_tests', []))
+      if is_better(tag_results['score'], curr_results['score']):
+        curr_results = tag_results
+    curr_results = dict(curr_results, repeat_scores=repeat_scores, flaky_tests=sorted(flaky_tests))
+    curr_results['score'] = max([curr_results['score'], 0])
+  finally:
+    shutil.rmtree(staging_dir, ignore_errors=True)
+  return curr_results
+
+
+def load_graded_students(results_log):
+  graded = {}
+  if not os.path.exists(results_log):
+    return graded
+  with open(results_log) as fid:
+    for line in fid:
+      try:
+        record = json.loads(line)
+      except json.JSONDecodeError:
+        # A crash can leave the last line half written; that student just gets graded again
+        continue
+      graded[str(record["ID"])] = record
+  return graded
+
+
+def get_resumable_students(graded, result_keys):
+  # A record only stands if it was graded from the same files, images and settings as this run would use
+  return {
+    student_id : record for student_id, record in graded.items()
+    if result_keys.get(student_id) is not None and record.get("result_keys") == result_keys[student_id]
+  }
+
+
+def append_graded_student(fid, record):
+  fid.write(json.dumps(record) + "\n")
+  fid.flush()
+  os.fsync(fid.fileno())
+
+
+def write_scores_csv(df, path="scores.csv"):
+  tmp_path = f"{path}.tmp"
+  df.to_csv(tmp_path, index=False)
+  os.replace(tmp_path, path)
+
+
+def grade_all_students(tag_images, flags, submissions, df, assignment_name):
+  students = sorted(submissions.keys())
+  if flags.debug:
+    students = students[:1]
+  
+  # Pick up where an interrupted run left off, but only for students whose result would come out the same
+  result_keys = {student_id : get_result_keys(flags, tag_images, submissions[(student, student_id)]) for (student, student_id) in students}
+  graded = {} if (flags.force or flags.no_resume) else get_resumable_students(load_graded_students(flags.results_log), result_keys)
+  for student, student_id in students:
+    if student_id in graded:
+      df.loc[df.index[df['ID'] == int(student_id)], assignment_name] = graded[student_id]['score']
+  if graded:
+    log.info(f"Skipping {len(graded)} students already in {flags.results_log}")
+  students_to_grade = [(i, student, student_id) for (i, (student, student_id)) in enumerate(students) if student_id not in graded]
+  
+  num_workers = min(get_num_workers(flags.num_workers, flags.memory_per_worker_gb, flags.cpus_per_run), max(1, len(students_to_grade)))
+  log.info(f"Grading {len(students_to_grade)} students with {num_workers} workers")
+  os.makedirs(flags.cache_dir, exist_ok=True)
+  os.makedirs(flags.log_dir, exist_ok=True)
+  # Each tag runs in its own image, so each gets its own pool
+  scheduler = RunScheduler(num_workers, flags)
+  container_pools = None
+  if not flags.fresh_containers:
+    container_pools = {tag : ContainerPool(image, num_workers, limits=scheduler.limits) for tag, image in tag_images.items()}
+  
+  failed_students = []
+  with contextlib.ExitStack() as stack:
+    stack.callback(scheduler.close)
+    results_fid = stack.enter_context(open(flags.results_log, 'a'))
+    for container_pool in (container_pools or {}).values():
+      stack.callback(container_pool.close)
+    executor = stack.enter_context(concurrent.futures.ThreadPoolExecutor(max_workers=num_workers))
+    futures = {
+      executor.submit(grade_student, tag_images, flags, student, student_id, submissions[(student, student_id)], container_pools, scheduler) : (i, student, student_id)
+      for (i, student, student_id) in students_to_grade
+    }
+    # Results are recorded as they complete; scores land in the row for each student's ID so order doesn't matter
+    for num_finished, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+      i, student, student_id = futures[future]
+      try:
+        curr_results = future.result()
+      except Exception:
+        # Left out of the results log, so the next run retries this student
+        log.exception(f"Grading {student} ({student_id}) failed")
+        failed_students.append(student)
+        continue
+      print(f"{i} : {student} : {curr_results['score']}")
+      write_feedback(student, curr_results)
+      # Only logged once the feedback is on disk, so a restart never skips a student without it
+      graded[student_id] = {
+        "student" : student, "ID" : student_id, "score" : curr_results['score'],
+        "repeat_scores" : curr_results['repeat_scores'], "flaky_tests" : curr_results['flaky_tests'],
+        "result_keys" : result_keys[student_id]
+      }
+      append_graded_student(results_fid, graded[student_id])
+      student_index = df.index[df['ID'] == int(student_id)]
+      df.loc[student_index, assignment_name] = curr_results['score']
+      if num_finished % flags.csv_every == 0:
+        write_scores_csv(df)
+      for tag_to_test, scores in curr_results['repeat_scores'].items():
+        if len(scores) > 0 and max(scores) != min(scores):
+          log.warning(f"{student} varied on {tag_to_test}: {scores} (flaky: {', '.join(curr_results['flaky_tests']) or 'unknown'})")
+  
+  if failed_students:
+    log.error(f"{len(failed_students)} students could not be graded and will be retried on the next run: {', '.join(failed_students)}")
+  
+  variance_rows = []
+  for record in graded.values():
+    for tag_to_test, scores in record['repeat_scores'].items():
+      if len(scores) == 0: continue
+      variance_rows.append({
+        "student" : record['student'], "ID" : record['ID'], "tag" : tag_to_test, "runs" : len(scores),
+        "min" : min(scores), "max" : max(scores), "variance" : np.var(scores),
+        "flaky_tests" : " ".join(record['flaky_tests'])
+      })
+  pd.DataFrame(variance_rows, columns=["student", "ID", "tag", "runs", "min", "max", "variance", "flaky_tests"]).to_csv("score_variance.csv", index=False)
+  return df
+
+
 def get_assignment_column_name(columns, assignment_name):
   for i, name in enumerate(columns):
     if name.startswith(assignment_name):
@@ -176,35 +906,31 @@ def get_assignment_column_name(columns, assignment_name):
 
 
 
-def calc_similarity(submission1, submission2):
-  p = subprocess.run(["diff", "-w", submission1, submission2], capture_output=True)
-  # print(f"p -> {p}")
-  return p.stdout.decode().count('\n')
+def write_similarity_heatmap(names, similarity_array, path):
+  # Reorder so clusters of similar submissions show up as blocks along the diagonal
+  order = similarity.seriate(similarity.get_condensed_distances(similarity_array), len(names))
+  size = min(max(6, len(names) * 0.12), 40)
+  fig, ax = plt.subplots(figsize=(size, size))
+  ax.imshow(similarity_array[np.ix_(order, order)], cmap='hot', vmin=0, vmax=1)
+  ax.set_xticks(range(len(names)), [names[i] for i in order], rotation=90, fontsize=6)
+  ax.set_yticks(range(len(names)), [names[i] for i in order], fontsize=6)
+  fig.tight_layout()
+  fig.savefig(path)
+  plt.close(fig)
 
-def calc_similarity_python(submission1, submission2):
-  def clean_line(line: str):
-    line = line.strip()
-    line = line.split('//')[0]
-    # if line == "}": return ""
-    return line
-  def parse_lines(lines: List[str]):
-    parsed_lines = []
-    for line in lines:
-      line = clean_line(line)
-      if line == "":
-        continue
-      parsed_lines.append(line)
-    return parsed_lines
-  
-  with open(submission1) as fid:
-    lines1 = parse_lines(fid.readlines())
-  with open(submission2) as fid:
-    lines2 = parse_lines(fid.readlines())
-  
-  diffs = difflib.ndiff(lines1, lines2)
-  num_diffs = len([d for d in diffs if not d[0] in ['+', '-', '?']])
-  return num_diffs / len(lines1)
-    
+
+def write_suspicious_pairs(names, similarity_array, threshold, path):
+  rows, cols = np.triu_indices(len(names), k=1)
+  scores = similarity_array[rows, cols]
+  ranked = [k for k in np.argsort(-scores, kind="stable") if scores[k] >= threshold]
+  df_pairs = pd.DataFrame({
+    "rank" : range(1, len(ranked) + 1),
+    "student1" : [names[rows[k]] for k in ranked],
+    "student2" : [names[cols[k]] for k in ranked],
+    "similarity" : [scores[k] for k in ranked],
+  })
+  df_pairs.to_csv(path, index=False)
+  return df_pairs
 
 
 def main():
@@ -229,101 +955,31 @@ def main():
   submissions = get_student_files(os.path.abspath("./submissions"))
   
   if not flags.confusion_only:
-    image = build_docker_image(github_repo=flags.github_repo)
+    base_image = build_docker_image(github_repo=flags.github_repo, rebuild=flags.rebuild)
+    tag_images = build_tag_images(base_image, flags.github_repo, flags.tags)
     
-    if os.path.exists("feedback"): shutil.rmtree("feedback")
-    os.mkdir("feedback")
+    # Feedback from earlier runs is kept; each student's file is rewritten when they're graded
+    os.makedirs("feedback", exist_ok=True)
     
-    for (i, (student, student_id)) in enumerate(sorted(submissions.keys())):
-      log.debug(f"Testing {student}")
-      
-      # Clean up previous code
-      if os.path.exists("student_code"): shutil.rmtree("student_code")
-      os.mkdir("student_code")
-      
-      # Copy the student code to the staging directory
-      for file_extension in submissions[(student, student_id)].keys():
-        shutil.copy(
-          f"./submissions/{submissions[(student, student_id)][file_extension]}",
-          f"./student_code/student_code{file_extension}"
-        )
-      log.debug(f"contents: {os.listdir('./student_code')}")
-      
-      # Define a comparison function to allow us to pick either the best or worst outcome
-      def is_better(score1, score2):
-        log.debug(f"is_better({score1}, {score2})")
-        if flags.use_max:
-          return score2 < score1
-        return score1 < score2
-      
-      # Run docker by passing in files
-      if flags.use_max:
-        curr_results = {"score" : float('-inf'), "build_logs" : None}
-      else:
-        curr_results = {"score" : float('+inf'), "build_logs" : None}
-      for tag_to_test in flags.tags:
-        # worst_results = {"score" : float('inf')}
-        for i in range(flags.num_repeats):
-          new_results = run_docker_with_archive(image, os.path.abspath("./student_code"), tag_to_test, flags.assignment)
-          if is_better(new_results['score'], curr_results['score']):
-            log.debug(f"Updating to use new results: {new_results}")
-            curr_results = new_results
-      curr_results['score'] = max([curr_results['score'], 0])
-      print(f"{i} : {student} : {curr_results['score']}")
-      write_feedback(student, curr_results)
-      student_index = df.index[df['ID'] == int(student_id)]
-      df.loc[student_index, assignment_name] = curr_results['score']
-      if flags.debug:
-        break
-    df.to_csv("scores.csv", index=False)
+    df = grade_all_students(tag_images, flags, submissions, df, assignment_name)
+    write_scores_csv(df)
   
   log.debug(f"submissions: {submissions.keys()}")
   submissions_to_compare = sorted([(k[0], submissions[k]['.c']) for k in submissions.keys() if '.c' in submissions[k]])
-  df_similarity = pd.DataFrame(columns=[name for (name, _) in submissions_to_compare])
-  print(df_similarity)
+  names = [name for (name, _) in submissions_to_compare]
   
-  df_similarity = pd.DataFrame.from_dict({
-    name1 : {
-      name2 : calc_similarity(os.path.join("./submissions/", sub1), os.path.join("./submissions/", sub2))
-      for (name2, sub2) in submissions_to_compare
-    }
-    for name1, sub1 in submissions_to_compare
-  })
-  
-  print(df_similarity)
-  
-  # The next line can be expanded
-  # What we want is the top right to be the most similar
-  # So we pick an arbitrary name, then we want to pick the most similar that hasn't yet been picked
-  # Which might be a pain in the ass lol
-  # Basically, it's going to be a sort with a lambda that has a set inside of it that is tracking waht's already been added
-  # And then rotating them around.
-  # There's gotta be a better way...
-  # 1. Find the row with the lowest value, use it as a basis
-  # 2. find next lowest and repeat
-  #df_similarity = df_similarity.sort_values(by=[df_similarity.columns[0]])
-  
-  similarity_array = df_similarity.to_numpy()
-  min_val = similarity_array.min()
-  max_val = similarity_array.max()
-  similarity_array = (similarity_array - min_val) / max_val
-  
-  df_similarity = 1 - ((df_similarity - min_val) / max_val)
-  
-  plt.imshow(similarity_array, cmap='hot')
-  plt.show()
-  
-  values = {}
-  for row in df_similarity.index.values:
-    for col in df_similarity.columns.values:
-      if (row == col): continue
-      if (col, row) in values: continue
-      values[(row, col)] = df_similarity.loc[row][col]
-  
-  for names in sorted(values.keys(), key=(lambda n: values[n]), reverse=True):
-    if values[names] >= flags.threshold:
-      print(f"{names} : {values[names]: 0.3f}")
+  similarity_array = similarity.compute_similarity_matrix(
+    [os.path.join("./submissions/", sub) for (_, sub) in submissions_to_compare],
+    threshold=flags.threshold,
+    num_workers=(flags.similarity_workers or os.cpu_count() or 1),
+    starter_paths=flags.starter_code
+  )
   
+  write_similarity_heatmap(names, similarity_array, flags.heatmap)
+  df_pairs = write_suspicious_pairs(names, similarity_array, flags.threshold, flags.suspicious_pairs)
+  for row in df_pairs.itertuples():
+    print(f"{(row.student1, row.student2)} : {row.similarity: 0.3f}")
+  print(f"Wrote {flags.heatmap} and {flags.suspicious_pairs}")
   
   return
 
@@ -0,0 +1,278 @@
+import collections
+import concurrent.futures
+import hashlib
+import itertools
+import logging
+import os
+import re
+import tempfile
+from typing import List
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 15
+WINNOW_WINDOW = 8
+# Shortest run of tokens that counts as a match when aligning a pair. Identifiers and literals are
+# canonicalized, so shorter runs turn up in independent solutions to the same task.
+MATCH_LENGTH = 20
+# Without the starter code, fingerprints and shingles shared by more than this fraction of submissions
+# are taken to be starter code, not copying
+BOILERPLATE_FRACTION = 0.5
+# In smaller cohorts a few students sharing code could just as well be a copying ring
+MIN_BOILERPLATE_COHORT = 10
+C_KEYWORDS = {
+  "auto", "break", "case", "char", "const", "continue", "default", "do", "double", "else", "enum",
+  "extern", "float", "for", "goto", "if", "inline", "int", "long", "register", "restrict", "return",
+  "short", "signed", "sizeof", "static", "struct", "switch", "typedef", "union", "unsigned", "void",
+  "volatile", "while", "_Bool", "bool", "NULL",
+}
+C_TOKEN_RE = re.compile(r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<preprocessor>^[ \t]*\#(?:\\\n|[^\n])*)
+  | (?P<string>"(?:\\.|[^"\\\n])*")
+  | (?P<char>'(?:\\.|[^'\\\n])*')
+  | (?P<number>(?:0[xX][0-9a-fA-F]+|\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)[uUlLfF]*)
+  | (?P<identifier>[A-Za-z_]\w*)
+  | (?P<operator>->|\+\+|--|<<=|>>=|<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%&|^]=|[^\s\w])
+""", re.VERBOSE | re.DOTALL | re.MULTILINE)
+# Renaming a variable or changing a constant shouldn't hide copying
+CANONICAL_TOKENS = {"string" : "STR", "char" : "CHR", "number" : "NUM", "identifier" : "ID"}
+# Below this many pairs a process pool costs more than it saves
+MIN_PAIRS_PER_WORKER = 16
+SHARDS_PER_WORKER = 4
+
+# Set in each alignment worker by init_alignment_worker
+worker_tokens = None
+worker_offsets = None
+worker_boilerplate = frozenset()
+
+
+def tokenize_submission(path) -> List[str]:
+  # Comments, whitespace and preprocessor lines are dropped; identifiers and literals become placeholders
+  with open(path, errors="replace") as fid:
+    source = fid.read()
+  tokens = []
+  for match in C_TOKEN_RE.finditer(source):
+    kind = match.lastgroup
+    if kind in ("comment", "preprocessor"):
+      continue
+    if kind == "identifier" and match.group() in C_KEYWORDS:
+      tokens.append(match.group())
+    else:
+      tokens.append(CANONICAL_TOKENS.get(kind, match.group()))
+  return tokens
+
+
+def get_shingle_hashes(tokens, shingle_size=SHINGLE_SIZE):
+  return [
+    int.from_bytes(hashlib.blake2b(" ".join(tokens[i:i + shingle_size]).encode(), digest_size=8).digest(), "little")
+    for i in range(len(tokens) - shingle_size + 1)
+  ]
+
+
+def get_fingerprints(tokens, shingle_size=SHINGLE_SIZE, window=WINNOW_WINDOW):
+  # Winnowing: keep the smallest shingle hash in every window so shared runs always share a fingerprint
+  shingle_size = min(shingle_size, len(tokens))
+  if shingle_size == 0:
+    return set()
+  hashes = get_shingle_hashes(tokens, shingle_size)
+  if len(hashes) <= window:
+    return {min(hashes)}
+  return {min(hashes[i:i + window]) for i in range(len(hashes) - window + 1)}
+
+
+def get_max_frequency(num_submissions):
+  # How many submissions may share code before it counts as starter code, or None if the cohort is too small to tell
+  if num_submissions < MIN_BOILERPLATE_COHORT:
+    return None
+  return int(num_submissions * BOILERPLATE_FRACTION)
+
+
+def estimate_similarity(fingerprints, boilerplate=None):
+  """
+  Jaccard estimate for every pair, counting shared fingerprints at once through an inverted index.
+  Fingerprints in boilerplate (hashes of the starter code) are ignored; without it, fingerprints
+  shared by most of a large enough cohort are ignored instead.
+  """
+  num_submissions = len(fingerprints)
+  postings = {}
+  for i, prints in enumerate(fingerprints):
+    for fingerprint in prints:
+      postings.setdefault(fingerprint, []).append(i)
+
+  max_frequency = get_max_frequency(num_submissions) if boilerplate is None else None
+  sizes = np.zeros(num_submissions)
+  shared = np.zeros((num_submissions, num_submissions))
+  for fingerprint, documents in postings.items():
+    if boilerplate is not None and fingerprint in boilerplate:
+      continue
+    if max_frequency is not None and len(documents) > max_frequency:
+      continue
+    sizes[documents] += 1
+    if len(documents) > 1:
+      rows, cols = zip(*itertools.combinations(documents, 2))
+      np.add.at(shared, (rows, cols), 1)
+
+  union = sizes[:, None] + sizes[None, :] - shared
+  with np.errstate(divide="ignore", invalid="ignore"):
+    estimate = np.where(union > 0, shared / union, 0.0)
+  return np.triu(estimate, k=1)
+
+
+def get_shingles(tokens, match_length):
+  return {tuple(tokens[i:i + match_length]) for i in range(len(tokens) - match_length + 1)}
+
+
+def get_boilerplate_shingles(tokens, match_length=MATCH_LENGTH, starter_tokens=None):
+  # Runs from the starter code, or without it runs most of a large cohort shares, aren't copied from each other
+  if starter_tokens is not None:
+    return frozenset(shingle for starter in starter_tokens for shingle in get_shingles(starter, match_length))
+  max_frequency = get_max_frequency(len(tokens))
+  if max_frequency is None:
+    return frozenset()
+  counts = collections.Counter(shingle for submission in tokens for shingle in get_shingles(submission, match_length))
+  return frozenset(shingle for shingle, count in counts.items() if count > max_frequency)
+
+
+def get_covered_mask(tokens, shingles, match_length):
+  # Mark tokens that sit inside at least one of the given shingles
+  covered = np.zeros(len(tokens), dtype=bool)
+  for i in range(len(tokens) - match_length + 1):
+    if tuple(tokens[i:i + match_length]) in shingles:
+      covered[i:i + match_length] = True
+  return covered
+
+
+def align(tokens1, tokens2, match_length=MATCH_LENGTH, boilerplate=frozenset()):
+  """
+  Fraction of both token streams covered by runs of at least match_length tokens found in the other.
+  Tokens covered by boilerplate shingles are left out of both the overlap and the total.
+  Shingles are hashed, so a pair costs time linear in its length rather than the product of the lengths.
+  """
+  match_length = min(match_length, len(tokens1), len(tokens2))
+  if match_length == 0:
+    return 0.0
+  shared = (get_shingles(tokens1, match_length) & get_shingles(tokens2, match_length)) - boilerplate
+  covered = 0
+  total = 0
+  for tokens in (tokens1, tokens2):
+    original = ~get_covered_mask(tokens, boilerplate, match_length)
+    covered += np.count_nonzero(get_covered_mask(tokens, shared, match_length) & original)
+    total += np.count_nonzero(original)
+  return covered / total if total > 0 else 0.0
+
+
+def write_token_file(tokens, path):
+  # Token IDs for every submission back to back, so workers can memory-map them instead of unpickling
+  vocabulary = {}
+  ids = [vocabulary.setdefault(token, len(vocabulary)) for submission in tokens for token in submission]
+  offsets = np.cumsum([0] + [len(submission) for submission in tokens])
+  np.save(path, np.array(ids, dtype=np.int32))
+  return offsets, vocabulary
+
+
+def init_alignment_worker(token_path, offsets, boilerplate):
+  global worker_tokens, worker_offsets, worker_boilerplate
+  worker_tokens = np.load(token_path, mmap_mode="r")
+  worker_offsets = offsets
+  worker_boilerplate = boilerplate
+
+
+def align_pairs(pairs):
+  def get_tokens(i):
+    return worker_tokens[worker_offsets[i]:worker_offsets[i + 1]].tolist()
+  return [(i, j, align(get_tokens(i), get_tokens(j), boilerplate=worker_boilerplate)) for (i, j) in pairs]
+
+
+def align_candidates(tokens, candidates, similarity, num_workers, boilerplate=frozenset()):
+  if len(candidates) == 0:
+    return
+  num_workers = min(num_workers, len(candidates) // MIN_PAIRS_PER_WORKER)
+  if num_workers <= 1:
+    for i, j in candidates:
+      similarity[i, j] = align(tokens[i], tokens[j], boilerplate=boilerplate)
+    return
+
+  with tempfile.TemporaryDirectory() as token_dir:
+    token_path = os.path.join(token_dir, "tokens.npy")
+    offsets, vocabulary = write_token_file(tokens, token_path)
+    # Workers see token IDs, so the boilerplate has to be translated too
+    boilerplate = frozenset(tuple(vocabulary[token] for token in shingle) for shingle in boilerplate)
+    shards = np.array_split(candidates, num_workers * SHARDS_PER_WORKER)
+    with concurrent.futures.ProcessPoolExecutor(
+      max_workers=num_workers,
+      initializer=init_alignment_worker,
+      initargs=(token_path, offsets, boilerplate)
+    ) as executor:
+      futures = [executor.submit(align_pairs, shard.tolist()) for shard in shards if len(shard) > 0]
+      # Fill the matrix as shards finish rather than waiting on all of them
+      for future in concurrent.futures.as_completed(futures):
+        for i, j, score in future.result():
+          similarity[i, j] = score
+
+
+def compute_similarity_matrix(paths, threshold=0.8, candidate_fraction=0.5, num_workers=1, starter_paths=None):
+  """
+  Alignment coverage between every pair of submissions, from 0 (nothing shared) to 1 (identical).
+  Every submission is tokenized once and fingerprints give a cheap estimate for the upper triangle.
+  Only pairs whose estimate reaches candidate_fraction * threshold are aligned, sharded across
+  num_workers processes; every other pair scores 0 so the whole matrix is on one scale.
+  Code from starter_paths, the files handed out with the assignment, is not counted.
+  """
+  tokens = [tokenize_submission(path) for path in paths]
+  starter_tokens = None if not starter_paths else [tokenize_submission(path) for path in starter_paths]
+  starter_hashes = None
+  if starter_tokens is not None:
+    starter_hashes = {h for starter in starter_tokens for h in get_shingle_hashes(starter)}
+  estimate = estimate_similarity([get_fingerprints(t) for t in tokens], boilerplate=starter_hashes)
+
+  candidates = np.argwhere(estimate >= threshold * candidate_fraction)
+  log.info(f"Aligning {len(candidates)} of {len(paths) * (len(paths) - 1) // 2} pairs")
+  similarity = np.zeros_like(estimate)
+  boilerplate = get_boilerplate_shingles(tokens, starter_tokens=starter_tokens) if len(candidates) > 0 else frozenset()
+  align_candidates(tokens, candidates, similarity, num_workers, boilerplate=boilerplate)
+
+  similarity = similarity + similarity.T
+  np.fill_diagonal(similarity, 1.0)
+  return similarity
+
+
+def get_condensed_distances(similarity):
+  rows, cols = np.triu_indices(len(similarity), k=1)
+  return 1.0 - similarity[rows, cols]
+
+
+def seriate(condensed, num_items):
+  """
+  Order items so similar ones sit next to each other, using average-linkage hierarchical clustering
+  on the condensed distance vector. When two clusters merge, their orders are flipped so that the
+  closest ends meet.
+  """
+  if num_items <= 2:
+    return list(range(num_items))
+  original = np.zeros((num_items, num_items))
+  original[np.triu_indices(num_items, k=1)] = condensed
+  original = original + original.T
+  
+  distances = original.copy()
+  np.fill_diagonal(distances, np.inf)
+  sizes = np.ones(num_items)
+  orders = [[i] for i in range(num_items)]
+  for _ in range(num_items - 1):
+    i, j = np.unravel_index(np.argmin(distances), distances.shape)
+    left, right = orders[i], orders[j]
+    joined = min(
+      [left + right, left + right[::-1], left[::-1] + right, left[::-1] + right[::-1]],
+      key=(lambda order: original[order[len(left) - 1], order[len(left)]])
+    )
+    merged = (sizes[i] * distances[i] + sizes[j] * distances[j]) / (sizes[i] + sizes[j])
+    distances[i, :] = merged
+    distances[:, i] = merged
+    distances[i, i] = np.inf
+    distances[j, :] = np.inf
+    distances[:, j] = np.inf
+    sizes[i] += sizes[j]
+    orders[i], orders[j] = joined, None
+  return next(order for order in orders if order is not None)
@@ -0,0 +1,197 @@
+import argparse
+import io
+import json
+import os
+import tarfile
+import tempfile
+import unittest
+from unittest import mock
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+with mock.patch("docker.from_env"):
+  import grade
+
+
+class FakeContainer:
+  # Serves get_archive from a host directory standing in for the container's filesystem
+  def __init__(self, root):
+    self.root = root
+  
+  def get_archive(self, path):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+      tar.add(os.path.join(self.root, path.lstrip("/")), arcname=os.path.basename(path))
+    return iter([buffer.getvalue()]), {}
+
+
+class TestWorkspaceDigest(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.TemporaryDirectory()
+    self.addCleanup(self.tmpdir.cleanup)
+    os.makedirs(os.path.join(self.tmpdir.name, "tmp/grading/src"))
+    with open(os.path.join(self.tmpdir.name, "tmp/grading/src/tests.c"), "w") as fid:
+      fid.write("int main() { return 0; }\n")
+    self.container = FakeContainer(self.tmpdir.name)
+  
+  def test_restored_copy_matches(self):
+    digest = grade.get_workspace_digest(self.container, ["/tmp/grading"])
+    os.utime(os.path.join(self.tmpdir.name, "tmp/grading/src/tests.c"), (0, 0))
+    self.assertEqual(grade.get_workspace_digest(self.container, ["/tmp/grading"]), digest)
+  
+  def test_edited_or_added_files_change_digest(self):
+    digest = grade.get_workspace_digest(self.container, ["/tmp/grading"])
+    with open(os.path.join(self.tmpdir.name, "tmp/grading/src/tests.c"), "a") as fid:
+      fid.write("// edited\n")
+    edited = grade.get_workspace_digest(self.container, ["/tmp/grading"])
+    self.assertNotEqual(edited, digest)
+    with open(os.path.join(self.tmpdir.name, "tmp/grading/src/extra.c"), "w") as fid:
+      fid.write("")
+    self.assertNotEqual(grade.get_workspace_digest(self.container, ["/tmp/grading"]), edited)
+
+
+class TestSimilarityReports(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.TemporaryDirectory()
+    self.addCleanup(self.tmpdir.cleanup)
+    self.names = ["ana", "bao", "cam", "dee"]
+    self.matrix = np.array([
+      [1.0, 0.85, 0.10, 0.95],
+      [0.85, 1.0, 0.79, 0.20],
+      [0.10, 0.79, 1.0, 0.80],
+      [0.95, 0.20, 0.80, 1.0],
+    ])
+  
+  def test_suspicious_pairs_are_above_threshold_and_sorted(self):
+    path = os.path.join(self.tmpdir.name, "pairs.csv")
+    grade.write_suspicious_pairs(self.names, self.matrix, 0.8, path)
+    df = pd.read_csv(path)
+    self.assertEqual(list(df.columns), ["rank", "student1", "student2", "similarity"])
+    self.assertEqual(list(zip(df.student1, df.student2)), [("ana", "dee"), ("ana", "bao"), ("cam", "dee")])
+    self.assertEqual(list(df["rank"]), [1, 2, 3])
+    self.assertEqual(list(df.similarity), [0.95, 0.85, 0.80])
+  
+  def test_heatmap_is_written_with_agg(self):
+    path = os.path.join(self.tmpdir.name, "similarity.png")
+    grade.write_similarity_heatmap(self.names, self.matrix, path)
+    self.assertEqual(matplotlib.get_backend().lower(), "agg")
+    with open(path, "rb") as fid:
+      self.assertEqual(fid.read(8), b"\x89PNG\r\n\x1a\n")
+
+
+def make_flags(**overrides):
+  flags = dict(
+    assignment="PA1", num_repeats=3, use_max=False, adaptive_repeats=False, max_repeats=6,
+    run_timeout=600, adaptive_timeout=False, memory_per_worker_gb=1.0, cpus_per_run=1.0, pids_limit=256,
+    tags=["main"], cache_dir="result_cache",
+  )
+  flags.update(overrides)
+  return argparse.Namespace(**flags)
+
+
+def make_run(score, failed=(), flag=""):
+  return {"score" : score, "flag" : flag, "suites" : {"suite" : {"FAILED" : list(failed)}}}
+
+
+class TestShouldStopRepeating(unittest.TestCase):
+  def test_fixed_repeats_run_exactly_num_repeats(self):
+    flags = make_flags(num_repeats=3)
+    self.assertFalse(grade.should_stop_repeating(flags, []))
+    self.assertFalse(grade.should_stop_repeating(flags, [make_run(1.0)] * 2))
+    self.assertTrue(grade.should_stop_repeating(flags, [make_run(1.0)] * 3))
+  
+  def test_fixed_repeats_continue_after_timeout(self):
+    flags = make_flags(num_repeats=3)
+    self.assertFalse(grade.should_stop_repeating(flags, [make_run(0.0, flag="timeout")]))
+    self.assertFalse(grade.should_stop_repeating(flags, [make_run(0.0, flag="oom")]))
+  
+  def test_adaptive_needs_at_least_one_run(self):
+    self.assertFalse(grade.should_stop_repeating(make_flags(adaptive_repeats=True), []))
+  
+  def test_adaptive_stops_once_two_scores_agree(self):
+    flags = make_flags(adaptive_repeats=True)
+    self.assertFalse(grade.should_stop_repeating(flags, [make_run(0.5, ["a"])]))
+    self.assertFalse(grade.should_stop_repeating(flags, [make_run(0.5, ["a"]), make_run(0.7, ["b"])]))
+    self.assertTrue(grade.should_stop_repeating(flags, [make_run(0.5, ["a"]), make_run(0.5, ["b"])]))
+  
+  def test_adaptive_stops_at_max_repeats(self):
+    flags = make_flags(adaptive_repeats=True, max_repeats=4)
+    runs = [make_run(score, ["a"]) for score in [0.1, 0.2, 0.3]]
+    self.assertFalse(grade.should_stop_repeating(flags, runs))
+    self.assertTrue(grade.should_stop_repeating(flags, runs + [make_run(0.4, ["a"])]))
+  
+  def test_adaptive_stops_when_result_cannot_change(self):
+    self.assertTrue(grade.should_stop_repeating(make_flags(adaptive_repeats=True, use_max=True), [make_run(1.0)]))
+    self.assertFalse(grade.should_stop_repeating(make_flags(adaptive_repeats=True, use_max=True), [make_run(0.9, ["a"])]))
+    self.assertTrue(grade.should_stop_repeating(make_flags(adaptive_repeats=True), [make_run(0.0, ["a"])]))
+  
+  def test_adaptive_stops_after_timeout_or_oom(self):
+    flags = make_flags(adaptive_repeats=True)
+    self.assertTrue(grade.should_stop_repeating(flags, [make_run(0.5, ["a"], flag="timeout")]))
+    self.assertTrue(grade.should_stop_repeating(flags, [make_run(0.5, ["a"], flag="oom")]))
+
+
+class TestResultKeys(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.TemporaryDirectory()
+    self.addCleanup(self.tmpdir.cleanup)
+    cwd = os.getcwd()
+    os.chdir(self.tmpdir.name)
+    self.addCleanup(os.chdir, cwd)
+    os.mkdir("submissions")
+    with open("submissions/ana_1_student_code.c", "w") as fid:
+      fid.write("int main() { return 0; }\n")
+    self.student_files = {".c" : "ana_1_student_code.c"}
+    self.image = argparse.Namespace(id="sha256:image1")
+  
+  def test_staged_and_unstaged_files_hash_the_same(self):
+    staging_dir = grade.stage_student_files(os.path.abspath("staging"), "ana", "1", self.student_files)
+    self.assertEqual(os.listdir(staging_dir), ["student_code.c"])
+    self.assertEqual(grade.hash_staged_files(staging_dir), grade.hash_student_files(self.student_files))
+  
+  def test_cache_key_covers_submission_image_and_settings(self):
+    flags = make_flags()
+    key = grade.get_result_cache_key(flags, "hash", self.image)
+    self.assertEqual(grade.get_result_cache_key(make_flags(), "hash", self.image), key)
+    self.assertEqual(grade.get_result_cache_path(flags, "hash", self.image), os.path.join("result_cache", f"{key}.json"))
+    self.assertNotEqual(grade.get_result_cache_key(flags, "other", self.image), key)
+    self.assertNotEqual(grade.get_result_cache_key(flags, "hash", argparse.Namespace(id="sha256:image2")), key)
+    for setting, value in [("num_repeats", 5), ("use_max", True), ("run_timeout", 300), ("memory_per_worker_gb", 2.0), ("pids_limit", 64)]:
+      self.assertNotEqual(grade.get_result_cache_key(make_flags(**{setting : value}), "hash", self.image), key, setting)
+  
+  def test_load_graded_students_skips_torn_lines_and_keeps_latest(self):
+    with open("results.jsonl", "w") as fid:
+      fid.write(json.dumps({"ID" : "1", "score" : 0.5}) + "\n")
+      fid.write(json.dumps({"ID" : 2, "score" : 0.7}) + "\n")
+      fid.write(json.dumps({"ID" : "1", "score" : 0.9}) + "\n")
+      fid.write('{"ID" : "3", "sco')
+    graded = grade.load_graded_students("results.jsonl")
+    self.assertEqual(sorted(graded), ["1", "2"])
+    self.assertEqual(graded["1"]["score"], 0.9)
+    self.assertEqual(grade.load_graded_students("missing.jsonl"), {})
+  
+  def test_stale_resume_keys_are_rejected(self):
+    flags = make_flags()
+    tag_images = {"main" : self.image}
+    result_keys = {"1" : grade.get_result_keys(flags, tag_images, self.student_files), "2" : None}
+    graded = {
+      "1" : {"ID" : "1", "score" : 0.9, "result_keys" : result_keys["1"]},
+      "2" : {"ID" : "2", "score" : 0.8},
+      "3" : {"ID" : "3", "score" : 0.7, "result_keys" : result_keys["1"]},
+    }
+    self.assertEqual(list(grade.get_resumable_students(graded, result_keys)), ["1"])
+    
+    # A resubmission changes the key, so the old score no longer stands
+    with open("submissions/ana_1_student_code.c", "a") as fid:
+      fid.write("// late fix\n")
+    result_keys["1"] = grade.get_result_keys(flags, tag_images, self.student_files)
+    self.assertEqual(grade.get_resumable_students(graded, result_keys), {})
+  
+  def test_unreadable_submission_has_no_result_keys(self):
+    self.assertIsNone(grade.get_result_keys(make_flags(), {"main" : self.image}, {".c" : "missing.c"}))
+
+
+if __name__ == "__main__":
+  unittest.main()
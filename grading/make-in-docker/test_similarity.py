@@ -0,0 +1,363 @@
+import itertools
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import similarity
+
+
+# Three independent solutions to the same linked-list task and two unrelated programs
+LINKED_LIST_ITERATIVE = """\
+#include <stdio.h>
+#include <stdlib.h>
+
+typedef struct node {
+  int value;
+  struct node *next;
+} node_t;
+
+node_t *push(node_t *head, int value) {
+  node_t *n = malloc(sizeof(node_t));
+  n->value = value;
+  n->next = head;
+  return n;
+}
+
+node_t *reverse(node_t *head) {
+  node_t *prev = NULL;
+  while (head != NULL) {
+    node_t *next = head->next;
+    head->next = prev;
+    prev = head;
+    head = next;
+  }
+  return prev;
+}
+
+int sum(node_t *head) {
+  int total = 0;
+  for (node_t *cur = head; cur != NULL; cur = cur->next) {
+    total += cur->value;
+  }
+  return total;
+}
+
+void free_list(node_t *head) {
+  while (head != NULL) {
+    node_t *next = head->next;
+    free(head);
+    head = next;
+  }
+}
+
+int main(int argc, char *argv[]) {
+  node_t *list = NULL;
+  int x;
+  while (scanf("%d", &x) == 1) {
+    list = push(list, x);
+  }
+  list = reverse(list);
+  for (node_t *cur = list; cur != NULL; cur = cur->next) {
+    printf("%d\\n", cur->value);
+  }
+  printf("sum=%d\\n", sum(list));
+  free_list(list);
+  return 0;
+}
+"""
+
+LINKED_LIST_APPEND = """\
+#include <stdio.h>
+#include <stdlib.h>
+
+struct Node {
+  int data;
+  struct Node* link;
+};
+
+struct Node* reverse_list(struct Node* first) {
+  struct Node* result = NULL;
+  struct Node* curr = first;
+  struct Node* after;
+  while (curr) {
+    after = curr->link;
+    curr->link = result;
+    result = curr;
+    curr = after;
+  }
+  return result;
+}
+
+int main(void) {
+  struct Node* head = NULL;
+  struct Node* tail = NULL;
+  int num;
+  long total = 0;
+  while (scanf("%d", &num) != EOF) {
+    struct Node* fresh = (struct Node*)malloc(sizeof(struct Node));
+    if (!fresh) { return 1; }
+    fresh->data = num;
+    fresh->link = NULL;
+    if (tail) tail->link = fresh; else head = fresh;
+    tail = fresh;
+  }
+  head = reverse_list(head);
+  head = reverse_list(head);
+  struct Node* p = head;
+  while (p) {
+    printf("%d\\n", p->data);
+    total = total + p->data;
+    p = p->link;
+  }
+  printf("sum=%ld\\n", total);
+  while (head) {
+    p = head->link;
+    free(head);
+    head = p;
+  }
+  return 0;
+}
+"""
+
+LINKED_LIST_RECURSIVE = """\
+#include <stdio.h>
+#include <stdlib.h>
+
+typedef struct item {
+  struct item *nxt;
+  int v;
+} Item;
+
+static Item *rev(Item *l) {
+  if (l == NULL || l->nxt == NULL) {
+    return l;
+  }
+  Item *rest = rev(l->nxt);
+  l->nxt->nxt = l;
+  l->nxt = NULL;
+  return rest;
+}
+
+static void print_all(const Item *l, int *acc) {
+  if (!l) return;
+  printf("%d\\n", l->v);
+  *acc += l->v;
+  print_all(l->nxt, acc);
+}
+
+int main() {
+  Item *lst = 0;
+  int val, s = 0;
+  while (1) {
+    if (scanf("%d", &val) < 1) break;
+    Item *it = calloc(1, sizeof *it);
+    it->v = val;
+    it->nxt = lst;
+    lst = it;
+  }
+  lst = rev(lst);
+  print_all(lst, &s);
+  printf("sum=%d\\n", s);
+  while (lst) { Item *t = lst; lst = lst->nxt; free(t); }
+  return 0;
+}
+"""
+
+WORD_COUNT = """\
+#include <stdio.h>
+#include <string.h>
+#include <ctype.h>
+
+#define MAX_WORDS 1024
+#define MAX_LEN 64
+
+static char words[MAX_WORDS][MAX_LEN];
+static int counts[MAX_WORDS];
+static int num_words = 0;
+
+static int find_word(const char *w) {
+  for (int i = 0; i < num_words; i++) {
+    if (strcmp(words[i], w) == 0) {
+      return i;
+    }
+  }
+  return -1;
+}
+
+int main(void) {
+  char buf[MAX_LEN];
+  while (scanf("%63s", buf) == 1) {
+    for (char *c = buf; *c; c++) *c = tolower((unsigned char)*c);
+    int idx = find_word(buf);
+    if (idx >= 0) {
+      counts[idx]++;
+    } else if (num_words < MAX_WORDS) {
+      strcpy(words[num_words], buf);
+      counts[num_words] = 1;
+      num_words++;
+    }
+  }
+  for (int i = 0; i < num_words; i++) {
+    printf("%s %d\\n", words[i], counts[i]);
+  }
+  return 0;
+}
+"""
+
+STATISTICS = """\
+#include <stdio.h>
+#include <stdlib.h>
+
+static int compare(const void *a, const void *b) {
+  double x = *(const double *)a, y = *(const double *)b;
+  return (x > y) - (x < y);
+}
+
+int main(int argc, char **argv) {
+  size_t cap = 16, n = 0;
+  double *values = malloc(cap * sizeof(double));
+  double v;
+  while (scanf("%lf", &v) == 1) {
+    if (n == cap) {
+      cap *= 2;
+      values = realloc(values, cap * sizeof(double));
+    }
+    values[n++] = v;
+  }
+  if (n == 0) {
+    fprintf(stderr, "no input\\n");
+    return 1;
+  }
+  qsort(values, n, sizeof(double), compare);
+  double mean = 0;
+  for (size_t i = 0; i < n; i++) mean += values[i];
+  mean /= n;
+  double median = n % 2 ? values[n / 2] : (values[n / 2 - 1] + values[n / 2]) / 2;
+  printf("min=%g max=%g mean=%g median=%g\\n", values[0], values[n - 1], mean, median);
+  free(values);
+  return 0;
+}
+"""
+
+
+def rename_identifiers(source):
+  for old, new in [("node_t", "elem"), ("value", "payload"), ("head", "top"), ("prev", "back"), ("total", "acc")]:
+    source = source.replace(old, new)
+  return source
+
+
+class TestSimilarity(unittest.TestCase):
+  def setUp(self):
+    self.tmpdir = tempfile.TemporaryDirectory()
+    self.addCleanup(self.tmpdir.cleanup)
+
+  def write_submissions(self, sources):
+    paths = []
+    for i, source in enumerate(sources):
+      path = os.path.join(self.tmpdir.name, f"submission{i}.c")
+      with open(path, "w") as fid:
+        fid.write(source)
+      paths.append(path)
+    return paths
+
+  def test_independent_solutions_stay_below_threshold(self):
+    sources = [LINKED_LIST_ITERATIVE, LINKED_LIST_APPEND, LINKED_LIST_RECURSIVE, WORD_COUNT, STATISTICS]
+    tokens = [similarity.tokenize_submission(path) for path in self.write_submissions(sources)]
+    for tokens1, tokens2 in itertools.combinations(tokens, 2):
+      self.assertLess(similarity.align(tokens1, tokens2), 0.2)
+
+  def test_renamed_copy_scores_as_identical(self):
+    paths = self.write_submissions([LINKED_LIST_ITERATIVE, rename_identifiers(LINKED_LIST_ITERATIVE), WORD_COUNT])
+    matrix = similarity.compute_similarity_matrix(paths, threshold=0.8)
+    self.assertAlmostEqual(matrix[0, 1], 1.0)
+    self.assertEqual(matrix[0, 2], 0.0)
+    self.assertEqual(matrix[1, 2], 0.0)
+
+  def test_shared_starter_code_is_not_counted(self):
+    tails = [LINKED_LIST_APPEND, LINKED_LIST_RECURSIVE, WORD_COUNT, STATISTICS]
+    paths = self.write_submissions([LINKED_LIST_ITERATIVE + tail for tail in tails] + [LINKED_LIST_ITERATIVE])
+    paths, starter_path = paths[:-1], paths[-1]
+    tokens = [similarity.tokenize_submission(path) for path in paths]
+    self.assertGreater(similarity.align(tokens[0], tokens[1]), 0.5)
+
+    boilerplate = similarity.get_boilerplate_shingles(tokens, starter_tokens=[similarity.tokenize_submission(starter_path)])
+    for tokens1, tokens2 in itertools.combinations(tokens, 2):
+      self.assertLess(similarity.align(tokens1, tokens2, boilerplate=boilerplate), 0.2)
+    matrix = similarity.compute_similarity_matrix(paths, threshold=0.8, starter_paths=[starter_path])
+    self.assertLess(matrix.max(initial=0, where=~np.eye(len(paths), dtype=bool)), 0.2)
+
+  def test_large_cohort_infers_starter_code(self):
+    tails = [LINKED_LIST_APPEND, LINKED_LIST_RECURSIVE, WORD_COUNT, STATISTICS]
+    sources = [LINKED_LIST_ITERATIVE + tails[i % len(tails)] for i in range(3 * len(tails))]
+    tokens = [similarity.tokenize_submission(path) for path in self.write_submissions(sources)]
+    boilerplate = similarity.get_boilerplate_shingles(tokens)
+    for i, j in itertools.combinations(range(len(tokens)), 2):
+      score = similarity.align(tokens[i], tokens[j], boilerplate=boilerplate)
+      if i % len(tails) == j % len(tails):
+        self.assertAlmostEqual(score, 1.0)
+      else:
+        self.assertLess(score, 0.2)
+
+  def test_small_cohort_keeps_copying_ring(self):
+    # Three of five students sharing code is a majority, but too few submissions to call it starter code
+    ring = [LINKED_LIST_ITERATIVE, rename_identifiers(LINKED_LIST_ITERATIVE), LINKED_LIST_ITERATIVE.replace("sum=", "total=")]
+    paths = self.write_submissions(ring + [WORD_COUNT, STATISTICS])
+    tokens = [similarity.tokenize_submission(path) for path in paths]
+    self.assertEqual(similarity.get_boilerplate_shingles(tokens), frozenset())
+    matrix = similarity.compute_similarity_matrix(paths, threshold=0.8)
+    for i, j in itertools.combinations(range(len(ring)), 2):
+      self.assertGreater(matrix[i, j], 0.8)
+
+
+  def test_process_pool_matches_serial_alignment(self):
+    # Nine submissions sharing a linked list give 36 candidate pairs, enough for two workers
+    tails = [LINKED_LIST_APPEND, LINKED_LIST_RECURSIVE, WORD_COUNT, STATISTICS]
+    sources = [LINKED_LIST_ITERATIVE + tails[i % len(tails)] for i in range(8)] + [LINKED_LIST_ITERATIVE]
+    paths = self.write_submissions(sources)
+    self.assertGreaterEqual(len(paths) * (len(paths) - 1) // 2, 2 * similarity.MIN_PAIRS_PER_WORKER)
+
+    serial = similarity.compute_similarity_matrix(paths, threshold=0.2, num_workers=1)
+    with mock.patch.object(similarity, "write_token_file", wraps=similarity.write_token_file) as write_token_file:
+      pooled = similarity.compute_similarity_matrix(paths, threshold=0.2, num_workers=2)
+    write_token_file.assert_called_once()
+    np.testing.assert_allclose(pooled, serial)
+
+    # Boilerplate has to be translated to token IDs before it reaches the workers
+    tokens = [similarity.tokenize_submission(path) for path in paths[:-1]]
+    boilerplate = similarity.get_boilerplate_shingles(tokens, starter_tokens=[similarity.tokenize_submission(paths[-1])])
+    candidates = np.array(list(itertools.combinations(range(len(tokens)), 2)) * 2)
+    serial = np.zeros((len(tokens), len(tokens)))
+    pooled = np.zeros((len(tokens), len(tokens)))
+    similarity.align_candidates(tokens, candidates, serial, 1, boilerplate=boilerplate)
+    similarity.align_candidates(tokens, candidates, pooled, 2, boilerplate=boilerplate)
+    np.testing.assert_allclose(pooled, serial)
+    self.assertGreater(serial.max(), 0.9)
+    self.assertLess(serial[0, 1], 0.2)
+
+
+class TestSeriate(unittest.TestCase):
+  def test_planted_cluster_ends_up_contiguous(self):
+    rng = np.random.default_rng(0)
+    num_items = 10
+    cluster = [1, 4, 6, 9]
+    matrix = rng.uniform(0.0, 0.2, (num_items, num_items))
+    matrix = (matrix + matrix.T) / 2
+    for i, j in itertools.permutations(cluster, 2):
+      matrix[i, j] = 0.9
+    np.fill_diagonal(matrix, 1.0)
+
+    order = similarity.seriate(similarity.get_condensed_distances(matrix), num_items)
+    self.assertEqual(sorted(order), list(range(num_items)))
+    positions = sorted(order.index(i) for i in cluster)
+    self.assertEqual(positions, list(range(positions[0], positions[0] + len(cluster))))
+
+  def test_small_inputs_keep_their_order(self):
+    self.assertEqual(similarity.seriate(np.array([]), 1), [0])
+    self.assertEqual(similarity.seriate(np.array([0.5]), 2), [0, 1])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import yaml
+
+
+RESERVED_SECTIONS = {"UNMATCHED"}
+
+
+def parse_alias_map(loaded, *, include_canonical: bool = False, source: str = "alias file") -> dict[str, str]:
+  """Flatten an alias store into a {alias: canonical name} mapping.
+
+  Accepts the shapes both grading tools write: `canonical: [aliases]` groups,
+  optionally under a top-level CONFIRMED or matches key, or a flat
+  `alias: canonical` mapping. UNMATCHED lists are ignored.
+  """
+  loaded = loaded or {}
+  if isinstance(loaded, dict) and "CONFIRMED" in loaded:
+    loaded = loaded["CONFIRMED"] or {}
+  if isinstance(loaded, dict) and "matches" in loaded:
+    loaded = loaded["matches"] or {}
+
+  if not isinstance(loaded, dict):
+    raise ValueError(f"{source} must be a mapping or contain a top-level 'matches' key.")
+
+  groups = {key: value for key, value in loaded.items() if key not in RESERVED_SECTIONS}
+  if all(isinstance(value, list) for value in groups.values()):
+    mapping: dict[str, str] = {}
+    for canonical_name, aliases in groups.items():
+      if include_canonical:
+        mapping[str(canonical_name)] = str(canonical_name)
+      for alias in aliases:
+        mapping[str(alias)] = str(canonical_name)
+    return mapping
+
+  return {str(source_name): str(target) for source_name, target in groups.items() if target}
+
+
+def load_alias_map(path: Path | None, *, include_canonical: bool = False) -> dict[str, str]:
+  if path is None or not path.exists():
+    return {}
+  loaded = yaml.safe_load(path.read_text(encoding="utf-8"))
+  return parse_alias_map(loaded, include_canonical=include_canonical, source=f"Name map at {path}")
+
+
+def group_aliases_by_canonical(mapping: dict[str, str]) -> dict[str, list[str]]:
+  grouped: dict[str, list[str]] = {}
+  for source_name, canonical_name in sorted(mapping.items(), key=lambda item: (item[1], item[0])):
+    grouped.setdefault(canonical_name, []).append(source_name)
+  return grouped
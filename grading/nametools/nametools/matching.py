@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import functools
+import unicodedata
+
+import numpy as np
+import rapidfuzz
+from rapidfuzz import fuzz
+from rapidfuzz import process
+
+
+NORMALIZE_CACHE_SIZE = 1 << 16
+# Part of any cache key built from scores, so a scorer upgrade invalidates cached rankings.
+SCORER_IMPLEMENTATION = f"rapidfuzz-{rapidfuzz.__version__}"
+BLOCKING_TRIGRAM_OVERLAP = 0.4
+SCORERS = {
+  "ratio": fuzz.ratio,
+  "partial_ratio": fuzz.partial_ratio,
+  "token_set_ratio": fuzz.token_set_ratio,
+  "token_sort_ratio": fuzz.token_sort_ratio,
+}
+SOUNDEX_CODES = {
+  **dict.fromkeys("bfpv", "1"),
+  **dict.fromkeys("cgjkqsxz", "2"),
+  **dict.fromkeys("dt", "3"),
+  "l": "4",
+  **dict.fromkeys("mn", "5"),
+  "r": "6",
+}
+
+
+@functools.lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_name(name: str) -> str:
+  normalized = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii")
+  return " ".join("".join(ch.lower() if ch.isalnum() else " " for ch in normalized).split())
+
+
+def token_key(name: str) -> tuple[str, ...]:
+  return tuple(sorted(normalize_name(name).split()))
+
+
+def token_key_without_initials(name: str) -> tuple[str, ...]:
+  return tuple(sorted(token for token in normalize_name(name).split() if len(token) > 1))
+
+
+def get_scorer(scorer: str):
+  try:
+    return SCORERS[scorer]
+  except KeyError as exc:
+    raise ValueError(f"Unknown scorer {scorer!r}; expected one of {', '.join(SCORERS)}.") from exc
+
+
+def extract(
+  query: str,
+  choices: list[str],
+  *,
+  scorer: str = "token_set_ratio",
+  limit: int | None = 5,
+) -> list[tuple[str, int]]:
+  """Score `query` against every choice on normalized names, best first.
+
+  Scores are rounded the same way thefuzz rounds them, and ties keep the
+  order of `choices`, so results match `thefuzz.process.extract` with
+  `processor=normalize_name` for thefuzz 0.20 and later, which score with
+  rapidfuzz. The older difflib-based thefuzz and fuzzywuzzy score some pairs
+  differently ('Noah Rodriguez' vs 'Ortiz, Noah' is 67 there, 75 here).
+  """
+  if not choices:
+    return []
+  matches = process.extract(
+    normalize_name(query),
+    [normalize_name(choice) for choice in choices],
+    scorer=get_scorer(scorer),
+    processor=None,
+    limit=limit,
+  )
+  return [(choices[index], int(round(score))) for _, score, index in matches]
+
+
+def best_matches(
+  queries: list[str],
+  choices: list[str],
+  *,
+  scorers: tuple[str, ...] = ("ratio",),
+) -> list[tuple[str, int] | None]:
+  """Return the best choice and score for each query, scoring all pairs in one batch.
+
+  When several scorers are given, each pair keeps its highest score.
+  """
+  if not queries:
+    return []
+  if not choices:
+    return [None] * len(queries)
+
+  normalized_queries = [normalize_name(query) for query in queries]
+  normalized_choices = [normalize_name(choice) for choice in choices]
+  scores = None
+  for scorer in scorers:
+    matrix = process.cdist(normalized_queries, normalized_choices, scorer=get_scorer(scorer))
+    scores = matrix if scores is None else np.maximum(scores, matrix)
+
+  results: list[tuple[str, int] | None] = []
+  for row in scores:
+    best_index = int(row.argmax())
+    results.append((choices[best_index], int(round(float(row[best_index])))))
+  return results
+
+
+def soundex(token: str) -> str:
+  letters = [ch for ch in token.lower() if ch.isalpha()]
+  if not letters:
+    return ""
+  encoded = letters[0].upper()
+  previous = SOUNDEX_CODES.get(letters[0], "")
+  for ch in letters[1:]:
+    code = SOUNDEX_CODES.get(ch, "")
+    if code and code != previous:
+      encoded += code
+      if len(encoded) == 4:
+        break
+    if ch not in "hw":
+      previous = code
+  return encoded.ljust(4, "0")
+
+
+def name_trigrams(tokens: list[str]) -> set[str]:
+  trigrams: set[str] = set()
+  for token in tokens:
+    padded = f" {token} "
+    trigrams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+  return trigrams
+
+
+class NameCandidateIndex:
+  def __init__(self, names: list[str]):
+    self.names = list(names)
+    self.token_postings: dict[str, set[int]] = {}
+    self.phonetic_postings: dict[str, set[int]] = {}
+    self.trigram_postings: dict[str, list[int]] = {}
+    for position, name in enumerate(self.names):
+      tokens = normalize_name(name).split()
+      for token in tokens:
+        self.token_postings.setdefault(token, set()).add(position)
+        phonetic_key = soundex(token)
+        if phonetic_key:
+          self.phonetic_postings.setdefault(phonetic_key, set()).add(position)
+      for trigram in name_trigrams(tokens):
+        self.trigram_postings.setdefault(trigram, []).append(position)
+
+  def candidates(self, query: str, excluded: set[str] | None = None) -> list[str]:
+    tokens = normalize_name(query).split()
+    positions: set[int] = set()
+    for token in tokens:
+      positions.update(self.token_postings.get(token, ()))
+      positions.update(self.phonetic_postings.get(soundex(token), ()))
+
+    query_trigrams = name_trigrams(tokens)
+    required_overlap = max(2, int(len(query_trigrams) * BLOCKING_TRIGRAM_OVERLAP))
+    overlap_counts: dict[int, int] = {}
+    for trigram in query_trigrams:
+      for position in self.trigram_postings.get(trigram, ()):
+        overlap_counts[position] = overlap_counts.get(position, 0) + 1
+    positions.update(position for position, count in overlap_counts.items() if count >= required_overlap)
+
+    excluded = excluded or set()
+    return [self.names[position] for position in sorted(positions) if self.names[position] not in excluded]
@@ -0,0 +1,86 @@
+import importlib.util
+import tempfile
+import unittest
+from pathlib import Path
+
+from nametools import aliases
+from nametools import matching
+
+
+class MatchingTests(unittest.TestCase):
+  def test_normalize_name_folds_accents_and_punctuation(self) -> None:
+    self.assertEqual(matching.normalize_name("  José  O'Brien-Núñez "), "jose o brien nunez")
+    self.assertEqual(matching.token_key("Arellano, Joceline Cortez"), ("arellano", "cortez", "joceline"))
+
+  def test_extract_orders_by_score_then_choice_order(self) -> None:
+    results = matching.extract(
+      "Sam Jacobs",
+      ["Rivera, Ana", "Jacobs, Samuel", "Jacobs, Sam"],
+      scorer="token_set_ratio",
+      limit=2,
+    )
+
+    self.assertEqual(results[0], ("Jacobs, Sam", 100))
+    self.assertEqual(results[1][0], "Jacobs, Samuel")
+
+  def test_extract_scores_for_known_pairs(self) -> None:
+    # Pinned so a rapidfuzz upgrade that moves scores across the auto-confirm rule shows up here.
+    pairs = [
+      ("Noah Rodriguez", "Ortiz, Noah", 75),
+      ("Sam Jacobs", "Jacobs, Samuel", 87),
+      ("Joceline Cortez-Arellano", "Arellano, Joceline Cortez", 100),
+      ("Jose Nunez", "Núñez, José", 100),
+    ]
+    for query, choice, score in pairs:
+      self.assertEqual(matching.extract(query, [choice]), [(choice, score)])
+
+  @unittest.skipUnless(importlib.util.find_spec("thefuzz"), "thefuzz is not installed")
+  def test_extract_matches_thefuzz(self) -> None:
+    from thefuzz import fuzz
+    from thefuzz import process
+
+    choices = ["Ortiz, Noah", "Rodriguez, Noah", "Jacobs, Samuel", "Jacobs, Sam", "Rivera, Ana Maria", "Núñez, José"]
+    for query in ["Noah Rodriguez", "Sam Jacobs", "Ana Rivera", "Jose Nunez", "N. Ortiz"]:
+      expected = process.extract(query, choices, scorer=fuzz.token_set_ratio, processor=matching.normalize_name, limit=5)
+      self.assertEqual(matching.extract(query, choices, limit=5), expected)
+
+  def test_best_matches_keeps_highest_score_across_scorers(self) -> None:
+    results = matching.best_matches(
+      ["ana rivra", "Riv"],
+      ["Sam Jacobs", "Ana Rivera"],
+      scorers=("ratio", "partial_ratio"),
+    )
+
+    self.assertEqual(results[0][0], "Ana Rivera")
+    self.assertEqual(results[1], ("Ana Rivera", 100))
+    self.assertEqual(matching.best_matches(["Ana"], []), [None])
+
+  def test_unknown_scorer_is_rejected(self) -> None:
+    with self.assertRaises(ValueError):
+      matching.extract("Ana", ["Ana"], scorer="wratio")
+
+
+class AliasStoreTests(unittest.TestCase):
+  def test_load_alias_map_reads_grouped_confirmed_sections(self) -> None:
+    with tempfile.TemporaryDirectory() as tempdir:
+      path = Path(tempdir) / "names.yaml"
+      path.write_text(
+        "CONFIRMED:\n  Jacobs, Samuel:\n  - Sam Jacobs\nSUGGESTED:\n  Rivera, Ana:\n  - Ana R\nUNMATCHED:\n- Nobody\n",
+        encoding="utf-8",
+      )
+
+      self.assertEqual(aliases.load_alias_map(path), {"Sam Jacobs": "Jacobs, Samuel"})
+      self.assertEqual(
+        aliases.load_alias_map(path, include_canonical=True),
+        {"Jacobs, Samuel": "Jacobs, Samuel", "Sam Jacobs": "Jacobs, Samuel"},
+      )
+
+  def test_parse_alias_map_ignores_unmatched_in_peer_eval_files(self) -> None:
+    mapping = aliases.parse_alias_map({"Rivera, Ana": ["Ana Rivera"], "UNMATCHED": ["Nobody"]})
+
+    self.assertEqual(mapping, {"Ana Rivera": "Rivera, Ana"})
+    self.assertEqual(aliases.group_aliases_by_canonical(mapping), {"Rivera, Ana": ["Ana Rivera"]})
+
+
+if __name__ == "__main__":
+  unittest.main()
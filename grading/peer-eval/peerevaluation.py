@@ -5,11 +5,13 @@ import json
 import os.path
 import re
 from collections import defaultdict
+from pathlib import Path
 from typing import List, Dict
 
-import fuzzywuzzy.fuzz
 import yaml
 import colorama
+from nametools.aliases import load_alias_map
+from nametools.matching import best_matches, normalize_name
 
 import pandas as pd
 
@@ -30,10 +32,6 @@ class Evaluation(object):
     self.definitive_name = self_eval_bool # whether a name has been definitely matched or not
 
 
-def normalize_name(name: str) -> str:
-  return re.sub(r"\s+", " ", str(name).strip()).lower()
-
-
 LAST_NAME_PARTICLES = {
   "de", "del", "della", "di", "la", "le", "van", "von", "der", "den",
   "da", "dos", "das", "du", "st", "st.", "bin", "ibn", "al"
@@ -69,20 +67,11 @@ def name_sort_key(name: str):
 
 
 def load_name_file(name_yaml) -> Dict[str,str]:
-  name_correction_dict = {}
-  
   if not os.path.exists(name_yaml):
     log.warning("No name correction file passed in")
-    return name_correction_dict
-  with open(name_yaml) as fid:
-    names = yaml.safe_load(fid)
-    for definitive_names, list_of_alternatives in names.items():
-      # Treat the YAML key as a valid match target too, not only the aliases.
-      name_correction_dict[definitive_names] = definitive_names
-      for alternative in list_of_alternatives:
-        name_correction_dict[alternative] = definitive_names
-  
-  return name_correction_dict
+    return {}
+  # Treat the YAML key as a valid match target too, not only the aliases.
+  return load_alias_map(Path(name_yaml), include_canonical=True)
 
 
 def normalize_dict_keys(source: Dict[str, str]) -> Dict[str, str]:
@@ -311,20 +300,16 @@ def correct_names(evaluations: List[Evaluation], name_correction_dict):
 
   # Update names programatically for peer evaluations that still remain ambiguous.
   name_corrections_made = defaultdict(list)
-  for eval in filter(lambda e: not e.definitive_name, evaluations):
-    if not self_names:
+  ambiguous_evals = [eval for eval in evaluations if not eval.definitive_name]
+  matches = best_matches(
+    [eval.name for eval in ambiguous_evals],
+    self_names,
+    scorers=("ratio", "partial_ratio"),
+  )
+  for eval, match in zip(ambiguous_evals, matches):
+    if match is None:
       break
-    best_match = max(
-      self_names,
-      key=lambda n: max(
-        fuzzywuzzy.fuzz.ratio(normalize_name(n), normalize_name(eval.name)),
-        fuzzywuzzy.fuzz.partial_ratio(normalize_name(n), normalize_name(eval.name)),
-      )
-    )
-    best_score = max(
-      fuzzywuzzy.fuzz.ratio(normalize_name(best_match), normalize_name(eval.name)),
-      fuzzywuzzy.fuzz.partial_ratio(normalize_name(best_match), normalize_name(eval.name)),
-    )
+    best_match, best_score = match
     if best_score >= 80:
       log.debug(f"Correcting \"{eval.name}\" --> \"{best_match}\" ({best_score})")
       name_corrections_made[best_match].append(eval.name)